@@ -1,20 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_page, next_cursor
 from app.models.models import Incident
 from app.schemas.schemas import (
     IncidentCreate, 
     IncidentResponse, 
-    IncidentUpdate
+    IncidentUpdate,
+    NearestIncident,
+    IncidentType as SchemaIncidentType
 )
+from app.services.clustering import incident_clusterer
+from app.services.incident_index import incident_index
+from app.services.knn_index import incident_knn, sync_incident
 
 router = APIRouter()
 
+# Continuation token tags for the two listing orders
+INCIDENTS_BY_NEWEST = "incidents:created_at"
+INCIDENTS_BY_SEVERITY = "incidents:severity_score"
+# Incidents without a severity rank with the column default; matches the model's index
+SEVERITY_NULL_KEY = 0.0
+
+
+def _decode_cursor(cursor: Optional[str], ordering: str, sort_column):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, ordering, sort_column)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 
 @router.post("/", response_model=IncidentResponse, status_code=status.HTTP_201_CREATED)
-async def create_incident(incident: IncidentCreate, db: Session = Depends(get_db)):
+async def create_incident(incident: IncidentCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new incident"""
     db_incident = Incident(
         title=incident.title,
@@ -26,45 +51,125 @@ async def create_incident(incident: IncidentCreate, db: Session = Depends(get_db
         affected_area_radius=incident.affected_area_radius
     )
     db.add(db_incident)
-    db.commit()
-    db.refresh(db_incident)
+    await db.commit()
+    await db.refresh(db_incident)
+    incident_clusterer.track_incident(db_incident)
+    sync_incident(db_incident)
     return db_incident
 
 
 @router.get("/", response_model=List[IncidentResponse])
 async def get_incidents(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     is_active: Optional[bool] = Query(None),
     incident_type: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=f"{NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all incidents with optional filtering"""
-    query = db.query(Incident)
+    """
+    Get incidents newest first with optional filtering.
+    Paginate by passing the X-Next-Cursor response header back as ``cursor``;
+    ``skip`` is kept for older clients and ignored when a cursor is given.
+    """
+    after = _decode_cursor(cursor, INCIDENTS_BY_NEWEST, Incident.created_at)
+    query = select(Incident)
     
     if is_active is not None:
-        query = query.filter(Incident.is_active == (1 if is_active else 0))
+        query = query.where(Incident.is_active == (1 if is_active else 0))
     
     if incident_type:
-        query = query.filter(Incident.incident_type == incident_type)
+        query = query.where(Incident.incident_type == incident_type)
+    
+    query = keyset_page(query, Incident.created_at, Incident.id, after, limit)
+    if after is None and skip:
+        query = query.offset(skip)
     
-    incidents = query.order_by(Incident.created_at.desc()).offset(skip).limit(limit).all()
+    incidents, next_token = next_cursor((await db.scalars(query)).all(), limit, INCIDENTS_BY_NEWEST, "created_at")
+    if next_token:
+        response.headers[NEXT_CURSOR_HEADER] = next_token
     return incidents
 
 
 @router.get("/active", response_model=List[IncidentResponse])
-async def get_active_incidents(db: Session = Depends(get_db)):
-    """Get all active incidents"""
-    incidents = db.query(Incident).filter(
-        Incident.is_active == 1
-    ).order_by(Incident.severity_score.desc()).all()
+async def get_active_incidents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all active incidents when omitted"),
+    cursor: Optional[str] = Query(None, description=f"{NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get active incidents, most severe first"""
+    after = _decode_cursor(cursor, INCIDENTS_BY_SEVERITY, Incident.severity_score)
+    query = keyset_page(
+        select(Incident).where(Incident.is_active == 1),
+        Incident.severity_score,
+        Incident.id,
+        after,
+        limit,
+        null_key=SEVERITY_NULL_KEY
+    )
+    
+    incidents, next_token = next_cursor(
+        (await db.scalars(query)).all(), limit, INCIDENTS_BY_SEVERITY, "severity_score", null_key=SEVERITY_NULL_KEY
+    )
+    if next_token:
+        response.headers[NEXT_CURSOR_HEADER] = next_token
     return incidents
 
 
+@router.get("/nearest", response_model=List[NearestIncident])
+async def get_nearest_incidents(
+    latitude: float,
+    longitude: float,
+    k: int = Query(10, ge=1, le=100),
+    incident_type: Optional[SchemaIncidentType] = None,
+    max_distance: Optional[float] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the k active incidents closest to a location, closest first"""
+    hits = incident_knn.nearest(latitude, longitude, k, incident_type, max_distance)
+    if not hits:
+        return []
+    
+    incidents = await db.scalars(select(Incident).where(
+        Incident.id.in_([incident_id for incident_id, _ in hits])
+    ))
+    by_id = {incident.id: incident for incident in incidents}
+    
+    return [
+        NearestIncident(
+            **IncidentResponse.model_validate(by_id[incident_id]).model_dump(),
+            distance_meters=distance
+        )
+        for incident_id, distance in hits if incident_id in by_id
+    ]
+
+
+@router.get("/covering", response_model=List[IncidentResponse])
+async def get_covering_incidents(
+    latitude: float,
+    longitude: float,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get active incidents whose affected area contains a location, closest first"""
+    hits = incident_index.covering(latitude, longitude)
+    if not hits:
+        return []
+    
+    incidents = await db.scalars(select(Incident).where(
+        Incident.id.in_([incident_id for incident_id, _ in hits]),
+        Incident.is_active == 1
+    ))
+    by_id = {incident.id: incident for incident in incidents}
+    
+    return [by_id[incident_id] for incident_id, _ in hits if incident_id in by_id]
+
+
 @router.get("/{incident_id}", response_model=IncidentResponse)
-async def get_incident(incident_id: int, db: Session = Depends(get_db)):
+async def get_incident(incident_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific incident by ID"""
-    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    incident = await db.get(Incident, incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,10 +182,10 @@ async def get_incident(incident_id: int, db: Session = Depends(get_db)):
 async def update_incident(
     incident_id: int, 
     incident_update: IncidentUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an incident"""
-    db_incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    db_incident = await db.get(Incident, incident_id)
     if not db_incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -95,21 +200,25 @@ async def update_incident(
             setattr(db_incident, field, value)
     
     db_incident.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_incident)
+    await db.commit()
+    await db.refresh(db_incident)
+    incident_clusterer.track_incident(db_incident)
+    sync_incident(db_incident)
     return db_incident
 
 
 @router.delete("/{incident_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_incident(incident_id: int, db: Session = Depends(get_db)):
+async def delete_incident(incident_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete an incident"""
-    db_incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    db_incident = await db.get(Incident, incident_id)
     if not db_incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Incident not found"
         )
     
-    db.delete(db_incident)
-    db.commit()
+    await db.delete(db_incident)
+    await db.commit()
+    incident_clusterer.drop_incident(incident_id)
+    incident_knn.remove(incident_id)
     return None
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from app.schemas.schemas import FloodPredictionRequest
+from app.services.flood_model import get_flood_model
+from app.services.flood_prediction import request_points, stream_predictions
+
+router = APIRouter()
+
+
+@router.post("/batch")
+async def predict_batch(request: FloodPredictionRequest):
+    """
+    Flood predictions for many locations in one request
+    
+    - **points**: Coordinates to score, or
+    - **bbox**: Bounding box to cover with a grid of points
+    - **resolution_meters**: Grid spacing when using bbox (default: 100)
+    
+    Streams newline-delimited JSON, one object per location with
+    latitude, longitude, flood_probability, flood_depth and risk_level.
+    """
+    try:
+        model = get_flood_model()
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Flood model is not available"
+        )
+
+    try:
+        latitudes, longitudes = request_points(request)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return StreamingResponse(
+        stream_predictions(model, latitudes, longitudes),
+        media_type="application/x-ndjson",
+        headers={"X-Prediction-Count": str(len(latitudes))}
+    )
@@ -1,23 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from datetime import datetime, date
-from app.core.database import get_db
-from app.models.models import Report, ReportUpvote, IncidentType
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_page, next_cursor
+from app.models.models import Report, ReportUpvote
 from app.schemas.schemas import (
     ReportCreate, 
     ReportResponse, 
     ReportUpdate,
-    ReportStats
+    ReportStats,
+    NearestReport,
+    TileClusters,
+    ViewportClusters,
+    IncidentType as SchemaIncidentType
 )
-import math
+from app.services.clustering import ingest_lock, ingest_report, remove_report
+from app.services.geo_math import nearest_within_radius
+from app.services.knn_index import report_knn
+from app.services.report_stats import compute_report_stats
+from app.services.report_tiles import (
+    MAX_ZOOM,
+    get_tile_clusters,
+    invalidate_point,
+    tiles_covering
+)
+from app.services.spatial_index import filter_reports_in_radius_bbox
 
 router = APIRouter()
 
+# Continuation token tag for the (created_at, id) listing order
+REPORTS_BY_NEWEST = "reports:created_at"
+
 
 @router.post("/", response_model=ReportResponse, status_code=status.HTTP_201_CREATED)
-async def create_report(report: ReportCreate, user_id: int = 1, db: Session = Depends(get_db)):
+async def create_report(report: ReportCreate, user_id: int = 1, db: AsyncSession = Depends(get_async_db)):
     """Create a new incident report"""
     db_report = Report(
         user_id=user_id,
@@ -27,61 +47,169 @@ async def create_report(report: ReportCreate, user_id: int = 1, db: Session = De
         description=report.description
     )
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
+    await db.refresh(db_report)
+    
+    invalidate_point(db_report.latitude, db_report.longitude)
+    report_knn.upsert(db_report.id, db_report.latitude, db_report.longitude, db_report.incident_type)
+    
+    # Join a nearby incident or promote a new cluster
+    async with ingest_lock:
+        await db.run_sync(ingest_report, db_report)
+    
     return db_report
 
 
 @router.get("/", response_model=List[ReportResponse])
 async def get_reports(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     incident_type: str = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=f"{NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all reports with optional filtering"""
-    query = db.query(Report)
+    """
+    Get reports newest first with optional filtering.
+    While more reports remain, the response carries an X-Next-Cursor header;
+    pass it back as ``cursor`` for the next page. Offset paging with ``skip``
+    still works for older clients but is ignored when a cursor is given.
+    """
+    try:
+        after = decode_cursor(cursor, REPORTS_BY_NEWEST, Report.created_at) if cursor else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    query = select(Report)
     
     if incident_type:
-        query = query.filter(Report.incident_type == incident_type)
+        query = query.where(Report.incident_type == incident_type)
     
-    reports = query.order_by(Report.created_at.desc()).offset(skip).limit(limit).all()
+    query = keyset_page(query, Report.created_at, Report.id, after, limit)
+    if after is None and skip:
+        query = query.offset(skip)
+    
+    reports, next_token = next_cursor((await db.scalars(query)).all(), limit, REPORTS_BY_NEWEST, "created_at")
+    if next_token:
+        response.headers[NEXT_CURSOR_HEADER] = next_token
     return reports
 
 
 @router.get("/stats", response_model=ReportStats)
-async def get_report_stats(db: Session = Depends(get_db)):
+async def get_report_stats(
+    days: int = Query(7, ge=0, le=90, description="UTC days of per-day breakdown, today included"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get statistics about reports"""
-    today = date.today()
+    return await db.run_sync(compute_report_stats, days)
+
+
+@router.get("/tiles/{zoom}/{x}/{y}", response_model=TileClusters)
+async def get_report_tile(
+    zoom: int,
+    x: int,
+    y: int,
+    response: Response,
+    incident_type: Optional[SchemaIncidentType] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get pre-aggregated report clusters for one slippy-map tile.
+    Responses carry an ETag and Cache-Control so clients and proxies can cache per tile.
+    """
+    if not 0 <= zoom <= MAX_ZOOM or not 0 <= x < (1 << zoom) or not 0 <= y < (1 << zoom):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid tile {zoom}/{x}/{y} (zoom must be 0-{MAX_ZOOM})"
+        )
     
-    # Count reports by type
-    info_count = db.query(Report).filter(
-        Report.incident_type == IncidentType.INFO
-    ).count()
+    tile, etag = await db.run_sync(get_tile_clusters, zoom, x, y, incident_type)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.TILE_CACHE_TTL_SECONDS}",
+    }
     
-    critical_count = db.query(Report).filter(
-        Report.incident_type == IncidentType.CRITICAL
-    ).count()
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
+    return tile
+
+
+@router.get("/viewport", response_model=ViewportClusters)
+async def get_viewport_clusters(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    zoom: int,
+    response: Response,
+    incident_type: Optional[SchemaIncidentType] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get report clusters for a map viewport at a zoom level.
+    The zoom is lowered until the viewport spans at most VIEWPORT_MAX_TILES tiles,
+    so the payload stays bounded however many reports exist.
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bounding box min values must not exceed max values"
+        )
     
-    warning_count = db.query(Report).filter(
-        Report.incident_type == IncidentType.WARNING
-    ).count()
+    zoom = max(0, min(zoom, MAX_ZOOM))
+    tiles = tiles_covering(min_lat, max_lat, min_lon, max_lon, zoom)
+    while len(tiles) > settings.VIEWPORT_MAX_TILES and zoom > 0:
+        zoom -= 1
+        tiles = tiles_covering(min_lat, max_lat, min_lon, max_lon, zoom)
     
-    total_count = db.query(Report).count()
+    tile_clusters = await db.run_sync(
+        lambda session: [get_tile_clusters(session, zoom, x, y, incident_type)[0] for x, y in tiles]
+    )
+    response.headers["Cache-Control"] = f"public, max-age={settings.TILE_CACHE_TTL_SECONDS}"
     
-    return ReportStats(
-        info_count=info_count,
-        critical_count=critical_count,
-        warning_count=warning_count,
-        total_count=total_count,
-        date=today.strftime("%b %d, %Y")
+    return ViewportClusters(
+        zoom=zoom,
+        total_count=sum(tile.total_count for tile in tile_clusters),
+        tiles=[tile for tile in tile_clusters if tile.total_count]
     )
 
 
+@router.get("/nearest", response_model=List[NearestReport])
+async def get_nearest_reports(
+    latitude: float,
+    longitude: float,
+    k: int = Query(10, ge=1, le=100),
+    incident_type: Optional[SchemaIncidentType] = None,
+    max_distance: Optional[float] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the k reports closest to a location, closest first"""
+    hits = report_knn.nearest(latitude, longitude, k, incident_type, max_distance)
+    if not hits:
+        return []
+    
+    reports = await db.scalars(select(Report).where(Report.id.in_([report_id for report_id, _ in hits])))
+    by_id = {report.id: report for report in reports}
+    
+    return [
+        NearestReport(
+            **ReportResponse.model_validate(by_id[report_id]).model_dump(),
+            distance_meters=distance
+        )
+        for report_id, distance in hits if report_id in by_id
+    ]
+
+
 @router.get("/{report_id}", response_model=ReportResponse)
-async def get_report(report_id: int, db: Session = Depends(get_db)):
+async def get_report(report_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific report by ID"""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.get(Report, report_id)
     if not report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -94,10 +222,10 @@ async def get_report(report_id: int, db: Session = Depends(get_db)):
 async def update_report(
     report_id: int, 
     report_update: ReportUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a report"""
-    db_report = db.query(Report).filter(Report.id == report_id).first()
+    db_report = await db.get(Report, report_id)
     if not db_report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,80 +237,69 @@ async def update_report(
         setattr(db_report, field, value)
     
     db_report.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
+    await db.refresh(db_report)
+    invalidate_point(db_report.latitude, db_report.longitude)
+    report_knn.upsert(db_report.id, db_report.latitude, db_report.longitude, db_report.incident_type)
     return db_report
 
 
 @router.delete("/{report_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_report(report_id: int, db: Session = Depends(get_db)):
+async def delete_report(report_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a report"""
-    db_report = db.query(Report).filter(Report.id == report_id).first()
+    db_report = await db.get(Report, report_id)
     if not db_report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Report not found"
         )
     
-    db.delete(db_report)
-    db.commit()
+    await db.delete(db_report)
+    await db.commit()
+    invalidate_point(db_report.latitude, db_report.longitude)
+    report_knn.remove(report_id)
+    async with ingest_lock:
+        await db.run_sync(remove_report, report_id, db_report.latitude, db_report.longitude)
     return None
 
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points in meters using Haversine formula"""
-    R = 6371000  # Earth's radius in meters
-    
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_phi / 2) ** 2 + \
-        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
-
 @router.get("/nearby/{latitude}/{longitude}", response_model=List[ReportResponse])
 async def get_nearby_reports(
     latitude: float,
     longitude: float,
     radius: float = 100.0,  # Default 100 meters
     incident_type: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get reports within a certain radius of a location"""
-    query = db.query(Report)
+    query = filter_reports_in_radius_bbox(select(Report), latitude, longitude, radius)
     
     if incident_type:
-        query = query.filter(Report.incident_type == incident_type)
-    
-    all_reports = query.all()
+        query = query.where(Report.incident_type == incident_type)
     
-    # Filter by distance
-    nearby_reports = []
-    for report in all_reports:
-        distance = haversine_distance(latitude, longitude, report.latitude, report.longitude)
-        if distance <= radius:
-            nearby_reports.append(report)
+    candidates = (await db.scalars(query)).all()
     
-    # Sort by distance (closest first)
-    nearby_reports.sort(key=lambda r: haversine_distance(latitude, longitude, r.latitude, r.longitude))
+    # Exact distance check on bounding-box candidates, closest first
+    order, _ = nearest_within_radius(
+        latitude,
+        longitude,
+        [report.latitude for report in candidates],
+        [report.longitude for report in candidates],
+        radius
+    )
     
-    return nearby_reports
+    return [candidates[i] for i in order]
 
 
 @router.post("/{report_id}/upvote", response_model=ReportResponse)
 async def upvote_report(
     report_id: int,
     user_id: int = 1,  # In production, get from JWT token
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Upvote a report (one upvote per user per report)"""
     # Check if report exists
-    db_report = db.query(Report).filter(Report.id == report_id).first()
+    db_report = await db.get(Report, report_id)
     if not db_report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -190,10 +307,10 @@ async def upvote_report(
         )
     
     # Check if user already upvoted this report
-    existing_upvote = db.query(ReportUpvote).filter(
+    existing_upvote = await db.scalar(select(ReportUpvote).where(
         ReportUpvote.report_id == report_id,
         ReportUpvote.user_id == user_id
-    ).first()
+    ))
     
     if existing_upvote:
         raise HTTPException(
@@ -212,8 +329,16 @@ async def upvote_report(
     db_report.upvote_count += 1
     db_report.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_report)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request from the same user won the unique (report_id, user_id) index
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already upvoted this report"
+        )
+    await db.refresh(db_report)
     
     return db_report
 
@@ -222,11 +347,11 @@ async def upvote_report(
 async def remove_upvote(
     report_id: int,
     user_id: int = 1,  # In production, get from JWT token
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove an upvote from a report"""
     # Check if report exists
-    db_report = db.query(Report).filter(Report.id == report_id).first()
+    db_report = await db.get(Report, report_id)
     if not db_report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -234,10 +359,10 @@ async def remove_upvote(
         )
     
     # Check if upvote exists
-    existing_upvote = db.query(ReportUpvote).filter(
+    existing_upvote = await db.scalar(select(ReportUpvote).where(
         ReportUpvote.report_id == report_id,
         ReportUpvote.user_id == user_id
-    ).first()
+    ))
     
     if not existing_upvote:
         raise HTTPException(
@@ -246,14 +371,14 @@ async def remove_upvote(
         )
     
     # Remove upvote
-    db.delete(existing_upvote)
+    await db.delete(existing_upvote)
     
     # Decrement upvote count
     if db_report.upvote_count > 0:
         db_report.upvote_count -= 1
     db_report.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
+    await db.refresh(db_report)
     
     return db_report
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.schemas.schemas import RouteRiskRequest, RouteRiskResponse
+from app.services.route_risk import score_route
+
+router = APIRouter()
+
+
+@router.post("/risk", response_model=RouteRiskResponse)
+async def get_route_risk(request: RouteRiskRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Score flood risk along a route
+    
+    - **path**: Route polyline as an ordered list of points
+    - **sample_interval_meters**: Spacing of risk samples along the route (default: 100)
+    - **speed_kmh**: Base travel speed used for the time estimate (default: 40)
+    
+    Returns per-segment and overall risk plus an estimated travel time.
+    """
+    try:
+        return await db.run_sync(score_route, request.path, request.sample_interval_meters, request.speed_kmh)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
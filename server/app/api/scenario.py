@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 import random
+from app.services import handbook_service
 
 router = APIRouter()
 
@@ -278,6 +279,7 @@ async def activate_scenario():
     """
     global _scenario_active
     _scenario_active = True
+    handbook_service.schedule_prewarm()
     
     return {
         "status": "activated",
@@ -300,6 +302,7 @@ async def deactivate_scenario():
     """
     global _scenario_active
     _scenario_active = False
+    handbook_service.schedule_prewarm()
     
     return {
         "status": "deactivated",
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 import httpx
-from typing import Optional
-from pydantic import BaseModel
-from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.core.config import settings
+from app.core.http import CircuitOpenError, get_http_client
+from app.services import weather_service
 
 router = APIRouter()
 
@@ -25,45 +27,32 @@ class WeatherResponse(BaseModel):
     wind_direction: Optional[float] = None
     timestamp: str
     description: str
+    stale: bool = False  # served from cache past its TTL while a refresh runs
+    age_seconds: Optional[float] = None
+    rainfall_1h: Optional[float] = None  # mm, rolling totals for this grid cell
+    rainfall_6h: Optional[float] = None
+    rainfall_24h: Optional[float] = None
+    # Observed share of each window; totals are None below RAINFALL_MIN_COVERAGE
+    rainfall_1h_coverage: Optional[float] = None
+    rainfall_6h_coverage: Optional[float] = None
+    rainfall_24h_coverage: Optional[float] = None
 
 
-def get_weather_description(weather_code: int) -> str:
-    """Convert WMO weather code to description"""
-    weather_codes = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Foggy",
-        48: "Depositing rime fog",
-        51: "Light drizzle",
-        53: "Moderate drizzle",
-        55: "Dense drizzle",
-        56: "Light freezing drizzle",
-        57: "Dense freezing drizzle",
-        61: "Slight rain",
-        63: "Moderate rain",
-        65: "Heavy rain",
-        66: "Light freezing rain",
-        67: "Heavy freezing rain",
-        71: "Slight snow",
-        73: "Moderate snow",
-        75: "Heavy snow",
-        77: "Snow grains",
-        80: "Slight rain showers",
-        81: "Moderate rain showers",
-        82: "Violent rain showers",
-        85: "Slight snow showers",
-        86: "Heavy snow showers",
-        95: "Thunderstorm",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail",
-    }
-    return weather_codes.get(weather_code, "Unknown")
+class WeatherLocation(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class WeatherBatchRequest(BaseModel):
+    points: List[WeatherLocation] = Field(..., min_length=1, max_length=settings.WEATHER_BATCH_MAX_POINTS)
 
 
 @router.get("/current", response_model=WeatherResponse)
-async def get_current_weather(latitude: float, longitude: float):
+async def get_current_weather(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
     """
     Get current weather conditions for a specific location using Open-Meteo API
     
@@ -78,45 +67,55 @@ async def get_current_weather(latitude: float, longitude: float):
         return WeatherResponse(**scenario_data)
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Open-Meteo API endpoint
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "current": [
-                    "temperature_2m",
-                    "relative_humidity_2m",
-                    "precipitation",
-                    "rain",
-                    "weather_code",
-                    "wind_speed_10m",
-                    "wind_direction_10m"
-                ],
-                "timezone": "auto"
-            }
-            
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            current = data.get("current", {})
-            weather_code = current.get("weather_code", 0)
-            
-            return WeatherResponse(
-                latitude=data.get("latitude"),
-                longitude=data.get("longitude"),
-                temperature=current.get("temperature_2m", 0.0),
-                humidity=current.get("relative_humidity_2m"),
-                precipitation=current.get("precipitation", 0.0),
-                rain=current.get("rain", 0.0),
-                weather_code=weather_code,
-                wind_speed=current.get("wind_speed_10m", 0.0),
-                wind_direction=current.get("wind_direction_10m"),
-                timestamp=current.get("time", datetime.utcnow().isoformat()),
-                description=get_weather_description(weather_code)
-            )
-            
+        weather = await weather_service.get_current_weather(client, latitude, longitude)
+        return WeatherResponse(**weather)
+    except CircuitOpenError:
+        raise HTTPException(
+            status_code=503,
+            detail="Weather service is temporarily unavailable, please retry shortly"
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Failed to fetch weather data: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing weather data: {str(e)}"
+        )
+
+
+@router.post("/current/batch", response_model=List[WeatherResponse])
+async def get_current_weather_batch(
+    request: WeatherBatchRequest,
+    client: httpx.AsyncClient = Depends(get_http_client)
+):
+    """
+    Get current weather conditions for many locations at once
+    
+    - **points**: Locations to look up (results are returned in the same order)
+    
+    Cached locations are served from memory; the rest are fetched from
+    Open-Meteo with multi-location requests.
+    Note: If storm scenario is active, returns simulated typhoon data instead.
+    """
+    if scenario and hasattr(scenario, 'is_scenario_active') and scenario.is_scenario_active():
+        return [
+            WeatherResponse(**scenario.get_scenario_weather_data(point.latitude, point.longitude))
+            for point in request.points
+        ]
+    
+    try:
+        weathers = await weather_service.get_current_weather_many(
+            client, [(point.latitude, point.longitude) for point in request.points]
+        )
+        return [WeatherResponse(**weather) for weather in weathers]
+    except CircuitOpenError:
+        raise HTTPException(
+            status_code=503,
+            detail="Weather service is temporarily unavailable, please retry shortly"
+        )
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=503,
@@ -131,9 +130,10 @@ async def get_current_weather(latitude: float, longitude: float):
 
 @router.get("/forecast", response_model=dict)
 async def get_weather_forecast(
-    latitude: float,
-    longitude: float,
-    days: int = 7
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    days: int = 7,
+    client: httpx.AsyncClient = Depends(get_http_client)
 ):
     """
     Get weather forecast for a specific location
@@ -149,51 +149,12 @@ async def get_weather_forecast(
         )
     
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": latitude,
-                "longitude": longitude,
-                "daily": [
-                    "temperature_2m_max",
-                    "temperature_2m_min",
-                    "precipitation_sum",
-                    "rain_sum",
-                    "weather_code",
-                    "wind_speed_10m_max"
-                ],
-                "forecast_days": days,
-                "timezone": "auto"
-            }
-            
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Format the forecast data
-            daily = data.get("daily", {})
-            forecast_days = []
-            
-            for i in range(len(daily.get("time", []))):
-                weather_code = daily["weather_code"][i]
-                forecast_days.append({
-                    "date": daily["time"][i],
-                    "temperature_max": daily["temperature_2m_max"][i],
-                    "temperature_min": daily["temperature_2m_min"][i],
-                    "precipitation": daily["precipitation_sum"][i],
-                    "rain": daily["rain_sum"][i],
-                    "weather_code": weather_code,
-                    "description": get_weather_description(weather_code),
-                    "wind_speed_max": daily["wind_speed_10m_max"][i]
-                })
-            
-            return {
-                "latitude": data.get("latitude"),
-                "longitude": data.get("longitude"),
-                "timezone": data.get("timezone"),
-                "forecast": forecast_days
-            }
-            
+        return await weather_service.get_forecast(client, latitude, longitude, days)
+    except CircuitOpenError:
+        raise HTTPException(
+            status_code=503,
+            detail="Weather service is temporarily unavailable, please retry shortly"
+        )
     except httpx.HTTPError as e:
         raise HTTPException(
             status_code=503,
@@ -0,0 +1,170 @@
+"""
+In-process caching primitives shared by the API routers.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe LRU cache whose entries expire ttl_seconds after being set.
+    Expired entries are dropped lazily on access; the least recently used
+    entry is evicted once max_entries is exceeded. With stale_seconds > 0,
+    expired entries stay available to get_stale() for that much longer
+    (for stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        stale_seconds: float = 0.0
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup_locked(self, key: Hashable, now: float):
+        """The (value, expires_at, stored_at) entry unless past its stale window"""
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        if entry[1] + self.stale_seconds <= now:
+            del self._entries[key]
+            return _MISSING
+        return entry
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            now = self._clock()
+            entry = self._lookup_locked(key, now)
+            if entry is _MISSING or entry[1] <= now:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[V, float, bool]]:
+        """(value, age_seconds, is_fresh) for a fresh or still-servable stale entry"""
+        with self._lock:
+            now = self._clock()
+            entry = self._lookup_locked(key, now)
+            if entry is _MISSING:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value, expires_at, stored_at = entry
+            return value, now - stored_at, expires_at > now
+
+    def ttl_remaining(self, key: Hashable) -> Optional[float]:
+        """Seconds until the entry expires (negative while stale), None if absent; not counted as a hit"""
+        with self._lock:
+            now = self._clock()
+            entry = self._lookup_locked(key, now)
+            if entry is _MISSING:
+                return None
+            return entry[1] - now
+
+    def set(self, key: Hashable, value: V, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            now = self._clock()
+            self._entries[key] = (value, now + ttl, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    cancel_when_abandoned: bool
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls for the same key: the first caller starts
+    the work as a task and everyone arriving before it finishes awaits that
+    same task. A waiter being cancelled does not cancel the shared work,
+    unless every caller asked for cancel_when_abandoned (background work that
+    nobody needs any more) and the last of them has gone.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Flight] = {}
+
+    def _join(self, key: Hashable, fn: Callable[[], Awaitable[V]], cancel_when_abandoned: bool) -> _Flight:
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()), cancel_when_abandoned)
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda done: self._finish(key, done))
+        elif not cancel_when_abandoned:
+            # Someone wants the result to outlive them; never cancel it now
+            flight.cancel_when_abandoned = False
+        return flight
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[V]]) -> asyncio.Task:
+        """The in-flight task for key, starting fn() if there is none; never cancelled by waiters"""
+        return self._join(key, fn, cancel_when_abandoned=False).task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[V]], cancel_when_abandoned: bool = False) -> V:
+        flight = self._join(key, fn, cancel_when_abandoned)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and flight.cancel_when_abandoned and not flight.task.done():
+                # Forget it right away so a new caller starts fresh work instead of joining this
+                if self._calls.get(key) is flight:
+                    del self._calls[key]
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        flight = self._calls.get(key)
+        if flight is not None and flight.task is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,15 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./bantaybayan.db"
+    # "production" enables WAL and the SQLITE_* tuning below on every connection
+    DATABASE_PROFILE: Literal["default", "production"] = "default"
+    DATABASE_POOL_SIZE: int = 8  # production profile; WAL readers run in parallel
+    DATABASE_MAX_OVERFLOW: int = 8
+    SQLITE_MMAP_SIZE_BYTES: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE_KB: int = 65536  # page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Trigger-maintained per-type/per-day report counts (SQLite); stats read them instead of counting
+    REPORT_COUNTERS_ENABLED: bool = True
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -17,8 +26,79 @@ class Settings(BaseSettings):
     # CORS - accepts comma-separated string or JSON array
     ALLOWED_ORIGINS: str | List[str] = "http://localhost:3000,http://localhost:8080,http://127.0.0.1:3000,http://127.0.0.1:8080"
     
+    # Report -> incident clustering
+    CLUSTER_RADIUS_METERS: float = 300.0
+    CLUSTER_MIN_REPORTS: int = 3
+    CLUSTER_WINDOW_MINUTES: int = 360
+    
+    # Grid cell size of the "which incidents cover me" index
+    INCIDENT_INDEX_CELL_METERS: float = 250.0
+    
+    # k-nearest-neighbor indexes
+    KNN_REBUILD_SECONDS: float = 30.0
+    KNN_REBUILD_BUFFER: int = 512  # pending writes that force an early rebuild
+    
+    # Map tile aggregation
+    TILE_DETAIL_LEVELS: int = 2  # each tile splits into 4^levels cluster cells
+    TILE_CACHE_TTL_SECONDS: int = 30
+    TILE_CACHE_MAX_ENTRIES: int = 4096
+    VIEWPORT_MAX_TILES: int = 32
+    
+    # Route risk scoring
+    ROUTE_MAX_SAMPLES: int = 20000
+    ROUTE_RISK_CACHE_TTL_SECONDS: int = 60
+    ROUTE_RISK_CACHE_MAX_ENTRIES: int = 50000
+    ROUTE_RISK_CACHE_PRECISION: int = 5  # decimal places of segment endpoints (~1 m)
+    
+    # Terrain rasters (tiled .npy layers built by app.services.raster_service)
+    RASTER_DIR: str = "../models/rasters"
+    
+    # Flood model (pickled forests + scaler, see ../models/README.md)
+    MODEL_DIR: str = "../models"
+    PREDICTION_MAX_POINTS: int = 100000
+    PREDICTION_CHUNK_SIZE: int = 4096  # rows per inference pass / streamed chunk
+    
+    # Upstream HTTP client (shared connection pool)
+    UPSTREAM_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_MAX_CONNECTIONS: int = 20
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20  # below max_connections, bursts churn handshakes
+    UPSTREAM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    UPSTREAM_HTTP2: bool = True  # only used when the h2 package is installed
+    UPSTREAM_BREAKER_FAILURE_THRESHOLD: int = 5  # consecutive failures that open the circuit
+    UPSTREAM_BREAKER_RESET_SECONDS: int = 30
+    
+    # Weather (Open-Meteo) caching
+    WEATHER_CACHE_GRID_DEGREES: float = 0.01  # ~1.1 km cells
+    WEATHER_CACHE_TTL_SECONDS: int = 300
+    WEATHER_CACHE_MAX_ENTRIES: int = 10000
+    WEATHER_FORECAST_CACHE_TTL_SECONDS: int = 1800
+    WEATHER_STALE_SECONDS: int = 21600  # serve expired entries this much longer while refreshing
+    WEATHER_BATCH_MAX_POINTS: int = 500
+    WEATHER_BATCH_CHUNK_SIZE: int = 100  # locations per multi-location Open-Meteo call
+    
+    # Rolling rainfall accumulation per weather cell
+    RAINFALL_SLOT_SECONDS: int = 900  # Open-Meteo current data is 15-minutely
+    RAINFALL_MIN_COVERAGE: float = 0.75  # observed share of a window's slots needed to report its total
+    RAINFALL_PERSIST: bool = False  # keep accumulations in the database across restarts
+    
+    # Weather prefetch (keeps hot cells warm; interval should stay below the cache TTLs)
+    WEATHER_PREFETCH_ENABLED: bool = True
+    WEATHER_PREFETCH_INTERVAL_SECONDS: int = 240
+    WEATHER_PREFETCH_HOT_CELLS: int = 50
+    WEATHER_PREFETCH_CONCURRENCY: int = 4
+    WEATHER_PREFETCH_MAX_BACKOFF_SECONDS: int = 1800
+    
     # Gemini AI
     GEMINI_API_KEY: str = ""
+    HANDBOOK_CACHE_TTL_SECONDS: int = 1800
+    HANDBOOK_CACHE_MAX_ENTRIES: int = 2000
+    HANDBOOK_CACHE_GRID_DEGREES: float = 0.05  # ~5.5 km cells share a handbook
+    HANDBOOK_MAX_CONCURRENT_GENERATIONS: int = 4
+    HANDBOOK_DEADLINE_SECONDS: float = 8.0  # then a request gets the static tips
+    HANDBOOK_GENERATION_TIMEOUT_SECONDS: float = 60.0  # hard cap on one Gemini call
+    HANDBOOK_PREWARM_ENABLED: bool = True  # generate handbooks ahead of demand on scenario changes
+    HANDBOOK_PREWARM_CONCURRENCY: int = 1  # prewarm generations at once; kept below the limit above
+    HANDBOOK_PREWARM_CELL_RADIUS: int = 1  # also prewarm this many rings of location cells around each municipality
     
     def get_origins(self) -> List[str]:
         """Parse ALLOWED_ORIGINS into a list"""
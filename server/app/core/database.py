@@ -1,15 +1,97 @@
-from sqlalchemy import create_engine
+from typing import List, Type
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+# Async drivers (shipped in requirements.txt) for the plain URLs accepted in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its dialect switched to an asyncio driver"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url  # an explicit driver (e.g. sqlite+aiosqlite) is used as given
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def sqlite_pragmas(profile: str) -> List[str]:
+    """PRAGMAs run on every new SQLite connection for a storage profile"""
+    if profile != "production":
+        return []
+    return [
+        # Readers no longer block on writers (and vice versa); persists in the file
+        "journal_mode=WAL",
+        # WAL stays consistent with NORMAL; only the last commits can be lost on power failure
+        "synchronous=NORMAL",
+        f"mmap_size={settings.SQLITE_MMAP_SIZE_BYTES}",
+        f"cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        "temp_store=MEMORY",
+    ]
+
+
+def _engine_options(url: str, profile: str, queue_pool: Type[Pool]) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or profile != "production":
+        return {}
+    if parsed.database in (None, "", ":memory:"):
+        return {}  # in-memory databases keep SQLAlchemy's single-connection pool
+    # Explicit pool class: SQLAlchemy < 2.0.38 defaults aiosqlite file databases
+    # to NullPool, which rejects pool_size/max_overflow
+    return {
+        "poolclass": queue_pool,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+    }
+
+
+def _install_pragmas(engine: Engine, profile: str):
+    pragmas = sqlite_pragmas(profile)
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+
+def create_sync_engine(url: str = settings.DATABASE_URL, profile: str = settings.DATABASE_PROFILE) -> Engine:
+    sync_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {},
+        **_engine_options(url, profile, QueuePool)
+    )
+    _install_pragmas(sync_engine, profile)
+    return sync_engine
+
+
+def create_async_db_engine(url: str = settings.DATABASE_URL, profile: str = settings.DATABASE_PROFILE) -> AsyncEngine:
+    db_engine = create_async_engine(async_database_url(url), **_engine_options(url, profile, AsyncAdaptedQueuePool))
+    _install_pragmas(db_engine.sync_engine, profile)
+    return db_engine
+
+
+engine = create_sync_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the async routers; the sync engine remains for startup tasks and scripts
+async_engine = create_async_db_engine()
+
+# Objects stay loaded after commit: lazy loads are not possible outside the driver's greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -20,3 +102,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Async database dependency for FastAPI routes"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,157 @@
+"""
+Shared HTTP client for upstream APIs (Open-Meteo).
+
+One httpx.AsyncClient is created per process in the FastAPI lifespan and
+reused by every request, so connections (and their TCP/TLS handshakes) are
+pooled and kept alive instead of being set up for each call. Calls to each
+upstream go through a CircuitBreaker so a failing service is not hammered.
+"""
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from fastapi import Request
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled client configured from settings; HTTP/2 is used when h2 is installed"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.UPSTREAM_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        http2=settings.UPSTREAM_HTTP2 and http2_available(),
+    )
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """HTTP client dependency for FastAPI routes"""
+    return request.app.state.http_client
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+def is_upstream_failure(error: httpx.HTTPError) -> bool:
+    """
+    Whether an error says the upstream is unhealthy: transport errors,
+    timeouts and 5xx responses. A 4xx is the caller's fault (e.g. bad
+    coordinates) and must not open the circuit for everyone.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return True
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After failure_threshold consecutive failures
+    the circuit opens and calls fail fast for reset_seconds; then a single
+    trial call is let through (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the trial call when half-open)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at < self.reset_seconds:
+                return False
+            if self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = repr(error) if error is not None else None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn through the breaker; transport errors, timeouts and 5xx count as failures"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = await fn()
+        except httpx.HTTPError as e:
+            if is_upstream_failure(e):
+                self.record_failure(e)
+            else:
+                # The upstream answered, so it is reachable and healthy
+                self.record_success()
+            raise
+        except BaseException:
+            # Not the upstream's fault (e.g. cancellation); release a trial slot
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = max(0.0, self.reset_seconds - (self._clock() - self._opened_at))
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self._last_error,
+            }
@@ -0,0 +1,75 @@
+"""
+In-place schema upgrades for existing databases.
+
+create_all() only creates missing tables, so indexes added to models later
+never reach a database created before them. upgrade_schema() runs at startup,
+after create_all(), and creates any model index that is missing. Before the
+unique (report_id, user_id) upvote index is built, duplicate upvotes left by
+the old check-then-insert race are removed and the affected reports'
+upvote_count is recomputed. Indexes replaced by a differently shaped one are
+dropped.
+"""
+import logging
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from app.core.database import Base
+from app.models.models import Report, ReportUpvote
+
+logger = logging.getLogger(__name__)
+
+# Index names no longer in the models, by table
+_SUPERSEDED_INDEXES = {
+    # Replaced by ix_incidents_is_active_severity on COALESCE(severity_score, 0.0)
+    "incidents": ["ix_incidents_is_active_severity_score"],
+}
+
+
+def _dedupe_upvotes(conn: Connection) -> int:
+    """Keep the first upvote per (report_id, user_id); returns how many were removed"""
+    keep = select(func.min(ReportUpvote.id)).group_by(ReportUpvote.report_id, ReportUpvote.user_id)
+    affected = select(ReportUpvote.report_id).where(ReportUpvote.id.not_in(keep)).distinct()
+    report_ids = conn.execute(affected).scalars().all()
+    if not report_ids:
+        return 0
+
+    removed = conn.execute(ReportUpvote.__table__.delete().where(ReportUpvote.id.not_in(keep))).rowcount
+    upvotes = (
+        select(func.count())
+        .where(ReportUpvote.report_id == Report.id)
+        .scalar_subquery()
+    )
+    conn.execute(update(Report).where(Report.id.in_(report_ids)).values(upvote_count=upvotes))
+    return removed
+
+
+def _index_names(conn: Connection, table_name: str) -> set:
+    if conn.dialect.name == "sqlite":
+        # Reflection skips expression indexes, which would then be recreated every startup
+        return set(conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+            {"table": table_name}
+        ).scalars())
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+
+def upgrade_schema(engine: Engine):
+    """Create model indexes missing from existing tables and drop superseded ones"""
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = _index_names(conn, table.name)
+            for name in _SUPERSEDED_INDEXES.get(table.name, []):
+                if name in existing:
+                    logger.info("Dropping superseded index %s on %s", name, table.name)
+                    conn.execute(text(f"DROP INDEX {name}"))
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                if table is ReportUpvote.__table__ and index.unique:
+                    removed = _dedupe_upvotes(conn)
+                    if removed:
+                        logger.warning("Removed %d duplicate report upvotes before adding the unique index", removed)
+                logger.info("Creating index %s on %s", index.name, table.name)
+                index.create(conn)
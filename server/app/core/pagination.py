@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination for listings ordered newest/highest first.
+
+A page is read as ``WHERE (sort_key, id) < (last_sort_key, last_id) ORDER BY
+sort_key DESC, id DESC LIMIT n``, which an index on the sort key (SQLite
+appends the rowid) answers by seeking straight to the position, so page 1000
+costs the same as page 1 and rows inserted meanwhile never shift a page.
+
+The position travels as an opaque continuation token: URL-safe base64 of a
+small JSON array tagged with the ordering it belongs to, so a token from one
+listing cannot be replayed against a differently ordered one.
+
+A row-value comparison against NULL is never true, so a nullable sort column
+would silently drop its NULL rows from every page. Such listings pass
+``null_key``: rows sort and compare as if NULL were that value, and their
+cursors carry it in place of the NULL.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple, TypeVar
+from sqlalchemy import Select, func, literal, tuple_
+
+Row = TypeVar("Row")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(ordering: str, key: Any, row_id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps([ordering, key, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, ordering: str, sort_column) -> Tuple[Any, int]:
+    """
+    (sort key, id) from a token, with the key converted to sort_column's Python
+    type; raises ValueError for malformed tokens or ones from another ordering
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        tag, key, row_id = json.loads(payload)
+        if tag != ordering or key is None or not isinstance(row_id, int):
+            raise ValueError
+        key_type = sort_column.type.python_type
+        key = datetime.fromisoformat(key) if key_type is datetime else key_type(key)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return key, row_id
+
+
+def keyset_page(
+    query: Select,
+    sort_column,
+    id_column,
+    after: Optional[Tuple[Any, int]],
+    limit: Optional[int],
+    null_key: Any = None
+) -> Select:
+    """
+    Order a select() by (sort_column, id_column) descending and start it after
+    a decoded cursor. One extra row is fetched so next_cursor() can tell
+    whether another page exists; without a limit the rest is returned.
+    With null_key, NULL sort keys are ranked as that value (inlined, so an
+    index on the same COALESCE expression still serves the query).
+    """
+    if null_key is not None:
+        sort_column = func.coalesce(sort_column, literal(null_key, literal_execute=True))
+    if after is not None:
+        query = query.where(tuple_(sort_column, id_column) < tuple_(*after))
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    return query if limit is None else query.limit(limit + 1)
+
+
+def next_cursor(
+    rows: Sequence[Row],
+    limit: Optional[int],
+    ordering: str,
+    sort_attr: str,
+    null_key: Any = None
+) -> Tuple[List[Row], Optional[str]]:
+    """Trim the look-ahead row and return (page, token for the next page or None)"""
+    rows = list(rows)
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    key = getattr(last, sort_attr)
+    return rows, encode_cursor(ordering, null_key if key is None else key, last.id)
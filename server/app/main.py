@@ -1,16 +1,59 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import reports, incidents, auth, users, weather, handbook, scenario
+from app.api import reports, incidents, auth, users, weather, handbook, scenario, routes, predictions
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import async_engine, engine, Base, SessionLocal
+from app.core.http import create_http_client
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.migrations import upgrade_schema
+from app.services.clustering import incident_clusterer
+from app.services.knn_index import load_knn_indexes
+from app.services.report_stats import ensure_report_counters
+from app.services.spatial_index import ensure_report_rtree
+from app.services.rainfall_store import persist_rainfall, rainfall_store
+from app.services.weather_prefetch import create_weather_prefetcher
+from app.services.weather_service import open_meteo_breaker
 
-# Create database tables
+# Create database tables, then add indexes introduced since they were created
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+# Spatial index for nearby report queries (SQLite only)
+ensure_report_rtree(engine)
+
+# Maintained report counts for the stats endpoint (SQLite only)
+ensure_report_counters(engine)
+
+# Resume report clustering, warm the k-NN indexes and restore rainfall totals
+with SessionLocal() as db:
+    incident_clusterer.load(db)
+    load_knn_indexes(db)
+    if settings.RAINFALL_PERSIST:
+        rainfall_store.load(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream HTTP client for the lifetime of the process
+    app.state.http_client = create_http_client()
+    prefetcher = create_weather_prefetcher(app.state.http_client)
+    if settings.WEATHER_PREFETCH_ENABLED:
+        prefetcher.start()
+    try:
+        yield
+    finally:
+        await prefetcher.stop()
+        await app.state.http_client.aclose()
+        await async_engine.dispose()
+        persist_rainfall()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    description="BantayBayan Backend API - Flood monitoring and incident reporting system"
+    description="BantayBayan Backend API - Flood monitoring and incident reporting system",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -20,6 +63,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browser clients need to read the pagination token
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -30,6 +75,8 @@ app.include_router(incidents.router, prefix="/api/incidents", tags=["Incidents"]
 app.include_router(weather.router, prefix="/api/weather", tags=["Weather"])
 app.include_router(handbook.router, prefix="/api/handbook", tags=["Handbook"])
 app.include_router(scenario.router, prefix="/api/scenario", tags=["Storm Scenario"])
+app.include_router(routes.router, prefix="/api/routes", tags=["Routes"])
+app.include_router(predictions.router, prefix="/api/predictions", tags=["Predictions"])
 
 
 @app.get("/")
@@ -43,4 +90,8 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    breaker = open_meteo_breaker.snapshot()
+    return {
+        "status": "healthy" if breaker["state"] == "closed" else "degraded",
+        "upstreams": {"open_meteo": breaker}
+    }
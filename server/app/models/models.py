@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -42,6 +42,13 @@ class Report(Base):
     # Relationships
     user = relationship("User", back_populates="reports")
     upvotes = relationship("ReportUpvote", back_populates="report", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Listings: filter by type, newest first (the rowid/id rides along as tie-breaker)
+        Index("ix_reports_incident_type_created_at", "incident_type", "created_at"),
+        # Unfiltered listings and the clustering window
+        Index("ix_reports_created_at", "created_at"),
+    )
 
 
 class ReportUpvote(Base):
@@ -55,6 +62,11 @@ class ReportUpvote(Base):
     # Relationships
     report = relationship("Report", back_populates="upvotes")
     user = relationship("User")
+    
+    __table_args__ = (
+        # One upvote per user per report; also serves the (report_id, user_id) lookup
+        Index("uq_report_upvotes_report_id_user_id", "report_id", "user_id", unique=True),
+    )
 
 
 class Incident(Base):
@@ -72,3 +84,22 @@ class Incident(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Integer, default=1)
     report_count = Column(Integer, default=1)
+    
+    __table_args__ = (
+        # Active incidents by severity; NULL severity ranks as 0, as in the listing
+        Index("ix_incidents_is_active_severity", "is_active", func.coalesce(severity_score, 0.0)),
+        # Listings filtered by status or type, newest first
+        Index("ix_incidents_is_active_created_at", "is_active", "created_at"),
+        Index("ix_incidents_incident_type_created_at", "incident_type", "created_at"),
+        Index("ix_incidents_created_at", "created_at"),
+    )
+
+
+class RainfallSlot(Base):
+    """Precipitation observed in one weather grid cell during one time slot"""
+    __tablename__ = "rainfall_slots"
+    
+    cell_lat = Column(Integer, primary_key=True)
+    cell_lon = Column(Integer, primary_key=True)
+    slot = Column(Integer, primary_key=True)  # unix time // RAINFALL_SLOT_SECONDS
+    amount_mm = Column(Float, nullable=False, default=0.0)
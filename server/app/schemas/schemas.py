@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 
@@ -63,6 +63,10 @@ class ReportResponse(ReportBase):
         from_attributes = True
 
 
+class NearestReport(ReportResponse):
+    distance_meters: float
+
+
 class ReportUpdate(BaseModel):
     incident_type: Optional[IncidentType] = None
     description: Optional[str] = None
@@ -94,6 +98,10 @@ class IncidentResponse(IncidentBase):
         from_attributes = True
 
 
+class NearestIncident(IncidentResponse):
+    distance_meters: float
+
+
 class IncidentUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -102,9 +110,127 @@ class IncidentUpdate(BaseModel):
 
 
 # Statistics schemas
+class DailyReportStats(BaseModel):
+    date: str  # UTC day, YYYY-MM-DD
+    info_count: int
+    critical_count: int
+    warning_count: int
+    total_count: int
+
+
 class ReportStats(BaseModel):
     info_count: int
     critical_count: int
     warning_count: int
     total_count: int
     date: str
+    daily: List[DailyReportStats] = []
+
+
+# Map clustering schemas
+class ClusterCell(BaseModel):
+    quadkey: str
+    latitude: float  # centroid
+    longitude: float  # centroid
+    count: int
+    type_counts: Dict[str, int]
+
+
+class TileClusters(BaseModel):
+    zoom: int
+    x: int
+    y: int
+    quadkey: str
+    total_count: int
+    clusters: List[ClusterCell]
+
+
+class ViewportClusters(BaseModel):
+    zoom: int
+    total_count: int
+    tiles: List[TileClusters]
+
+
+# Route risk schemas
+class RoutePoint(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class RouteRiskRequest(BaseModel):
+    path: List[RoutePoint] = Field(..., min_length=2, max_length=2000)
+    sample_interval_meters: float = Field(100.0, ge=10.0)
+    speed_kmh: float = Field(40.0, ge=5.0, le=100.0)
+
+
+class RouteSegmentRisk(BaseModel):
+    start_index: int
+    end_index: int
+    distance_meters: float
+    max_risk: float
+    average_risk: float
+    risk_level: str  # "minimal", "low", "moderate", "high", "severe"
+    estimated_time_seconds: float
+
+
+class RouteRiskResponse(BaseModel):
+    total_distance_meters: float
+    overall_risk: float
+    max_risk: float
+    average_risk: float
+    risk_level: str
+    estimated_time_seconds: float
+    is_recommended: bool
+    sample_count: int
+    segments: List[RouteSegmentRisk]
+
+
+# Flood prediction schemas
+class PredictionPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class PredictionBounds(BaseModel):
+    min_lat: float = Field(..., ge=-90, le=90)
+    min_lon: float = Field(..., ge=-180, le=180)
+    max_lat: float = Field(..., ge=-90, le=90)
+    max_lon: float = Field(..., ge=-180, le=180)
+
+
+class FloodPredictionRequest(BaseModel):
+    points: Optional[List[PredictionPoint]] = None
+    bbox: Optional[PredictionBounds] = None
+    resolution_meters: float = Field(100.0, ge=10.0)
+
+    @model_validator(mode="after")
+    def check_locations(self):
+        if (self.points is None) == (self.bbox is None):
+            raise ValueError("Provide either points or bbox")
+        if self.bbox is not None and (
+            self.bbox.min_lat > self.bbox.max_lat or self.bbox.min_lon > self.bbox.max_lon
+        ):
+            raise ValueError("bbox min values must not exceed max values")
+        return self
+
+
+# Safety handbook schemas
+class SafetyTip(BaseModel):
+    title: str
+    description: str
+    priority: str  # "high", "medium", "low"
+
+
+class HandbookRequest(BaseModel):
+    weather_description: str
+    temperature: float
+    precipitation: float
+    rain: float
+    latitude: float
+    longitude: float
+
+
+class HandbookResponse(BaseModel):
+    weather_summary: str
+    safety_tips: List[SafetyTip]
+    flood_risk_level: str  # "low", "moderate", "high", "severe"
@@ -0,0 +1,455 @@
+"""
+Streaming leader-follower clustering of reports into incidents.
+
+Every new report is matched against the incident disc index and the
+unclustered ("pending") reports around it through a grid hash, so ingest
+costs O(neighbors) instead of reclustering the world:
+
+- a report inside an active incident's affected area joins it, moving the
+  centroid and bumping report_count / severity_score in place;
+- otherwise it waits as pending, and once CLUSTER_MIN_REPORTS pending reports
+  fall within CLUSTER_RADIUS_METERS of each other they are promoted to a new
+  incident.
+
+Pending reports older than CLUSTER_WINDOW_MINUTES are ignored.
+
+The in-memory change is made before the incident is written and is reverted
+if the write fails, so the clusterer never counts a report the database does
+not. Ingests hold `ingest_lock` from observe() through bind(): the database
+calls in between yield the event loop, and a report arriving meanwhile must
+join the incident being promoted rather than the pending reports it replaces.
+"""
+import asyncio
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Report, Incident, IncidentType
+from app.services.geo_math import EARTH_RADIUS_METERS, bounding_box, haversine_distance
+from app.services.geo_services import cluster_severity, cluster_title
+from app.services.incident_index import IncidentDiscIndex, incident_index
+from app.services.knn_index import sync_incident
+
+Cell = Tuple[int, int]
+
+
+@dataclass
+class IncidentCluster:
+    """In-memory view of an incident that reports can join"""
+    latitude: float
+    longitude: float
+    radius: float
+    report_count: int
+    type_counts: Dict[IncidentType, int] = field(default_factory=dict)
+    incident_id: Optional[int] = None
+    # Reports folded in since startup, so deleting one can take it back out
+    members: Dict[int, "PendingReport"] = field(default_factory=dict)
+
+    @property
+    def incident_type(self) -> IncidentType:
+        return max(self.type_counts, key=self.type_counts.get)
+
+    @property
+    def severity_score(self) -> float:
+        return cluster_severity(self.report_count, self.incident_type)
+
+    def add(self, report: "PendingReport"):
+        """Fold one report into the running centroid and type counts"""
+        self.report_count += 1
+        self.latitude += (report.latitude - self.latitude) / self.report_count
+        self.longitude += (report.longitude - self.longitude) / self.report_count
+        self.type_counts[report.incident_type] = self.type_counts.get(report.incident_type, 0) + 1
+        self.members[report.report_id] = report
+
+    def remove(self, report_id: int) -> bool:
+        """
+        Undo add() for a member report. An incident keeps its last report, so
+        removing that one only forgets the membership. Returns whether the
+        centroid and counts changed.
+        """
+        report = self.members.pop(report_id, None)
+        if report is None or self.report_count <= 1:
+            return False
+        self.report_count -= 1
+        self.latitude -= (report.latitude - self.latitude) / self.report_count
+        self.longitude -= (report.longitude - self.longitude) / self.report_count
+        remaining = self.type_counts.get(report.incident_type, 0) - 1
+        if remaining > 0:
+            self.type_counts[report.incident_type] = remaining
+        elif len(self.type_counts) > 1:
+            self.type_counts.pop(report.incident_type, None)
+        return True
+
+
+@dataclass
+class PendingReport:
+    report_id: int
+    latitude: float
+    longitude: float
+    incident_type: IncidentType
+    created_at: datetime
+
+
+class IncidentClusterer:
+    """Grid-hashed leader-follower clusterer; see module docstring"""
+
+    def __init__(
+        self,
+        radius_meters: float,
+        min_reports: int,
+        window: timedelta,
+        index: IncidentDiscIndex
+    ):
+        self.radius_meters = radius_meters
+        self.min_reports = min_reports
+        self.window = window
+        self._cell_degrees = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+        self._incidents: Dict[int, IncidentCluster] = {}
+        self._index = index
+        self._pending: Dict[Cell, List[PendingReport]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return (
+            math.floor(latitude / self._cell_degrees),
+            math.floor(longitude / self._cell_degrees),
+        )
+
+    def _cells_around(self, latitude: float, longitude: float, radius_meters: float) -> Iterator[Cell]:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_meters)
+        lat_lo, lon_lo = self._cell(min_lat, min_lon)
+        lat_hi, lon_hi = self._cell(max_lat, max_lon)
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lon_lo, lon_hi + 1):
+                yield (i, j)
+
+    def _covering_incident(self, latitude: float, longitude: float) -> Optional[IncidentCluster]:
+        """Closest tracked incident whose affected area contains the point"""
+        for incident_id, _ in self._index.covering(latitude, longitude):
+            cluster = self._incidents.get(incident_id)
+            if cluster is not None:
+                return cluster
+        return None
+
+    def _pending_neighbors(self, report: PendingReport) -> List[PendingReport]:
+        cutoff = report.created_at - self.window
+        neighbors = []
+        for cell in self._cells_around(report.latitude, report.longitude, self.radius_meters):
+            bucket = self._pending.get(cell)
+            if not bucket:
+                continue
+            # Expire stale pending reports lazily as their cells are visited
+            bucket[:] = [p for p in bucket if p.created_at >= cutoff]
+            if not bucket:
+                del self._pending[cell]
+                continue
+            neighbors.extend(
+                p for p in bucket
+                if haversine_distance(report.latitude, report.longitude, p.latitude, p.longitude) <= self.radius_meters
+            )
+        return neighbors
+
+    def _place(self, cluster: IncidentCluster):
+        self._index.upsert(cluster.incident_id, cluster.latitude, cluster.longitude, cluster.radius)
+
+    def observe(
+        self,
+        report_id: int,
+        latitude: float,
+        longitude: float,
+        incident_type: IncidentType,
+        created_at: datetime
+    ) -> Optional[IncidentCluster]:
+        """
+        Fold one report into the clustering. Returns the cluster whose incident
+        must be written (incident_id is None for a newly promoted cluster, which
+        the caller must then bind()), or None if the report is still pending.
+        """
+        report = PendingReport(report_id, latitude, longitude, IncidentType(incident_type), created_at)
+
+        with self._lock:
+            cluster = self._covering_incident(latitude, longitude)
+            if cluster is not None:
+                cluster.add(report)
+                self._place(cluster)
+                return cluster
+
+            neighbors = self._pending_neighbors(report)
+
+            if len(neighbors) + 1 < self.min_reports:
+                self._pending[self._cell(latitude, longitude)].append(report)
+                return None
+
+            # Promote the neighborhood to a new incident
+            for neighbor in neighbors:
+                self._pending[self._cell(neighbor.latitude, neighbor.longitude)].remove(neighbor)
+
+            members = neighbors + [report]
+            type_counts: Dict[IncidentType, int] = {}
+            for member in members:
+                type_counts[member.incident_type] = type_counts.get(member.incident_type, 0) + 1
+
+            return IncidentCluster(
+                latitude=sum(m.latitude for m in members) / len(members),
+                longitude=sum(m.longitude for m in members) / len(members),
+                radius=self.radius_meters,
+                report_count=len(members),
+                type_counts=type_counts,
+                members={member.report_id: member for member in members},
+            )
+
+    def revert(self, cluster: IncidentCluster, report_id: int):
+        """
+        Undo the observe() that returned `cluster` after its incident failed to
+        be written: a promoted cluster hands its members back to the pending
+        reports, a joined one drops the report again.
+        """
+        with self._lock:
+            if cluster.incident_id is None:
+                for member in cluster.members.values():
+                    self._pending[self._cell(member.latitude, member.longitude)].append(member)
+                return
+            if cluster.remove(report_id) and self._incidents.get(cluster.incident_id) is cluster:
+                self._place(cluster)
+
+    def forget_report(
+        self,
+        report_id: int,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> Optional[IncidentCluster]:
+        """
+        Drop a deleted report from the clustering: a pending report no longer
+        counts toward promoting an incident, and a report that went into an
+        incident is taken back out of its centroid and counts. With its
+        coordinates only its cell is searched for pending reports. Returns the
+        cluster whose incident must be rewritten, if any.
+        """
+        with self._lock:
+            for cluster in self._incidents.values():
+                if report_id in cluster.members:
+                    if not cluster.remove(report_id):
+                        return None
+                    self._place(cluster)
+                    return cluster
+
+            if latitude is not None and longitude is not None:
+                cells = [self._cell(latitude, longitude)]
+            else:
+                cells = list(self._pending)
+            for cell in cells:
+                bucket = self._pending.get(cell)
+                if not bucket:
+                    continue
+                remaining = [p for p in bucket if p.report_id != report_id]
+                if len(remaining) == len(bucket):
+                    continue
+                if remaining:
+                    bucket[:] = remaining
+                else:
+                    del self._pending[cell]
+                return None
+        return None
+
+    def bind(self, cluster: IncidentCluster, incident_id: int):
+        """Start tracking a promoted cluster under its new incident id"""
+        with self._lock:
+            cluster.incident_id = incident_id
+            self._incidents[incident_id] = cluster
+            self._place(cluster)
+
+    def track_incident(self, incident: Incident):
+        """Track (or refresh) an incident so new reports can join it"""
+        if not incident.is_active:
+            self.drop_incident(incident.id)
+            return
+
+        with self._lock:
+            cluster = self._incidents.get(incident.id)
+            report_count = incident.report_count or 1
+            radius = incident.affected_area_radius or self.radius_meters
+            if cluster is None:
+                cluster = IncidentCluster(
+                    latitude=incident.latitude,
+                    longitude=incident.longitude,
+                    radius=radius,
+                    report_count=report_count,
+                    type_counts={IncidentType(incident.incident_type): report_count},
+                    incident_id=incident.id,
+                )
+                self._incidents[incident.id] = cluster
+            else:
+                # Refresh in place: a report being ingested may hold this cluster
+                cluster.latitude = incident.latitude
+                cluster.longitude = incident.longitude
+                cluster.radius = radius
+                cluster.report_count = report_count
+            self._place(cluster)
+
+    def drop_incident(self, incident_id: int):
+        """Stop routing reports to an incident (deactivated or deleted)"""
+        with self._lock:
+            self._incidents.pop(incident_id, None)
+            self._index.remove(incident_id)
+
+    def load(self, db: Session, now: Optional[datetime] = None):
+        """Rebuild state from active incidents and recent reports"""
+        now = now or datetime.utcnow()
+
+        with self._lock:
+            self._incidents.clear()
+            self._index.clear()
+            self._pending.clear()
+
+        cutoff = now - self.window
+        closed = []
+        for incident in db.query(Incident).filter(
+            or_(Incident.is_active == 1, Incident.updated_at >= cutoff)
+        ):
+            if incident.is_active:
+                self.track_incident(incident)
+            else:
+                closed.append(incident)
+
+        def absorbed(report: Report) -> bool:
+            """Whether a report already went into an incident before restart"""
+            if self._covering_incident(report.latitude, report.longitude) is not None:
+                return True
+            return any(
+                haversine_distance(report.latitude, report.longitude, i.latitude, i.longitude)
+                <= (i.affected_area_radius or self.radius_meters)
+                for i in closed
+            )
+
+        recent = db.query(Report).filter(Report.created_at >= cutoff).order_by(Report.created_at)
+
+        with self._lock:
+            for report in recent:
+                if absorbed(report):
+                    continue
+                self._pending[self._cell(report.latitude, report.longitude)].append(
+                    PendingReport(
+                        report.id,
+                        report.latitude,
+                        report.longitude,
+                        IncidentType(report.incident_type),
+                        report.created_at,
+                    )
+                )
+
+
+incident_clusterer = IncidentClusterer(
+    radius_meters=settings.CLUSTER_RADIUS_METERS,
+    min_reports=settings.CLUSTER_MIN_REPORTS,
+    window=timedelta(minutes=settings.CLUSTER_WINDOW_MINUTES),
+    index=incident_index,
+)
+
+# Held by callers around ingest_report() and remove_report(); see module docstring
+ingest_lock = asyncio.Lock()
+
+
+def _write_incident(db: Session, cluster: IncidentCluster, clusterer: IncidentClusterer) -> Optional[Incident]:
+    """Insert or update the incident for an observed cluster; None if it is gone"""
+    if cluster.incident_id is None:
+        incident = Incident(
+            title=cluster_title(cluster.incident_type, cluster.report_count),
+            incident_type=cluster.incident_type,
+            latitude=cluster.latitude,
+            longitude=cluster.longitude,
+            description=f"Clustered from {cluster.report_count} reports",
+            severity_score=cluster.severity_score,
+            affected_area_radius=cluster.radius,
+            report_count=cluster.report_count,
+        )
+        db.add(incident)
+        db.commit()
+        clusterer.bind(cluster, incident.id)
+        db.refresh(incident)
+        return incident
+
+    incident = db.query(Incident).filter(Incident.id == cluster.incident_id).first()
+    if incident is None or not incident.is_active:
+        return None
+
+    incident.latitude = cluster.latitude
+    incident.longitude = cluster.longitude
+    incident.report_count = cluster.report_count
+    incident.incident_type = cluster.incident_type
+    # Never downgrade a score set by a responder
+    incident.severity_score = max(incident.severity_score or 0.0, cluster.severity_score)
+    incident.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(incident)
+    return incident
+
+
+def ingest_report(
+    db: Session,
+    report: Report,
+    clusterer: IncidentClusterer = incident_clusterer
+) -> Optional[Incident]:
+    """
+    Run a freshly committed report through the clusterer and persist the
+    resulting incident change. Returns the created or updated incident.
+    Callers hold `ingest_lock`.
+    """
+    cluster = clusterer.observe(
+        report.id,
+        report.latitude,
+        report.longitude,
+        report.incident_type,
+        report.created_at or datetime.utcnow(),
+    )
+    if cluster is None:
+        return None
+
+    try:
+        incident = _write_incident(db, cluster, clusterer)
+    except Exception:
+        db.rollback()
+        clusterer.revert(cluster, report.id)
+        raise
+
+    if incident is None:
+        # Incident went away behind our back; forget it and retry as pending
+        clusterer.drop_incident(cluster.incident_id)
+        return ingest_report(db, report, clusterer)
+
+    sync_incident(incident)
+    return incident
+
+
+def remove_report(
+    db: Session,
+    report_id: int,
+    latitude: float,
+    longitude: float,
+    clusterer: IncidentClusterer = incident_clusterer
+) -> Optional[Incident]:
+    """
+    Take a deleted report out of the clustering and rewrite the incident it
+    had joined. Returns that incident, if any. Callers hold `ingest_lock`.
+    """
+    cluster = clusterer.forget_report(report_id, latitude, longitude)
+    if cluster is None:
+        return None
+
+    incident = db.query(Incident).filter(Incident.id == cluster.incident_id).first()
+    if incident is None:
+        return None
+
+    incident.latitude = cluster.latitude
+    incident.longitude = cluster.longitude
+    incident.report_count = cluster.report_count
+    incident.incident_type = cluster.incident_type
+    incident.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(incident)
+    sync_incident(incident)
+    return incident
@@ -0,0 +1,239 @@
+"""
+Server-side inference for the flood probability and depth RandomForests.
+
+The pickled scikit-learn forests (see models/README.md) are loaded once and
+every tree is flattened into shared contiguous node arrays. Nodes are
+renumbered breadth-first so siblings are adjacent, making a step
+next = children[node] + (x > threshold[node]), and leaves point at themselves
+with an infinite threshold. A batch is evaluated by stepping all (row, tree)
+cursors one level at a time for max_depth iterations: the Python loop runs per
+tree level, never per row or per tree.
+
+The flattened arrays are cached next to the pickles as an .npz file, so
+scikit-learn is only needed the first time (or after the pickles change).
+"""
+import logging
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Feature order used in training (scripts/convert_models_to_tflite.py)
+FEATURE_COLUMNS = [
+    "elevation", "slope", "flow_accumulation",
+    "dist_to_road", "population", "dist_to_landslide",
+]
+
+PROBABILITY_MODEL_FILE = "flood_probability_model.pkl"
+DEPTH_MODEL_FILE = "flood_depth_model.pkl"
+SCALER_FILE = "feature_scaler.pkl"
+CACHE_FILE = "flood_model_arrays.npz"
+
+# (row, tree) cursors advanced per step; bounds the working set of a batch
+_CURSORS_PER_CHUNK = 1 << 16
+
+
+@dataclass
+class FlattenedForest:
+    """All trees of a forest in one set of node arrays (indices are global)"""
+    feature: np.ndarray    # int32, feature tested at each node (0 at leaves)
+    threshold: np.ndarray  # float64, go left if x <= threshold (+inf at leaves)
+    children: np.ndarray   # int32, left child; the right child is children + 1 (the node itself at leaves)
+    value: np.ndarray      # float64, prediction of each node
+    roots: np.ndarray      # int32, root node of each tree
+    max_depth: int
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "FlattenedForest":
+        """Flatten a fitted RandomForestRegressor or (binary) RandomForestClassifier"""
+        features, thresholds, children, values, roots = [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            left, right = tree.children_left, tree.children_right
+
+            # Breadth-first renumbering puts every pair of siblings side by side
+            order = [0]
+            for node in order:
+                if left[node] != -1:
+                    order.extend((left[node], right[node]))
+            order = np.asarray(order)
+            position = np.empty(tree.node_count, dtype=np.int64)
+            position[order] = np.arange(len(order)) + offset
+
+            leaf = left[order] == -1
+            if tree.value.shape[2] > 1:
+                # Classifier: fraction of samples in the positive class
+                class_weights = tree.value[order, 0, :]
+                node_value = class_weights[:, -1] / class_weights.sum(axis=1)
+            else:
+                node_value = tree.value[order, 0, 0]
+
+            features.append(np.where(leaf, 0, tree.feature[order]))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold[order]))
+            children.append(np.where(leaf, position[order], position[np.maximum(left[order], 0)]))
+            values.append(node_value)
+            roots.append(offset)
+            max_depth = max(max_depth, int(tree.max_depth))
+            offset += len(order)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+        )
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Mean leaf value over all trees for each row of an (N, n_features) array"""
+        n_rows, n_features = features.shape
+        n_trees = len(self.roots)
+        predictions = np.empty(n_rows)
+        chunk = max(1, _CURSORS_PER_CHUNK // n_trees)
+
+        for start in range(0, n_rows, chunk):
+            block = features[start:start + chunk]
+            flat = block.ravel()
+            row_offsets = (np.arange(len(block), dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (len(block), n_trees)).copy()
+
+            for _ in range(self.max_depth):
+                x = flat[row_offsets + self.feature[nodes]]
+                nodes = self.children[nodes] + (x > self.threshold[nodes])
+
+            predictions[start:start + len(block)] = self.value[nodes].mean(axis=1)
+        return predictions
+
+    def arrays(self, prefix: str) -> dict:
+        return {
+            f"{prefix}_feature": self.feature,
+            f"{prefix}_threshold": self.threshold,
+            f"{prefix}_children": self.children,
+            f"{prefix}_value": self.value,
+            f"{prefix}_roots": self.roots,
+            f"{prefix}_max_depth": np.array(self.max_depth),
+        }
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str) -> "FlattenedForest":
+        return cls(
+            feature=data[f"{prefix}_feature"],
+            threshold=data[f"{prefix}_threshold"],
+            children=data[f"{prefix}_children"],
+            value=data[f"{prefix}_value"],
+            roots=data[f"{prefix}_roots"],
+            max_depth=int(data[f"{prefix}_max_depth"]),
+        )
+
+
+class FloodModel:
+    """Scaler + probability forest + depth forest"""
+
+    def __init__(
+        self,
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        probability_forest: FlattenedForest,
+        depth_forest: FlattenedForest
+    ):
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.probability_forest = probability_forest
+        self.depth_forest = depth_forest
+
+    def predict_batch(self, features) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Flood probability in [0, 1] and depth in meters (>= 0) for each row
+        of an (N, len(FEATURE_COLUMNS)) array of raw (unscaled) features.
+        """
+        raw = np.asarray(features, dtype=np.float64)
+        if raw.ndim != 2 or raw.shape[1] != len(FEATURE_COLUMNS):
+            raise ValueError(f"Expected features of shape (N, {len(FEATURE_COLUMNS)}), got {raw.shape}")
+
+        # scikit-learn compares float32 inputs against float64 thresholds
+        scaled = ((raw - self.scaler_mean) / self.scaler_scale).astype(np.float32).astype(np.float64)
+        probability = np.clip(self.probability_forest.predict(scaled), 0.0, 1.0)
+        depth = np.maximum(self.depth_forest.predict(scaled), 0.0)
+        return probability, depth
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            scaler_mean=self.scaler_mean,
+            scaler_scale=self.scaler_scale,
+            **self.probability_forest.arrays("probability"),
+            **self.depth_forest.arrays("depth"),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "FloodModel":
+        with np.load(path) as data:
+            return cls(
+                scaler_mean=data["scaler_mean"],
+                scaler_scale=data["scaler_scale"],
+                probability_forest=FlattenedForest.from_arrays(data, "probability"),
+                depth_forest=FlattenedForest.from_arrays(data, "depth"),
+            )
+
+
+def _load_pickle(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_flood_model(model_dir: str) -> FloodModel:
+    """
+    Load the flattened model from the .npz cache, rebuilding it from the
+    pickles when they are newer. Raises FileNotFoundError if neither exists.
+    """
+    pickle_paths = [os.path.join(model_dir, name) for name in (PROBABILITY_MODEL_FILE, DEPTH_MODEL_FILE, SCALER_FILE)]
+    cache_path = os.path.join(model_dir, CACHE_FILE)
+
+    have_pickles = all(os.path.exists(path) for path in pickle_paths)
+    if os.path.exists(cache_path) and (
+        not have_pickles or os.path.getmtime(cache_path) >= max(os.path.getmtime(p) for p in pickle_paths)
+    ):
+        return FloodModel.load(cache_path)
+    if not have_pickles:
+        raise FileNotFoundError(f"Flood model files not found in {model_dir}")
+
+    probability_model, depth_model, scaler = (_load_pickle(path) for path in pickle_paths)
+    model = FloodModel(
+        scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+        probability_forest=FlattenedForest.from_sklearn(probability_model),
+        depth_forest=FlattenedForest.from_sklearn(depth_model),
+    )
+    try:
+        model.save(cache_path)
+    except OSError:
+        logger.warning("Could not write flood model cache to %s", cache_path)
+    return model
+
+
+_model: Optional[FloodModel] = None
+_model_lock = threading.Lock()
+
+
+def get_flood_model() -> FloodModel:
+    """The process-wide model, loaded on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_flood_model(settings.MODEL_DIR)
+    return _model
+
+
+def predict_batch(features) -> Tuple[np.ndarray, np.ndarray]:
+    """(probability, depth) arrays for an (N, 6) array of raw features"""
+    return get_flood_model().predict_batch(features)
@@ -0,0 +1,108 @@
+"""
+Batch flood predictions for many locations.
+
+Features for all points are sampled from the memory-mapped rasters in one
+pass per layer, then scored with FloodModel.predict_batch in chunks of
+PREDICTION_CHUNK_SIZE rows. Results are produced as NDJSON lines chunk by
+chunk, so the first rows can be streamed while later chunks are computed.
+"""
+import json
+import math
+from typing import Iterator, Tuple
+import numpy as np
+from app.core.config import settings
+from app.schemas.schemas import FloodPredictionRequest
+from app.services.flood_model import FEATURE_COLUMNS, FloodModel
+from app.services.geo_math import EARTH_RADIUS_METERS
+from app.services.raster_service import raster_store
+from app.services.route_risk import risk_level
+
+# Fallbacks used by the client (lib/services/flood_risk_service.dart) when a
+# feature cannot be looked up
+FEATURE_DEFAULTS = {
+    "elevation": 0.0,
+    "slope": 0.0,
+    "flow_accumulation": 0.0,
+    "dist_to_road": 10000.0,
+    "population": 0.0,
+    "dist_to_landslide": 100000.0,
+}
+
+# Count-like layers are not interpolated
+_NEAREST_LAYERS = {"flow_accumulation", "population"}
+
+
+def extract_features(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    (N, len(FEATURE_COLUMNS)) raw feature matrix. Each column is sampled from
+    the raster layer of the same name (distance features come from
+    precomputed distance rasters); missing layers or pixels use the defaults.
+    """
+    features = np.empty((len(latitudes), len(FEATURE_COLUMNS)))
+    for column, name in enumerate(FEATURE_COLUMNS):
+        if raster_store.has_layer(name):
+            method = "nearest" if name in _NEAREST_LAYERS else "bilinear"
+            values = raster_store.sample(name, latitudes, longitudes, method)
+            features[:, column] = np.where(np.isnan(values), FEATURE_DEFAULTS[name], values)
+        else:
+            features[:, column] = FEATURE_DEFAULTS[name]
+    return features
+
+
+def grid_points(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    resolution_meters: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell centers of a grid with roughly resolution_meters spacing over a bbox"""
+    lat_step = math.degrees(resolution_meters / EARTH_RADIUS_METERS)
+    mid_lat = math.radians((min_lat + max_lat) / 2)
+    lon_step = lat_step / max(math.cos(mid_lat), 1e-6)
+
+    rows = max(1, math.ceil((max_lat - min_lat) / lat_step))
+    cols = max(1, math.ceil((max_lon - min_lon) / lon_step))
+    if rows * cols > settings.PREDICTION_MAX_POINTS:
+        raise ValueError(
+            f"Grid needs {rows * cols} points at {resolution_meters:g}m; "
+            f"the limit is {settings.PREDICTION_MAX_POINTS}. Use a coarser resolution."
+        )
+
+    lats = np.minimum(min_lat + (np.arange(rows) + 0.5) * lat_step, max_lat)
+    lons = np.minimum(min_lon + (np.arange(cols) + 0.5) * lon_step, max_lon)
+    grid_lats, grid_lons = np.meshgrid(lats, lons, indexing="ij")
+    return grid_lats.ravel(), grid_lons.ravel()
+
+
+def request_points(request: FloodPredictionRequest) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordinates to score for a request; raises ValueError if there are too many"""
+    if request.bbox is not None:
+        bbox = request.bbox
+        return grid_points(bbox.min_lat, bbox.min_lon, bbox.max_lat, bbox.max_lon, request.resolution_meters)
+
+    if len(request.points) > settings.PREDICTION_MAX_POINTS:
+        raise ValueError(f"At most {settings.PREDICTION_MAX_POINTS} points can be scored per request")
+    latitudes = np.fromiter((p.latitude for p in request.points), dtype=np.float64, count=len(request.points))
+    longitudes = np.fromiter((p.longitude for p in request.points), dtype=np.float64, count=len(request.points))
+    return latitudes, longitudes
+
+
+def stream_predictions(model: FloodModel, latitudes: np.ndarray, longitudes: np.ndarray) -> Iterator[str]:
+    """NDJSON lines of predictions, one batched inference per chunk"""
+    chunk = settings.PREDICTION_CHUNK_SIZE
+    for start in range(0, len(latitudes), chunk):
+        lats = latitudes[start:start + chunk]
+        lons = longitudes[start:start + chunk]
+        probability, depth = model.predict_batch(extract_features(lats, lons))
+
+        yield "".join(
+            json.dumps({
+                "latitude": lat,
+                "longitude": lon,
+                "flood_probability": p,
+                "flood_depth": d,
+                "risk_level": risk_level(p),
+            }) + "\n"
+            for lat, lon, p, d in zip(lats.tolist(), lons.tolist(), probability.tolist(), depth.tolist())
+        )
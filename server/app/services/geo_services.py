@@ -1,27 +1,8 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.models.models import Report, Incident, IncidentType
-from math import radians, cos, sin, asin, sqrt
-
-
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees).
-    Returns distance in meters.
-    """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    
-    # Radius of earth in meters
-    r = 6371000
-    return c * r
+from app.services.geo_math import nearest_within_radius
+from app.services.spatial_index import filter_reports_in_radius_bbox
 
 
 def find_nearby_reports(
@@ -32,23 +13,25 @@ def find_nearby_reports(
     incident_type: Optional[IncidentType] = None
 ) -> List[Report]:
     """
-    Find reports within a certain radius of a given location.
+    Find reports within a certain radius of a given location, closest first.
     """
-    query = db.query(Report)
+    query = filter_reports_in_radius_bbox(db.query(Report), latitude, longitude, radius_meters)
     
     if incident_type:
         query = query.filter(Report.incident_type == incident_type)
     
-    all_reports = query.all()
+    candidates = query.all()
     
-    # Filter by distance
-    nearby_reports = []
-    for report in all_reports:
-        distance = haversine_distance(latitude, longitude, report.latitude, report.longitude)
-        if distance <= radius_meters:
-            nearby_reports.append(report)
+    # Filter bounding-box candidates by exact distance
+    order, _ = nearest_within_radius(
+        latitude,
+        longitude,
+        [report.latitude for report in candidates],
+        [report.longitude for report in candidates],
+        radius_meters
+    )
     
-    return nearby_reports
+    return [candidates[i] for i in order]
 
 
 def cluster_reports_to_incident(
@@ -73,21 +56,14 @@ def cluster_reports_to_incident(
     
     incident_type = max(type_counts, key=type_counts.get)
     
-    # Calculate severity based on report count and types
-    severity_score = len(reports) * 10
-    if incident_type == IncidentType.CRITICAL:
-        severity_score *= 2
-    elif incident_type == IncidentType.WARNING:
-        severity_score *= 1.5
-    
     # Create incident
     incident = Incident(
-        title=f"{incident_type.value.title()} Incident - {len(reports)} reports",
+        title=cluster_title(incident_type, len(reports)),
         incident_type=incident_type,
         latitude=avg_lat,
         longitude=avg_lon,
         description=f"Clustered from {len(reports)} reports",
-        severity_score=min(severity_score, 100),
+        severity_score=cluster_severity(len(reports), incident_type),
         report_count=len(reports)
     )
     
@@ -98,6 +74,25 @@ def cluster_reports_to_incident(
     return incident
 
 
+def cluster_severity(report_count: int, incident_type: IncidentType) -> float:
+    """
+    Severity of a report cluster based on report count and majority type.
+    Returns a score between 0-100.
+    """
+    severity_score = report_count * 10
+    if incident_type == IncidentType.CRITICAL:
+        severity_score *= 2
+    elif incident_type == IncidentType.WARNING:
+        severity_score *= 1.5
+    
+    return min(severity_score, 100.0)
+
+
+def cluster_title(incident_type: IncidentType, report_count: int) -> str:
+    """Display title for an incident promoted from a report cluster"""
+    return f"{incident_type.value.title()} Incident - {report_count} reports"
+
+
 def calculate_incident_severity(
     report_count: int,
     incident_type: IncidentType,
@@ -0,0 +1,696 @@
+"""
+Gemini-generated safety handbooks with a shared response cache.
+
+Handbooks for nearby users in similar weather are interchangeable, so each
+generated handbook is cached under bucketed conditions: the normalized
+weather description, rain and precipitation intensity bands, the temperature
+rounded to a degree, a HANDBOOK_CACHE_GRID_DEGREES location cell and the
+scenario mode. Concurrent misses for the same key share one generation.
+
+Generations use the SDK's async client so they never block the event loop;
+at most HANDBOOK_MAX_CONCURRENT_GENERATIONS run at once and each Gemini call
+is abandoned after HANDBOOK_GENERATION_TIMEOUT_SECONDS.
+
+When the storm scenario is switched on or off, schedule_prewarm() generates
+the handbooks for every risk tier in the location cells in and around every
+Pampanga municipality (HANDBOOK_PREWARM_CELL_RADIUS rings of cells) in the
+background, so the wave of requests that follows is served from the cache.
+Prewarm uses at most HANDBOOK_PREWARM_CONCURRENCY generation slots (always
+fewer than the global limit) and stops as soon as the scenario is toggled
+again; its in-flight generations are cancelled unless a user is waiting.
+
+stream_handbook() uses the streaming API and sends each safety tip as a
+server-sent event as soon as its JSON object is complete. A streaming
+generation is published through a HandbookBroadcast and registered in the
+same single-flight map, so concurrent streams and plain requests for one key
+share a single Gemini call.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import math
+import re
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+import google.generativeai as genai
+from app.core.cache import SingleFlight, TTLCache
+from app.core.config import settings
+from app.schemas.schemas import HandbookRequest, HandbookResponse, SafetyTip
+from app.services import weather_service
+
+# Import scenario module to check if storm scenario is active
+try:
+    from app.api import scenario
+except ImportError:
+    scenario = None
+
+logger = logging.getLogger(__name__)
+
+# Configure Gemini
+genai.configure(api_key=settings.GEMINI_API_KEY)
+
+GEMINI_MODEL = "gemini-flash-latest"
+
+# PAGASA rainfall intensity thresholds (mm/h): light, moderate, heavy, intense, torrential
+RAIN_BANDS_MM = (0.5, 2.5, 7.5, 15.0, 30.0)
+
+# One rain amount inside each band above: the risk tiers generated ahead of demand
+PREWARM_RAIN_MM = (0.0, 1.5, 5.0, 10.0, 20.0, 50.0)
+
+EMERGENCY_CONTEXT = """
+        
+🚨 EMERGENCY ALERT: A severe tropical storm (Typhoon Rosing) is currently approaching and expected to make landfall in 6 hours.
+Expected conditions:
+- Peak rainfall: 125mm/hour
+- Wind speeds: 110 km/h with gusts up to 145 km/h
+- Severe flood risk across low-lying areas
+- Multiple municipalities under evacuation orders
+
+This is an ACTIVE EMERGENCY SITUATION. Focus on IMMEDIATE life-saving actions.
+        """
+
+POST_STORM_CONTEXT = """
+
+✅ POST-STORM UPDATE: Typhoon Rosing has passed the area. Weather conditions are improving.
+Current situation:
+- Rain has stopped or significantly reduced
+- Winds are calming
+- Some areas may still have standing water
+- Flood waters are receding
+
+Focus on POST-DISASTER recovery and safety.
+        """
+
+
+def handbook_mode(rain: float) -> str:
+    """Prompt variant: emergency while the storm scenario is active, post_storm after it"""
+    if scenario and hasattr(scenario, 'is_scenario_active'):
+        if scenario.is_scenario_active():
+            return "emergency"
+        if hasattr(scenario, '_scenario_active') and not scenario._scenario_active and rain < 5:
+            return "post_storm"
+    return "normal"
+
+
+def rain_band(amount_mm: float) -> int:
+    return bisect.bisect_right(RAIN_BANDS_MM, amount_mm)
+
+
+def handbook_key(request: HandbookRequest, mode: str) -> Hashable:
+    size = settings.HANDBOOK_CACHE_GRID_DEGREES
+    return (
+        " ".join(request.weather_description.lower().split()),
+        rain_band(request.rain),
+        rain_band(request.precipitation),
+        round(request.temperature),
+        math.floor(request.latitude / size),
+        math.floor(request.longitude / size),
+        mode,
+    )
+
+
+def build_prompt(request: HandbookRequest, mode: str) -> str:
+    is_emergency = mode == "emergency"
+    is_post_storm = mode == "post_storm"
+    emergency_context = EMERGENCY_CONTEXT if is_emergency else (POST_STORM_CONTEXT if is_post_storm else "")
+
+    return f"""You are a flood safety expert in the Philippines. Based on the current weather conditions, generate a safety handbook with actionable tips.
+
+Current Weather:
+- Description: {request.weather_description}
+- Temperature: {request.temperature}°C
+- Precipitation: {request.precipitation}mm
+- Rain: {request.rain}mm
+- Location: {request.latitude}, {request.longitude}
+{emergency_context}
+
+Please provide:
+1. A brief weather summary (2-3 sentences){" - EMPHASIZE EMERGENCY SEVERITY" if is_emergency else (" - EMPHASIZE STORM HAS PASSED" if is_post_storm else "")}
+2. {"8-10 CRITICAL EMERGENCY ACTIONS" if is_emergency else ("6-8 POST-STORM RECOVERY ACTIONS" if is_post_storm else "5-7 specific safety tips")} based on these conditions
+3. Flood risk assessment (low/moderate/high/severe)
+
+Format your response as JSON with this structure:
+{{
+  "weather_summary": "Brief summary here",
+  "flood_risk_level": "low/moderate/high/severe",
+  "safety_tips": [
+    {{
+      "title": "Tip title",
+      "description": "Detailed description",
+      "priority": "high/medium/low"
+    }}
+  ]
+}}
+
+Focus on:
+{"- IMMEDIATE EVACUATION procedures" if is_emergency else ("- Damage assessment procedures" if is_post_storm else "- Flood preparedness and prevention")}
+{"- Life-threatening hazards to avoid" if is_emergency else ("- Post-flood health and safety hazards" if is_post_storm else "- Immediate actions to take")}
+{"- Emergency shelter locations" if is_emergency else ("- When it's safe to return home" if is_post_storm else "- What to avoid")}
+{"- Critical supplies needed NOW" if is_emergency else ("- Recovery resources and assistance" if is_post_storm else "- Emergency contacts and resources")}
+- Specific concerns for the Philippines (monsoon, typhoons, etc.)
+
+Make it {"URGENT, DIRECTIVE, and potentially life-saving" if is_emergency else ("REASSURING but cautious, focused on safe recovery" if is_post_storm else "practical, actionable, and relevant to the current weather conditions")}."""
+
+
+def parse_handbook(response_text: str) -> HandbookResponse:
+    """Model output -> HandbookResponse; raises json.JSONDecodeError if there is no JSON"""
+    # Try to find JSON in the response
+    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+    if json_match:
+        data = json.loads(json_match.group())
+    else:
+        # Fallback: try parsing the entire response
+        data = json.loads(response_text)
+
+    return HandbookResponse(
+        weather_summary=data.get("weather_summary", "Weather conditions monitored"),
+        safety_tips=[
+            SafetyTip(**tip) for tip in data.get("safety_tips", [])
+        ],
+        flood_risk_level=data.get("flood_risk_level", "moderate")
+    )
+
+
+class HandbookStreamParser:
+    """
+    Incrementally extracts the weather summary, the risk level and each
+    complete safety tip from the model's JSON as it streams in. Tips are
+    found by scanning the "safety_tips" array once, tracking object depth
+    and string/escape state, so each chunk costs only its own length.
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.text = ""
+        self.weather_summary: Optional[str] = None
+        self.flood_risk_level: Optional[str] = None
+        self.safety_tips: List[SafetyTip] = []
+        self._pos: Optional[int] = None  # scan position inside the tips array
+        self._depth = 0
+        self._object_start = 0
+        self._in_string = False
+        self._escape = False
+        self._tips_done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, dict]]:
+        """Append a chunk; returns the (event, data) pairs it completed"""
+        self.text += chunk
+        events = []
+        if self.weather_summary is None:
+            self.weather_summary = self._string_field("weather_summary")
+            if self.weather_summary is not None:
+                events.append(("summary", {"weather_summary": self.weather_summary}))
+        if self.flood_risk_level is None:
+            self.flood_risk_level = self._string_field("flood_risk_level")
+            if self.flood_risk_level is not None:
+                events.append(("risk", {"flood_risk_level": self.flood_risk_level}))
+        for tip in self._scan_tips():
+            self.safety_tips.append(tip)
+            events.append(("tip", tip.model_dump()))
+        return events
+
+    def _string_field(self, name: str) -> Optional[str]:
+        match = re.search(rf'"{name}"\s*:\s*"', self.text)
+        if not match:
+            return None
+        try:
+            value, _ = self._decoder.raw_decode(self.text, match.end() - 1)
+        except json.JSONDecodeError:
+            return None  # the string has not been closed yet
+        return value if isinstance(value, str) else None
+
+    def _scan_tips(self) -> List[SafetyTip]:
+        if self._tips_done:
+            return []
+        if self._pos is None:
+            match = re.search(r'"safety_tips"\s*:\s*\[', self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        tips = []
+        text = self.text
+        while self._pos < len(text) and not self._tips_done:
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        tips.append(SafetyTip(**json.loads(text[self._object_start:self._pos + 1])))
+                    except (json.JSONDecodeError, TypeError, ValueError):
+                        pass  # skip malformed tips
+            elif ch == "]" and self._depth == 0:
+                self._tips_done = True
+            self._pos += 1
+        return tips
+
+
+def fallback_handbook(request: HandbookRequest) -> HandbookResponse:
+    """Generic tips used when the model's answer cannot be parsed"""
+    return HandbookResponse(
+        weather_summary=f"Current weather: {request.weather_description} at {request.temperature}°C",
+        safety_tips=[
+            SafetyTip(
+                title="Stay Informed",
+                description="Monitor weather updates and official advisories from PAGASA.",
+                priority="high"
+            ),
+            SafetyTip(
+                title="Prepare Emergency Kit",
+                description="Keep food, water, flashlight, radio, and first aid supplies ready.",
+                priority="high"
+            ),
+            SafetyTip(
+                title="Know Evacuation Routes",
+                description="Familiarize yourself with local evacuation centers and routes.",
+                priority="medium"
+            ),
+            SafetyTip(
+                title="Avoid Flooded Areas",
+                description="Do not walk or drive through floodwaters. Just 6 inches can knock you down.",
+                priority="high"
+            ),
+            SafetyTip(
+                title="Secure Your Home",
+                description="Clear drainage systems and secure outdoor items that could be swept away.",
+                priority="medium"
+            )
+        ],
+        flood_risk_level="moderate" if request.rain > 5 else "low"
+    )
+
+
+# General tips served by /static-tips and when generation misses its deadline
+STATIC_TIPS = [
+    SafetyTip(
+        title="Monitor Weather Updates",
+        description="Stay tuned to PAGASA weather bulletins and local news for flood warnings and advisories.",
+        priority="high"
+    ),
+    SafetyTip(
+        title="Prepare Emergency Kit",
+        description="Keep a waterproof bag with essential items: flashlight, battery-powered radio, first aid kit, important documents, cash, non-perishable food, and drinking water.",
+        priority="high"
+    ),
+    SafetyTip(
+        title="Know Your Evacuation Plan",
+        description="Identify the nearest evacuation center and plan multiple routes to get there. Keep emergency contact numbers handy.",
+        priority="high"
+    ),
+    SafetyTip(
+        title="Never Walk or Drive Through Floods",
+        description="Just 15cm (6 inches) of moving water can knock you down. 60cm (2 feet) of water can sweep away most vehicles. Turn around, don't drown!",
+        priority="high"
+    ),
+    SafetyTip(
+        title="Secure Your Property",
+        description="Clear gutters and drains. Store valuables on higher floors. Move furniture and electronics away from windows and potential flood areas.",
+        priority="medium"
+    ),
+    SafetyTip(
+        title="Avoid Electrocution Hazards",
+        description="Stay away from downed power lines. Turn off electricity if flooding is imminent. Don't use electrical appliances if you're wet or standing in water.",
+        priority="high"
+    ),
+    SafetyTip(
+        title="Store Safe Drinking Water",
+        description="Fill clean containers with water before a flood. Flood water is contaminated and unsafe to drink. Boil water if supplies run low.",
+        priority="medium"
+    ),
+    SafetyTip(
+        title="Help Your Community",
+        description="Check on elderly neighbors and those with special needs. Share verified information through barangay channels.",
+        priority="low"
+    )
+]
+
+
+def static_handbook(request: HandbookRequest) -> HandbookResponse:
+    return HandbookResponse(
+        weather_summary=f"Current weather: {request.weather_description} at {request.temperature}°C",
+        safety_tips=STATIC_TIPS,
+        flood_risk_level="moderate" if request.rain > 5 else "low"
+    )
+
+
+handbook_cache: TTLCache[HandbookResponse] = TTLCache(
+    max_entries=settings.HANDBOOK_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.HANDBOOK_CACHE_TTL_SECONDS,
+)
+handbook_flights = SingleFlight()
+
+
+_generation_slots = asyncio.Semaphore(settings.HANDBOOK_MAX_CONCURRENT_GENERATIONS)
+
+
+async def _generate_text(prompt: str) -> str:
+    """One Gemini call through the async client, bounded by the global concurrency limit"""
+    async with _generation_slots:
+        model = genai.GenerativeModel(GEMINI_MODEL)
+        response = await asyncio.wait_for(
+            model.generate_content_async(prompt),
+            settings.HANDBOOK_GENERATION_TIMEOUT_SECONDS
+        )
+        return response.text
+
+
+async def _generate_and_cache(request: HandbookRequest, mode: str, key: Hashable) -> HandbookResponse:
+    response_text = await _generate_text(build_prompt(request, mode))
+    try:
+        handbook = parse_handbook(response_text)
+    except json.JSONDecodeError:
+        return fallback_handbook(request)
+    handbook_cache.set(key, handbook)
+    return handbook
+
+
+async def generate_handbook(request: HandbookRequest) -> HandbookResponse:
+    """
+    Cached handbook for the request's conditions. Parsed answers are cached;
+    the fallback tips are returned to the waiting callers but not cached.
+    A caller waits at most HANDBOOK_DEADLINE_SECONDS and then gets the static
+    tips, while the shared generation keeps running to fill the cache.
+    """
+    mode = handbook_mode(request.rain)
+    key = handbook_key(request, mode)
+    cached = handbook_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        return await asyncio.wait_for(handbook_flights.do(key, lambda: _generate_and_cache(request, mode, key)), settings.HANDBOOK_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Handbook generation missed its %ss deadline; serving static tips", settings.HANDBOOK_DEADLINE_SECONDS)
+        return static_handbook(request)
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def handbook_events(handbook: HandbookResponse, streamed: Optional[HandbookStreamParser] = None) -> List[str]:
+    """
+    A complete handbook as the same event sequence a generation produces.
+    With the parser of a partly streamed generation, only the events it has
+    not sent yet: the summary, risk and tips are never repeated.
+    """
+    events = []
+    if streamed is None or streamed.weather_summary is None:
+        events.append(sse_event("summary", {"weather_summary": handbook.weather_summary}))
+    if streamed is None or streamed.flood_risk_level is None:
+        events.append(sse_event("risk", {"flood_risk_level": handbook.flood_risk_level}))
+    if streamed is None or not streamed.safety_tips:
+        events.extend(sse_event("tip", tip.model_dump()) for tip in handbook.safety_tips)
+    events.append(sse_event("done", handbook.model_dump()))
+    return events
+
+
+def _keep_streamed(handbook: HandbookResponse, parser: HandbookStreamParser) -> HandbookResponse:
+    """A fallback handbook that agrees with the summary and risk already streamed"""
+    return handbook.model_copy(update={
+        "weather_summary": parser.weather_summary or handbook.weather_summary,
+        "flood_risk_level": parser.flood_risk_level or handbook.flood_risk_level,
+    })
+
+
+class HandbookBroadcast:
+    """
+    Events of one streaming generation. Every stream for the same key replays
+    them from the start and then follows along as new ones are published.
+    """
+
+    def __init__(self):
+        self.events: List[str] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str):
+        self.events.append(event)
+        self._notify()
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            if position < len(self.events):
+                position += 1
+                yield self.events[position - 1]
+            elif self.closed:
+                return
+            else:
+                await self._changed.wait()
+
+
+# Handbook key -> broadcast of the streaming generation in flight for it
+_broadcasts: Dict[Hashable, HandbookBroadcast] = {}
+
+
+async def _stream_generation(
+    request: HandbookRequest,
+    mode: str,
+    key: Hashable,
+    broadcast: HandbookBroadcast
+) -> HandbookResponse:
+    """
+    One streaming Gemini generation, published event by event. Runs as the
+    key's handbook_flights task, so generate_handbook() callers share it too:
+    it returns the handbook it ended with (cached if parsed) or raises after
+    publishing an "error" event.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    parser = HandbookStreamParser()
+
+    def publish_all(events: List[str]):
+        for event in events:
+            broadcast.publish(event)
+
+    def remaining() -> float:
+        limit = settings.HANDBOOK_GENERATION_TIMEOUT_SECONDS if parser.safety_tips else settings.HANDBOOK_DEADLINE_SECONDS
+        return max(started + limit - loop.time(), 0.0)
+
+    try:
+        try:
+            await asyncio.wait_for(_generation_slots.acquire(), remaining())
+        except asyncio.TimeoutError:
+            handbook = static_handbook(request)
+            publish_all(handbook_events(handbook))
+            return handbook
+
+        try:
+            model = genai.GenerativeModel(GEMINI_MODEL)
+            response = await asyncio.wait_for(
+                model.generate_content_async(build_prompt(request, mode), stream=True),
+                remaining()
+            )
+            chunks = response.__aiter__()
+            while True:
+                chunk = await asyncio.wait_for(anext(chunks, None), remaining())
+                if chunk is None:
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # chunk without text parts (e.g. finish metadata)
+                for event, data in parser.feed(text):
+                    broadcast.publish(sse_event(event, data))
+        except asyncio.TimeoutError:
+            if not parser.safety_tips:
+                logger.warning("Handbook stream missed its %ss deadline; serving static tips", settings.HANDBOOK_DEADLINE_SECONDS)
+                handbook = _keep_streamed(static_handbook(request), parser)
+                publish_all(handbook_events(handbook, parser))
+                return handbook
+            broadcast.publish(sse_event("error", {"detail": "Handbook generation timed out"}))
+            raise
+        except Exception as e:
+            broadcast.publish(sse_event("error", {"detail": f"Error generating handbook: {str(e)}"}))
+            raise
+        finally:
+            _generation_slots.release()
+
+        try:
+            handbook = parse_handbook(parser.text)
+        except json.JSONDecodeError:
+            handbook = None
+        if handbook is not None:
+            handbook_cache.set(key, handbook)
+        elif parser.safety_tips:
+            handbook = HandbookResponse(
+                weather_summary=parser.weather_summary or "Weather conditions monitored",
+                safety_tips=parser.safety_tips,
+                flood_risk_level=parser.flood_risk_level or "moderate"
+            )
+        else:
+            handbook = _keep_streamed(fallback_handbook(request), parser)
+        publish_all(handbook_events(handbook, parser))
+        return handbook
+    finally:
+        broadcast.close()
+        if _broadcasts.get(key) is broadcast:
+            del _broadcasts[key]
+
+
+async def stream_handbook(request: HandbookRequest) -> AsyncIterator[str]:
+    """
+    Server-sent events for a handbook: "summary", "risk" and one "tip" per
+    safety tip as soon as the model has finished writing it, then "done" with
+    the complete handbook (which is cached). Cached handbooks are replayed
+    at once, and concurrent streams for the same key follow one generation.
+    If no tip has arrived within HANDBOOK_DEADLINE_SECONDS the static tips
+    complete the stream instead; upstream failures end with an "error" event.
+    """
+    mode = handbook_mode(request.rain)
+    key = handbook_key(request, mode)
+    cached = handbook_cache.get(key)
+    if cached is not None:
+        for event in handbook_events(cached):
+            yield event
+        return
+
+    broadcast = _broadcasts.get(key)
+    if broadcast is None:
+        if key in handbook_flights:
+            # A non-streaming generation for these conditions is running; share it
+            try:
+                handbook = await generate_handbook(request)
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Error generating handbook: {str(e)}"})
+                return
+            for event in handbook_events(handbook):
+                yield event
+            return
+        broadcast = _broadcasts[key] = HandbookBroadcast()
+        handbook_flights.start(key, lambda: _stream_generation(request, mode, key, broadcast))
+
+    async for event in broadcast.follow():
+        yield event
+
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def _expected_conditions(latitude: float, longitude: float) -> dict:
+    """Weather the app will show at a location: scenario data, else cached or post-storm conditions"""
+    if scenario.is_scenario_active():
+        return scenario.get_scenario_weather_data(latitude, longitude)
+    cached = weather_service.current_weather_cache.get_stale(weather_service.weather_cell(latitude, longitude))
+    if cached is not None:
+        return cached[0]
+    return scenario.get_post_storm_weather_data(latitude, longitude)
+
+
+def prewarm_locations() -> List[Tuple[float, float]]:
+    """
+    Every handbook location cell within HANDBOOK_PREWARM_CELL_RADIUS cells of
+    a municipality, nearest ring first: the municipality's own position, then
+    the centers of the cells around it.
+    """
+    size = settings.HANDBOOK_CACHE_GRID_DEGREES
+    radius = settings.HANDBOOK_PREWARM_CELL_RADIUS
+    # Cell -> (ring, location to warm it with)
+    cells: Dict[Tuple[int, int], Tuple[int, Tuple[float, float]]] = {}
+    for location in scenario.PAMPANGA_LOCATIONS:
+        row = math.floor(location["lat"] / size)
+        col = math.floor(location["lon"] / size)
+        for i in range(row - radius, row + radius + 1):
+            for j in range(col - radius, col + radius + 1):
+                ring = max(abs(i - row), abs(j - col))
+                point = (location["lat"], location["lon"]) if ring == 0 else ((i + 0.5) * size, (j + 0.5) * size)
+                if (i, j) not in cells or ring < cells[(i, j)][0]:
+                    cells[(i, j)] = (ring, point)
+    return [point for _, point in sorted(cells.values(), key=lambda entry: entry[0])]
+
+
+def prewarm_requests() -> List[HandbookRequest]:
+    """Every risk tier in every prewarm location cell, with the conditions clients will send"""
+    requests = []
+    for latitude, longitude in prewarm_locations():
+        conditions = _expected_conditions(latitude, longitude)
+        for rain in PREWARM_RAIN_MM:
+            requests.append(HandbookRequest(
+                weather_description=conditions["description"],
+                temperature=conditions["temperature"],
+                precipitation=rain,
+                rain=rain,
+                latitude=latitude,
+                longitude=longitude
+            ))
+    return requests
+
+
+async def warm_handbook(request: HandbookRequest) -> bool:
+    """Generate and cache the handbook for a request unless it is cached; True if generated"""
+    mode = handbook_mode(request.rain)
+    key = handbook_key(request, mode)
+    if key in handbook_cache:
+        return False
+    # Cancelled with the prewarm unless a user request joined the generation
+    await handbook_flights.do(key, lambda: _generate_and_cache(request, mode, key), cancel_when_abandoned=True)
+    return True
+
+
+def prewarm_concurrency() -> int:
+    """Generation slots prewarm may use, always leaving some for user requests"""
+    return min(settings.HANDBOOK_PREWARM_CONCURRENCY, settings.HANDBOOK_MAX_CONCURRENT_GENERATIONS - 1)
+
+
+async def prewarm_handbooks(scenario_active: bool):
+    """
+    Warm every prewarm request with prewarm_concurrency() workers. Workers
+    stop once the scenario no longer matches the one this prewarm is for.
+    """
+    requests = iter(prewarm_requests())
+    generated = cached = failed = 0
+
+    async def worker():
+        nonlocal generated, cached, failed
+        for request in requests:
+            if scenario.is_scenario_active() != scenario_active:
+                return  # superseded by a newer toggle
+            try:
+                if await warm_handbook(request):
+                    generated += 1
+                else:
+                    cached += 1
+            except Exception as e:
+                failed += 1
+                logger.debug("Handbook prewarm generation failed: %s", e)
+
+    await asyncio.gather(*(worker() for _ in range(prewarm_concurrency())))
+    logger.info("Handbook prewarm: %d generated, %d already cached, %d failed", generated, cached, failed)
+
+
+def schedule_prewarm():
+    """Restart background pre-generation for the current scenario mode"""
+    global _prewarm_task
+    if _prewarm_task is not None and not _prewarm_task.done():
+        _prewarm_task.cancel()
+    if not settings.HANDBOOK_PREWARM_ENABLED or not settings.GEMINI_API_KEY or scenario is None:
+        return
+    if prewarm_concurrency() < 1:
+        return  # a single generation slot is reserved for user requests
+    _prewarm_task = asyncio.create_task(
+        prewarm_handbooks(scenario.is_scenario_active()),
+        name="handbook-prewarm"
+    )
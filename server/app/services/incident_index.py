@@ -0,0 +1,103 @@
+"""
+Reverse-radius index of active incident discs.
+
+Each incident's affected area (centroid + affected_area_radius) is rasterized
+onto a fixed lat/lon grid; every cell the disc touches points back at the
+incident. "Which incidents cover this point" is then one dict lookup plus an
+exact distance check on the few incidents registered in that cell.
+"""
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+from app.core.config import settings
+from app.services.geo_math import EARTH_RADIUS_METERS, bounding_box, haversine_distance
+
+Cell = Tuple[int, int]
+
+
+class IncidentDiscIndex:
+    """Grid of covered cells -> ids of the incident discs touching them"""
+
+    def __init__(self, cell_meters: float):
+        self._cell_degrees = math.degrees(cell_meters / EARTH_RADIUS_METERS)
+        self._cells: Dict[Cell, Set[int]] = defaultdict(set)
+        self._discs: Dict[int, Tuple[float, float, float, List[Cell]]] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return (
+            math.floor(latitude / self._cell_degrees),
+            math.floor(longitude / self._cell_degrees),
+        )
+
+    def _covered_cells(self, latitude: float, longitude: float, radius: float) -> List[Cell]:
+        """Cells whose rectangle intersects the disc"""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+        lat_lo, lon_lo = self._cell(min_lat, min_lon)
+        lat_hi, lon_hi = self._cell(max_lat, max_lon)
+        size = self._cell_degrees
+
+        cells = []
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lon_lo, lon_hi + 1):
+                # Closest point of the cell to the disc center
+                nearest_lat = min(max(latitude, i * size), (i + 1) * size)
+                nearest_lon = min(max(longitude, j * size), (j + 1) * size)
+                if haversine_distance(latitude, longitude, nearest_lat, nearest_lon) <= radius:
+                    cells.append((i, j))
+        return cells
+
+    def _remove_locked(self, incident_id: int):
+        disc = self._discs.pop(incident_id, None)
+        if disc is None:
+            return
+        for cell in disc[3]:
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(incident_id)
+                if not members:
+                    del self._cells[cell]
+
+    def upsert(self, incident_id: int, latitude: float, longitude: float, radius: float):
+        """Add an incident disc or move/resize an existing one"""
+        cells = self._covered_cells(latitude, longitude, radius)
+        with self._lock:
+            self._remove_locked(incident_id)
+            self._discs[incident_id] = (latitude, longitude, radius, cells)
+            for cell in cells:
+                self._cells[cell].add(incident_id)
+
+    def remove(self, incident_id: int):
+        with self._lock:
+            self._remove_locked(incident_id)
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._discs.clear()
+
+    def covering(self, latitude: float, longitude: float) -> List[Tuple[int, float]]:
+        """(incident_id, distance_meters) of every disc containing the point, closest first"""
+        with self._lock:
+            candidates = [
+                (incident_id, self._discs[incident_id])
+                for incident_id in self._cells.get(self._cell(latitude, longitude), ())
+            ]
+
+        hits = []
+        for incident_id, (disc_lat, disc_lon, radius, _) in candidates:
+            distance = haversine_distance(latitude, longitude, disc_lat, disc_lon)
+            if distance <= radius:
+                hits.append((incident_id, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._discs)
+
+    def __contains__(self, incident_id: int) -> bool:
+        return incident_id in self._discs
+
+
+incident_index = IncidentDiscIndex(cell_meters=settings.INCIDENT_INDEX_CELL_METERS)
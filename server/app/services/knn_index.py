@@ -0,0 +1,317 @@
+"""
+In-memory k-nearest-neighbor indexes for reports and incidents.
+
+Points are stored as 3D vectors on a sphere of the earth's radius, so chord
+length orders neighbors exactly like great-circle distance. Each incident type
+gets its own KD-tree. Writes land in a small brute-force buffer plus a set of
+stale ids, and the trees are rebuilt off the request path once the buffer
+grows or KNN_REBUILD_SECONDS passes. A query costs O(log n + k) tree work
+plus a scan of the bounded buffer; it does not grow with table size.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Report, Incident, IncidentType
+from app.services.geo_math import EARTH_RADIUS_METERS
+
+logger = logging.getLogger(__name__)
+
+
+def _to_xyz(latitudes, longitudes) -> np.ndarray:
+    phi = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lam = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return EARTH_RADIUS_METERS * np.stack(
+        [cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)], axis=-1
+    )
+
+
+def _chord_to_arc(chord: float) -> float:
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(chord / (2 * EARTH_RADIUS_METERS), 1.0))
+
+
+def _arc_to_chord(arc: float) -> float:
+    return 2 * EARTH_RADIUS_METERS * math.sin(min(arc / (2 * EARTH_RADIUS_METERS), math.pi / 2))
+
+
+class KDTree:
+    """Static bucketed KD-tree over (N, 3) points with bounding boxes per node"""
+
+    LEAF_SIZE = 32
+
+    def __init__(self, points: np.ndarray):
+        self._perm = np.arange(len(points))
+        lows, highs, starts, ends, lefts, rights = [], [], [], [], [], []
+
+        def new_node(start: int, end: int) -> int:
+            block = points[self._perm[start:end]]
+            lows.append(block.min(axis=0))
+            highs.append(block.max(axis=0))
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            return len(starts) - 1
+
+        if len(points):
+            stack = [new_node(0, len(points))]
+            while stack:
+                node = stack.pop()
+                start, end = starts[node], ends[node]
+                if end - start <= self.LEAF_SIZE:
+                    continue
+
+                # Split on the widest axis at the median
+                axis = int(np.argmax(highs[node] - lows[node]))
+                mid = (start + end) // 2
+                segment = self._perm[start:end]
+                order = np.argpartition(points[segment, axis], mid - start)
+                self._perm[start:end] = segment[order]
+
+                lefts[node] = new_node(start, mid)
+                rights[node] = new_node(mid, end)
+                stack.extend((lefts[node], rights[node]))
+
+        # Leaves scan contiguous slices of the permuted points
+        self._points = points[self._perm]
+        self._lows = [tuple(low) for low in lows]
+        self._highs = [tuple(high) for high in highs]
+        self._starts, self._ends = starts, ends
+        self._lefts, self._rights = lefts, rights
+
+    def __len__(self) -> int:
+        return len(self._perm)
+
+    def _box_distance(self, node: int, q: Tuple[float, float, float]) -> float:
+        total = 0.0
+        for value, low, high in zip(q, self._lows[node], self._highs[node]):
+            if value < low:
+                total += (low - value) ** 2
+            elif value > high:
+                total += (value - high) ** 2
+        return math.sqrt(total)
+
+    def query(self, point: np.ndarray, k: int, max_distance: float) -> List[Tuple[float, int]]:
+        """Up to k (distance, point_index) pairs within max_distance, closest first"""
+        if not len(self) or k <= 0:
+            return []
+
+        q = tuple(float(v) for v in point)
+        heap: List[Tuple[float, int]] = []  # max-heap via negated distances
+        bound = max_distance
+        stack = [(0.0, 0)]
+
+        while stack:
+            box_distance, node = stack.pop()
+            if box_distance > bound:
+                continue
+
+            if self._lefts[node] < 0:
+                start, end = self._starts[node], self._ends[node]
+                distances = np.sqrt(((self._points[start:end] - point) ** 2).sum(axis=1))
+                for offset in np.flatnonzero(distances <= bound):
+                    distance = float(distances[offset])
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-distance, int(self._perm[start + offset])))
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, (-distance, int(self._perm[start + offset])))
+                    if len(heap) == k:
+                        bound = min(bound, -heap[0][0])
+                continue
+
+            left, right = self._lefts[node], self._rights[node]
+            left_distance = self._box_distance(left, q)
+            right_distance = self._box_distance(right, q)
+            # Visit the nearer child first (pushed last)
+            if left_distance <= right_distance:
+                stack.append((right_distance, right))
+                stack.append((left_distance, left))
+            else:
+                stack.append((left_distance, left))
+                stack.append((right_distance, right))
+
+        return sorted((-negated, index) for negated, index in heap)
+
+
+class SpatialKNNIndex:
+    """Per-type KD-trees over a set of (id, lat, lon, type) points"""
+
+    def __init__(self, rebuild_seconds: float, rebuild_buffer: int):
+        self.rebuild_seconds = rebuild_seconds
+        self.rebuild_buffer = rebuild_buffer
+        self._points: Dict[int, Tuple[float, float, str]] = {}
+        self._trees: Dict[str, Tuple[KDTree, np.ndarray]] = {}
+        self._tree_ids = np.empty(0, dtype=np.int64)  # sorted
+        # Writes since the trees were built: id -> (sequence, xyz, type)
+        self._buffer: Dict[int, Tuple[int, np.ndarray, str]] = {}
+        # Ids changed since the trees were built, whose tree entry (if any) is
+        # outdated: id -> sequence. Only _stale_in_trees of them are in a tree.
+        self._stale: Dict[int, int] = {}
+        self._stale_in_trees = 0
+        self._sequence = 0
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def upsert(self, point_id: int, latitude: float, longitude: float, incident_type: IncidentType):
+        type_key = IncidentType(incident_type).value
+        xyz = _to_xyz(latitude, longitude)
+        with self._lock:
+            self._sequence += 1
+            self._points[point_id] = (latitude, longitude, type_key)
+            self._mark_stale(point_id)
+            self._buffer[point_id] = (self._sequence, xyz, type_key)
+        self._maybe_rebuild()
+
+    def remove(self, point_id: int):
+        with self._lock:
+            if self._points.pop(point_id, None) is None:
+                return
+            self._sequence += 1
+            self._mark_stale(point_id)
+            self._buffer.pop(point_id, None)
+        self._maybe_rebuild()
+
+    def _mark_stale(self, point_id: int):
+        if point_id not in self._stale:
+            position = np.searchsorted(self._tree_ids, point_id)
+            if position < len(self._tree_ids) and self._tree_ids[position] == point_id:
+                self._stale_in_trees += 1
+        self._stale[point_id] = self._sequence
+
+    def load(self, rows):
+        """Replace the contents with (id, lat, lon, type) rows and rebuild now"""
+        with self._lock:
+            self._points = {
+                point_id: (latitude, longitude, IncidentType(incident_type).value)
+                for point_id, latitude, longitude, incident_type in rows
+            }
+            self._buffer.clear()
+            self._stale.clear()
+            self._stale_in_trees = 0
+            self._rebuilding = True
+        self._rebuild()
+
+    def _maybe_rebuild(self):
+        with self._lock:
+            due = len(self._buffer) + len(self._stale) >= self.rebuild_buffer or (
+                (self._buffer or self._stale) and time.monotonic() - self._built_at >= self.rebuild_seconds
+            )
+            if not due or self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="knn-rebuild", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            with self._lock:
+                snapshot_sequence = self._sequence
+                snapshot = list(self._points.items())
+
+            grouped: Dict[str, List[Tuple[int, float, float]]] = {}
+            for point_id, (latitude, longitude, type_key) in snapshot:
+                grouped.setdefault(type_key, []).append((point_id, latitude, longitude))
+
+            trees = {}
+            for type_key, entries in grouped.items():
+                ids = np.fromiter((e[0] for e in entries), dtype=np.int64, count=len(entries))
+                xyz = _to_xyz([e[1] for e in entries], [e[2] for e in entries])
+                trees[type_key] = (KDTree(xyz), ids)
+
+            tree_ids = np.sort(np.fromiter((point_id for point_id, _ in snapshot), dtype=np.int64, count=len(snapshot)))
+
+            with self._lock:
+                self._trees = trees
+                self._tree_ids = tree_ids
+                # Keep only writes that happened after the snapshot was taken
+                self._buffer = {i: e for i, e in self._buffer.items() if e[0] > snapshot_sequence}
+                self._stale = {i: s for i, s in self._stale.items() if s > snapshot_sequence}
+                self._stale_in_trees = int(np.isin(
+                    np.fromiter(self._stale, dtype=np.int64, count=len(self._stale)), tree_ids
+                ).sum())
+                self._built_at = time.monotonic()
+        except Exception:
+            logger.exception("k-NN index rebuild failed")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        incident_type: Optional[IncidentType] = None,
+        max_distance: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """Up to k (id, distance_meters) pairs, closest first"""
+        type_key = IncidentType(incident_type).value if incident_type else None
+        bound = _arc_to_chord(max_distance) if max_distance is not None else math.inf
+        q = _to_xyz(latitude, longitude)
+
+        with self._lock:
+            trees = [
+                tree for key, tree in self._trees.items()
+                if type_key is None or key == type_key
+            ]
+            stale = dict(self._stale)
+            over_fetch = self._stale_in_trees
+            buffered = [
+                (point_id, xyz) for point_id, (_, xyz, key) in self._buffer.items()
+                if type_key is None or key == type_key
+            ]
+
+        candidates: List[Tuple[float, int]] = []
+        for tree, ids in trees:
+            # Over-fetch by the number of stale entries so filtering still leaves k
+            for chord, index in tree.query(q, k + over_fetch, bound):
+                point_id = int(ids[index])
+                if point_id not in stale:
+                    candidates.append((chord, point_id))
+
+        if buffered:
+            xyz = np.stack([entry[1] for entry in buffered])
+            chords = np.sqrt(((xyz - q) ** 2).sum(axis=1))
+            candidates.extend(
+                (float(chords[i]), buffered[i][0]) for i in np.flatnonzero(chords <= bound)
+            )
+
+        return [(point_id, _chord_to_arc(chord)) for chord, point_id in heapq.nsmallest(k, candidates)]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+report_knn = SpatialKNNIndex(
+    rebuild_seconds=settings.KNN_REBUILD_SECONDS,
+    rebuild_buffer=settings.KNN_REBUILD_BUFFER,
+)
+incident_knn = SpatialKNNIndex(
+    rebuild_seconds=settings.KNN_REBUILD_SECONDS,
+    rebuild_buffer=settings.KNN_REBUILD_BUFFER,
+)
+
+
+def sync_incident(incident: Incident):
+    """Reflect a written incident in incident_knn (only active incidents are indexed)"""
+    if incident.is_active:
+        incident_knn.upsert(incident.id, incident.latitude, incident.longitude, incident.incident_type)
+    else:
+        incident_knn.remove(incident.id)
+
+
+def load_knn_indexes(db: Session):
+    """Build both indexes from the database (all reports, active incidents)"""
+    report_knn.load(
+        db.query(Report.id, Report.latitude, Report.longitude, Report.incident_type)
+    )
+    incident_knn.load(
+        db.query(Incident.id, Incident.latitude, Incident.longitude, Incident.incident_type)
+        .filter(Incident.is_active == 1)
+    )
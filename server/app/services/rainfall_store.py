@@ -0,0 +1,220 @@
+"""
+Rolling rainfall accumulation per weather grid cell.
+
+Each cell keeps a ring buffer of RAINFALL_SLOT_SECONDS slots covering 24
+hours plus running 1h/6h/24h sums. Recording an observation overwrites its
+slot (so re-polling the same observation never double counts) and adjusts the
+sums by the delta; moving to a newer slot subtracts the slots that fall out of
+each window. Both are O(1), amortized over the slots advanced.
+
+Cells are only observed when they happen to be fetched, so each ring also
+tracks which slots were observed. Totals come with the fraction of each
+window's slots that were observed; a window below RAINFALL_MIN_COVERAGE
+reports no total rather than an under-count. The slot still in progress only
+counts toward the expected slots once it has been observed.
+
+Observations come from the Open-Meteo "current" payloads on the weather fetch
+path. With RAINFALL_PERSIST enabled, changed slots are written to the
+rainfall_slots table and reloaded at startup; otherwise nothing is queued
+for writing. A cell nobody has observed for a whole 24 hour window holds
+nothing any window could report, so its ring is dropped.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import RainfallSlot
+
+Cell = Tuple[int, int]
+
+WINDOW_HOURS = (1, 6, 24)
+
+
+class RainfallRing:
+    """Ring buffer of per-slot rainfall with running window sums"""
+
+    def __init__(self, slot_seconds: int):
+        self.windows = [hours * 3600 // slot_seconds for hours in WINDOW_HOURS]
+        self.capacity = self.windows[-1]
+        self.values = [0.0] * self.capacity
+        self.sums = [0.0] * len(self.windows)
+        # Whether each slot was observed, and how many observed slots each window holds
+        self.observed = [False] * self.capacity
+        self.counts = [0] * len(self.windows)
+        self.latest: Optional[int] = None
+        self.last_observed: Optional[int] = None
+
+    def advance(self, slot: int):
+        """Make `slot` the newest slot, dropping what leaves each window"""
+        if self.latest is None or slot - self.latest >= self.capacity:
+            self.values = [0.0] * self.capacity
+            self.sums = [0.0] * len(self.windows)
+            self.observed = [False] * self.capacity
+            self.counts = [0] * len(self.windows)
+            self.latest = slot
+            return
+        while self.latest < slot:
+            self.latest += 1
+            for i, size in enumerate(self.windows):
+                leaving = (self.latest - size) % self.capacity
+                self.sums[i] -= self.values[leaving]
+                self.counts[i] -= self.observed[leaving]
+            self.values[self.latest % self.capacity] = 0.0
+            self.observed[self.latest % self.capacity] = False
+
+    def set(self, slot: int, amount: float):
+        if self.latest is None or slot > self.latest:
+            self.advance(slot)
+        if slot <= self.latest - self.capacity:
+            return  # older than the longest window
+
+        if self.last_observed is None or slot > self.last_observed:
+            self.last_observed = slot
+        position = slot % self.capacity
+        delta = amount - self.values[position]
+        newly_observed = not self.observed[position]
+        self.values[position] = amount
+        self.observed[position] = True
+        for i, size in enumerate(self.windows):
+            if slot > self.latest - size:
+                self.sums[i] += delta
+                self.counts[i] += newly_observed
+
+    def coverage(self) -> List[float]:
+        """Fraction of each window's completed (or observed) slots that were observed"""
+        in_progress = 0 if self.observed[self.latest % self.capacity] else 1
+        return [count / (size - in_progress) for count, size in zip(self.counts, self.windows)]
+
+    def slots(self) -> List[Tuple[int, float]]:
+        if self.latest is None:
+            return []
+        return [
+            (slot, self.values[slot % self.capacity])
+            for slot in range(self.latest - self.capacity + 1, self.latest + 1)
+            if self.values[slot % self.capacity]
+        ]
+
+
+class RainfallStore:
+    """Rainfall rings for every weather cell that has been observed"""
+
+    def __init__(self, slot_seconds: int, min_coverage: float = 0.0, persist: bool = False):
+        self.slot_seconds = slot_seconds
+        self.min_coverage = min_coverage
+        self.persist = persist
+        self.capacity = WINDOW_HOURS[-1] * 3600 // slot_seconds
+        self._rings: Dict[Cell, RainfallRing] = {}
+        self._dirty: Dict[Tuple[Cell, int], float] = {}
+        self._swept_slot: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _evict_stale_locked(self, current_slot: int):
+        """Drop rings with no observation inside the longest window; at most once per slot"""
+        if self._swept_slot is not None and current_slot <= self._swept_slot:
+            return
+        self._swept_slot = current_slot
+        stale = [
+            cell for cell, ring in self._rings.items()
+            if ring.last_observed is None or ring.last_observed <= current_slot - self.capacity
+        ]
+        for cell in stale:
+            del self._rings[cell]
+
+    def record(self, cell: Cell, observed_at: float, interval_seconds: float, amount_mm: float):
+        """
+        Record amount_mm of precipitation that fell during the interval ending
+        at observed_at (unix seconds), spread evenly over the slots it covers.
+        """
+        first = int((observed_at - interval_seconds) // self.slot_seconds)
+        last = max(first, int((observed_at - 1) // self.slot_seconds))
+        per_slot = max(amount_mm, 0.0) / (last - first + 1)
+
+        with self._lock:
+            self._evict_stale_locked(last)
+            ring = self._rings.get(cell)
+            if ring is None:
+                ring = self._rings[cell] = RainfallRing(self.slot_seconds)
+            for slot in range(first, last + 1):
+                ring.set(slot, per_slot)
+                if self.persist:
+                    self._dirty[(cell, slot)] = per_slot
+
+    def totals(self, cell: Cell, now: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """
+        Rainfall over the last 1h/6h/24h in mm plus the observed fraction of
+        each window. A total is None when its window is covered less than
+        min_coverage (or the cell was never observed).
+        """
+        current_slot = int((time.time() if now is None else now) // self.slot_seconds)
+        with self._lock:
+            ring = self._rings.get(cell)
+            if ring is None:
+                totals = {f"rainfall_{hours}h": None for hours in WINDOW_HOURS}
+                totals.update({f"rainfall_{hours}h_coverage": 0.0 for hours in WINDOW_HOURS})
+                return totals
+            ring.advance(current_slot)
+            totals = {}
+            for hours, total, covered in zip(WINDOW_HOURS, ring.sums, ring.coverage()):
+                totals[f"rainfall_{hours}h"] = round(max(total, 0.0), 2) if covered >= self.min_coverage else None
+                totals[f"rainfall_{hours}h_coverage"] = round(covered, 2)
+            return totals
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def flush(self, db: Session):
+        """Write slots changed since the last flush"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        for ((cell_lat, cell_lon), slot), amount in dirty.items():
+            db.merge(RainfallSlot(cell_lat=cell_lat, cell_lon=cell_lon, slot=slot, amount_mm=amount))
+        oldest = int(time.time() // self.slot_seconds) - self.capacity
+        db.query(RainfallSlot).filter(RainfallSlot.slot <= oldest).delete(synchronize_session=False)
+        db.commit()
+
+    def load(self, db: Session):
+        """Rebuild the rings from persisted slots of the last 24 hours"""
+        oldest = int(time.time() // self.slot_seconds) - self.capacity
+        rows = db.query(RainfallSlot).filter(RainfallSlot.slot > oldest).order_by(RainfallSlot.slot).all()
+        with self._lock:
+            self._rings.clear()
+            for row in rows:
+                cell = (row.cell_lat, row.cell_lon)
+                ring = self._rings.get(cell)
+                if ring is None:
+                    ring = self._rings[cell] = RainfallRing(self.slot_seconds)
+                ring.set(row.slot, row.amount_mm)
+
+
+def parse_observation(data: dict) -> Optional[Tuple[float, float, float]]:
+    """(observed_at unix seconds, interval seconds, precipitation mm) from an Open-Meteo payload"""
+    current = data.get("current") or {}
+    observed = current.get("time")
+    if observed is None or current.get("precipitation") is None:
+        return None
+    local = datetime.fromisoformat(observed)
+    if local.tzinfo is not None:
+        observed_at = local.timestamp()
+    else:
+        # With timezone=auto, times are local; utc_offset_seconds converts back
+        observed_at = local.replace(tzinfo=timezone.utc).timestamp() - data.get("utc_offset_seconds", 0)
+    return observed_at, float(current.get("interval", 900)), float(current["precipitation"])
+
+
+rainfall_store = RainfallStore(
+    slot_seconds=settings.RAINFALL_SLOT_SECONDS,
+    min_coverage=settings.RAINFALL_MIN_COVERAGE,
+    persist=settings.RAINFALL_PERSIST,
+)
+
+
+def persist_rainfall():
+    """Flush changed slots to the database when RAINFALL_PERSIST is enabled"""
+    if settings.RAINFALL_PERSIST:
+        with SessionLocal() as db:
+            rainfall_store.flush(db)
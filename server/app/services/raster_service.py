@@ -0,0 +1,236 @@
+"""
+Memory-mapped raster sampling for the flood model's terrain features.
+
+Each GeoTIFF layer is converted once into a tiled NumPy array of shape
+(tile_rows, tile_cols, TILE_SIZE, TILE_SIZE) stored as ``<layer>.tiles.npy``,
+plus a ``<layer>.json`` sidecar holding the geotransform and nodata value.
+At runtime the arrays are opened with ``mmap_mode="r"``: sampling thousands of
+coordinates is a single fancy-indexing pass that only touches the pages of the
+tiles involved, and every worker process shares the same OS page cache.
+
+Rasters are expected in geographic coordinates (EPSG:4326). Converting needs
+rasterio, which is only required for the one-off build step:
+
+    python -m app.services.raster_service --source-dir ../models
+"""
+import argparse
+import json
+import math
+import os
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+
+TILE_SIZE = 256
+
+# Layer name -> GeoTIFF file name in the models directory (see models/README.md)
+LAYER_SOURCES = {
+    "elevation": "philippines_elevation_merged.tif",
+    "slope": "philippines_slope_merged.tif",
+    "flow_accumulation": "pampanga_flow_accumulation.tif",
+    "population": "phl_ppp_2020.tif",
+}
+
+
+class RasterLayer:
+    """One memory-mapped tiled raster with vectorized point sampling"""
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        with open(os.path.join(directory, f"{name}.json")) as f:
+            meta = json.load(f)
+
+        self.width: int = meta["width"]
+        self.height: int = meta["height"]
+        self.tile_size: int = meta["tile_size"]
+        self.nodata: Optional[float] = meta.get("nodata")
+        # GDAL geotransform: (origin_x, pixel_width, 0, origin_y, 0, pixel_height)
+        self.origin_x, self.pixel_width, _, self.origin_y, _, self.pixel_height = meta["transform"]
+        self.tiles = np.load(os.path.join(directory, f"{name}.tiles.npy"), mmap_mode="r")
+
+    def _pixel_coordinates(self, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """Fractional (row, col) pixel coordinates; pixel centers sit at +0.5"""
+        rows = (np.asarray(latitudes, dtype=np.float64) - self.origin_y) / self.pixel_height
+        cols = (np.asarray(longitudes, dtype=np.float64) - self.origin_x) / self.pixel_width
+        return rows, cols
+
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Values at integer pixel indices (which must be in range)"""
+        t = self.tile_size
+        values = self.tiles[rows // t, cols // t, rows % t, cols % t].astype(np.float64)
+        if self.nodata is not None:
+            values[values == self.nodata] = np.nan
+        return values
+
+    def sample_nearest(self, latitudes, longitudes) -> np.ndarray:
+        """Value of the pixel containing each point; NaN outside the raster or on nodata"""
+        rows, cols = self._pixel_coordinates(latitudes, longitudes)
+        rows, cols = np.floor(rows), np.floor(cols)
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+
+        values = np.full(rows.shape, np.nan)
+        values[inside] = self._gather(rows[inside].astype(np.int64), cols[inside].astype(np.int64))
+        return values
+
+    def sample_bilinear(self, latitudes, longitudes) -> np.ndarray:
+        """
+        Bilinear interpolation between the four surrounding pixel centers.
+        Falls back to the nearest pixel where a neighbor is nodata.
+        """
+        rows, cols = self._pixel_coordinates(latitudes, longitudes)
+        inside = (rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width)
+        values = np.full(rows.shape, np.nan)
+        if not inside.any():
+            return values
+
+        y = rows[inside] - 0.5
+        x = cols[inside] - 0.5
+        r0 = np.clip(np.floor(y), 0, self.height - 1).astype(np.int64)
+        c0 = np.clip(np.floor(x), 0, self.width - 1).astype(np.int64)
+        r1 = np.minimum(r0 + 1, self.height - 1)
+        c1 = np.minimum(c0 + 1, self.width - 1)
+        fy = np.clip(y - r0, 0.0, 1.0)
+        fx = np.clip(x - c0, 0.0, 1.0)
+
+        top = self._gather(r0, c0) * (1 - fx) + self._gather(r0, c1) * fx
+        bottom = self._gather(r1, c0) * (1 - fx) + self._gather(r1, c1) * fx
+        interpolated = top * (1 - fy) + bottom * fy
+
+        missing = np.isnan(interpolated)
+        if missing.any():
+            nearest_rows = np.clip(np.floor(rows[inside][missing]), 0, self.height - 1).astype(np.int64)
+            nearest_cols = np.clip(np.floor(cols[inside][missing]), 0, self.width - 1).astype(np.int64)
+            interpolated[missing] = self._gather(nearest_rows, nearest_cols)
+
+        values[inside] = interpolated
+        return values
+
+
+class RasterStore:
+    """Lazily opened set of raster layers from one directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._layers: Dict[str, RasterLayer] = {}
+        self._lock = threading.Lock()
+
+    def available_layers(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(".tiles.npy")] for name in os.listdir(self.directory)
+            if name.endswith(".tiles.npy")
+        )
+
+    def has_layer(self, name: str) -> bool:
+        return name in self._layers or os.path.exists(os.path.join(self.directory, f"{name}.tiles.npy"))
+
+    def layer(self, name: str) -> RasterLayer:
+        """Open (once) and return a layer; raises FileNotFoundError if it was never built"""
+        layer = self._layers.get(name)
+        if layer is None:
+            with self._lock:
+                layer = self._layers.get(name)
+                if layer is None:
+                    layer = RasterLayer(self.directory, name)
+                    self._layers[name] = layer
+        return layer
+
+    def sample(self, name: str, latitudes, longitudes, method: str = "bilinear") -> np.ndarray:
+        layer = self.layer(name)
+        if method == "nearest":
+            return layer.sample_nearest(latitudes, longitudes)
+        if method == "bilinear":
+            return layer.sample_bilinear(latitudes, longitudes)
+        raise ValueError(f"Unknown sampling method: {method}")
+
+
+raster_store = RasterStore(settings.RASTER_DIR)
+
+
+def write_layer(
+    directory: str,
+    name: str,
+    height: int,
+    width: int,
+    transform: Tuple[float, float, float, float, float, float],
+    read_rows,
+    nodata: Optional[float] = None,
+    tile_size: int = TILE_SIZE
+):
+    """
+    Write a raster in the tiled layout. read_rows(start, stop) must return the
+    float32 array of source rows [start, stop); the raster is streamed one
+    band of tiles at a time so it never has to fit in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tile_rows = math.ceil(height / tile_size)
+    tile_cols = math.ceil(width / tile_size)
+    fill = np.float32(nodata if nodata is not None else np.nan)
+
+    tiles_path = os.path.join(directory, f"{name}.tiles.npy")
+    tiles = np.lib.format.open_memmap(
+        tiles_path + ".tmp", mode="w+", dtype=np.float32,
+        shape=(tile_rows, tile_cols, tile_size, tile_size)
+    )
+    for tile_row in range(tile_rows):
+        start = tile_row * tile_size
+        stop = min(start + tile_size, height)
+        band = np.full((tile_size, tile_cols * tile_size), fill, dtype=np.float32)
+        band[:stop - start, :width] = read_rows(start, stop)
+        tiles[tile_row] = band.reshape(tile_size, tile_cols, tile_size).transpose(1, 0, 2)
+    tiles.flush()
+    del tiles
+    os.replace(tiles_path + ".tmp", tiles_path)
+
+    with open(os.path.join(directory, f"{name}.json"), "w") as f:
+        json.dump({
+            "width": width,
+            "height": height,
+            "tile_size": tile_size,
+            "nodata": None if nodata is None else float(nodata),
+            "transform": list(transform),
+        }, f)
+
+
+def convert_geotiff(source_path: str, directory: str, name: str):
+    """Convert band 1 of a GeoTIFF into the tiled memory-mappable layout"""
+    try:
+        import rasterio
+        from rasterio.windows import Window
+    except ImportError as e:
+        raise RuntimeError("Converting GeoTIFFs requires rasterio: pip install rasterio") from e
+
+    with rasterio.open(source_path) as src:
+        def read_rows(start: int, stop: int) -> np.ndarray:
+            return src.read(1, window=Window(0, start, src.width, stop - start)).astype(np.float32)
+
+        write_layer(
+            directory,
+            name,
+            src.height,
+            src.width,
+            src.transform.to_gdal(),
+            read_rows,
+            nodata=src.nodata,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped raster layers from GeoTIFFs")
+    parser.add_argument("--source-dir", default="../models", help="Directory containing the GeoTIFFs")
+    parser.add_argument("--output-dir", default=settings.RASTER_DIR, help="Where to write the tiled layers")
+    args = parser.parse_args()
+
+    for name, file_name in LAYER_SOURCES.items():
+        source_path = os.path.join(args.source_dir, file_name)
+        if not os.path.exists(source_path):
+            print(f"Skipping {name}: {source_path} not found")
+            continue
+        print(f"Converting {source_path} -> {name}")
+        convert_geotiff(source_path, args.output_dir, name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Report statistics for the dashboard.
+
+Counts come from a single GROUP BY over ``reports``, or, when
+REPORT_COUNTERS_ENABLED is set on SQLite, from the ``report_counters`` table.
+That table holds one row per (period, incident_type), where period is "all"
+or a UTC day ("2025-06-01"). Triggers keep it in step with every insert,
+delete and type (or created_at) change inside the writing transaction, so the
+totals are a read of three rows no matter how many reports exist.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Tuple
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import IncidentType, Report
+from app.schemas.schemas import DailyReportStats, ReportStats
+
+ALL_TIME = "all"
+
+report_counters = table(
+    "report_counters",
+    column("period"),
+    column("incident_type"),
+    column("count"),
+)
+
+# Reports without a created_at are counted on the day they were written
+_DAY = "COALESCE(date({row}.created_at), date('now'))"
+
+
+def _bump(row: str, delta: int) -> str:
+    return f"""
+        INSERT INTO report_counters (period, incident_type, count)
+        VALUES ('{ALL_TIME}', {row}.incident_type, {delta}), ({_DAY.format(row=row)}, {row}.incident_type, {delta})
+        ON CONFLICT (period, incident_type) DO UPDATE SET count = count + excluded.count;
+    """
+
+
+_COUNTER_TRIGGERS = ["report_counters_insert", "report_counters_update", "report_counters_delete"]
+
+_COUNTERS_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS report_counters (
+        period VARCHAR NOT NULL,
+        incident_type VARCHAR NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, incident_type)
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS report_counters_insert AFTER INSERT ON reports
+    BEGIN
+        {_bump("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS report_counters_update AFTER UPDATE OF incident_type, created_at ON reports
+    WHEN OLD.incident_type IS NOT NEW.incident_type
+        OR date(OLD.created_at) IS NOT date(NEW.created_at)
+    BEGIN
+        {_bump("OLD", -1)}
+        {_bump("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS report_counters_delete AFTER DELETE ON reports
+    BEGIN
+        {_bump("OLD", -1)}
+    END
+    """,
+]
+
+# Recount from scratch when the table or a trigger was missing: rows may have
+# been written while the triggers were absent
+_COUNTERS_REBUILD = [
+    "DELETE FROM report_counters",
+    f"""
+    INSERT INTO report_counters (period, incident_type, count)
+    SELECT '{ALL_TIME}', incident_type, COUNT(*) FROM reports GROUP BY incident_type
+    """,
+    f"""
+    INSERT INTO report_counters (period, incident_type, count)
+    SELECT {_DAY.format(row="reports")}, incident_type, COUNT(*) FROM reports
+    GROUP BY {_DAY.format(row="reports")}, incident_type
+    """,
+]
+
+_counters_enabled = False
+
+
+def ensure_report_counters(engine: Engine, enabled: bool = settings.REPORT_COUNTERS_ENABLED) -> bool:
+    """
+    Create the counters table and its triggers (recounting only if any of them
+    was missing), or drop them when disabled so writes stop paying for them.
+    Returns whether stats read the counters; non-SQLite databases always use
+    the GROUP BY queries.
+    """
+    global _counters_enabled
+
+    if engine.dialect.name != "sqlite":
+        _counters_enabled = False
+        return False
+
+    with engine.begin() as conn:
+        if enabled:
+            existing = set(conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE name = 'report_counters' OR name LIKE 'report_counters_%'"
+            )).scalars())
+            missing = {"report_counters", *_COUNTER_TRIGGERS} - existing
+            for statement in _COUNTERS_DDL:
+                conn.execute(text(statement))
+            if missing:
+                for statement in _COUNTERS_REBUILD:
+                    conn.execute(text(statement))
+        else:
+            for trigger in _COUNTER_TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+            conn.execute(text("DROP TABLE IF EXISTS report_counters"))
+
+    _counters_enabled = enabled
+    return enabled
+
+
+def is_counters_enabled() -> bool:
+    return _counters_enabled
+
+
+def _as_type(value) -> IncidentType:
+    # Counter rows hold the enum name as stored in reports; ORM rows are already enums
+    return value if isinstance(value, IncidentType) else IncidentType[value]
+
+
+def _type_counts(rows) -> Dict[IncidentType, int]:
+    counts = {incident_type: 0 for incident_type in IncidentType}
+    for incident_type, count in rows:
+        counts[_as_type(incident_type)] += count
+    return counts
+
+
+def _counted_totals(db: Session) -> Dict[IncidentType, int]:
+    if _counters_enabled:
+        rows = db.execute(
+            select(report_counters.c.incident_type, report_counters.c.count)
+            .where(report_counters.c.period == ALL_TIME)
+        )
+    else:
+        rows = db.execute(select(Report.incident_type, func.count()).group_by(Report.incident_type))
+    return _type_counts(rows.all())
+
+
+def _counted_days(db: Session, first_day: date) -> Dict[Tuple[str, IncidentType], int]:
+    if _counters_enabled:
+        rows = db.execute(
+            select(report_counters.c.period, report_counters.c.incident_type, report_counters.c.count)
+            .where(report_counters.c.period != ALL_TIME, report_counters.c.period >= first_day.isoformat())
+        )
+    else:
+        day = func.date(Report.created_at)
+        rows = db.execute(
+            select(day, Report.incident_type, func.count())
+            .where(Report.created_at >= datetime.combine(first_day, datetime.min.time()))
+            .group_by(day, Report.incident_type)
+        )
+
+    counts = defaultdict(int)
+    for period, incident_type, count in rows.all():
+        counts[(str(period), _as_type(incident_type))] += count
+    return counts
+
+
+def _stats_fields(counts: Dict[IncidentType, int]) -> dict:
+    return {
+        "info_count": counts[IncidentType.INFO],
+        "critical_count": counts[IncidentType.CRITICAL],
+        "warning_count": counts[IncidentType.WARNING],
+        "total_count": sum(counts.values()),
+    }
+
+
+def compute_report_stats(db: Session, days: int = 7) -> ReportStats:
+    """
+    Totals by incident type plus a per-day breakdown for the last ``days``
+    UTC days (oldest first, today included, empty days zero-filled). The
+    top-level date is the same UTC day, matching the last daily entry.
+    """
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=max(days, 1) - 1)
+    by_day = _counted_days(db, first_day) if days > 0 else {}
+
+    daily = []
+    for offset in range(days):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        counts = {incident_type: by_day.get((day, incident_type), 0) for incident_type in IncidentType}
+        daily.append(DailyReportStats(date=day, **_stats_fields(counts)))
+
+    return ReportStats(
+        **_stats_fields(_counted_totals(db)),
+        date=today.strftime("%b %d, %Y"),
+        daily=daily
+    )
@@ -0,0 +1,189 @@
+"""
+Server-side aggregation of reports on the Web Mercator quadkey grid.
+
+A map tile at zoom z is split into the 4^TILE_DETAIL_LEVELS sub-cells of zoom
+z + TILE_DETAIL_LEVELS, and each non-empty sub-cell becomes one cluster with a
+count, a per-type breakdown and a centroid. A tile payload is therefore bounded
+no matter how many reports it holds. Aggregates are cached per tile and
+invalidated only for the tiles a written report falls in.
+"""
+import hashlib
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.models import Report, IncidentType
+from app.schemas.schemas import ClusterCell, TileClusters
+from app.services.spatial_index import filter_reports_in_bbox
+
+MAX_ZOOM = 20
+MAX_LATITUDE = 85.05112878
+
+_TYPE_ORDER = [IncidentType.INFO, IncidentType.CRITICAL, IncidentType.WARNING]
+
+# (zoom, x, y, incident_type) -> (TileClusters, etag)
+tile_cache: TTLCache = TTLCache(
+    max_entries=settings.TILE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TILE_CACHE_TTL_SECONDS,
+)
+
+
+def tile_xy(latitudes, longitudes, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized lat/lon -> slippy-map tile column/row at a zoom level"""
+    n = 1 << zoom
+    lat = np.radians(np.clip(np.asarray(latitudes, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    lon = np.asarray(longitudes, dtype=np.float64)
+
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a tile"""
+    n = 1 << zoom
+
+    def lat_of(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_of(y + 1), lat_of(y), x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+
+
+def quadkey(zoom: int, x: int, y: int) -> str:
+    """Bing-style quadkey; a tile's key is a prefix of all its descendants' keys"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def tiles_covering(
+    min_lat: float,
+    max_lat: float,
+    min_lon: float,
+    max_lon: float,
+    zoom: int
+) -> List[Tuple[int, int]]:
+    """All (x, y) tiles at a zoom level that intersect a lat/lon box"""
+    xs, ys = tile_xy([max_lat, min_lat], [min_lon, max_lon], zoom)
+    return [
+        (x, y)
+        for x in range(int(xs[0]), int(xs[1]) + 1)
+        for y in range(int(ys[0]), int(ys[1]) + 1)
+    ]
+
+
+def _aggregate(
+    db: Session,
+    zoom: int,
+    x: int,
+    y: int,
+    incident_type: Optional[IncidentType]
+) -> TileClusters:
+    """
+    Count, per-type breakdown and centroid of every sub-cell, grouped in SQL so
+    a low-zoom tile returns at most 4^TILE_DETAIL_LEVELS * types rows however
+    many reports it holds. Columns are linear in longitude and computed in the
+    query; rows are picked by comparing latitude to the sub-cell edges.
+    """
+    levels = settings.TILE_DETAIL_LEVELS
+    cell_zoom = zoom + levels
+    side = 1 << levels
+    n = 1 << zoom
+    first_column, first_row = x * side, y * side
+
+    # Same arithmetic as tile_xy(), so reports land in the same columns
+    column = cast((Report.longitude + 180.0) / 360.0 * (1 << cell_zoom), Integer)
+    # Latitude edges of the sub-cell rows, north to south
+    edges = [tile_bounds(cell_zoom, first_column, first_row + i)[1] for i in range(side + 1)]
+    row = case(
+        *[(Report.latitude > edges[i + 1], i) for i in range(side - 1)],
+        else_=side - 1,
+    )
+
+    query = filter_reports_in_bbox(
+        db.query(
+            column,
+            row,
+            Report.incident_type,
+            func.count(),
+            func.sum(Report.latitude),
+            func.sum(Report.longitude),
+        ),
+        *tile_bounds(zoom, x, y)
+    )
+    # Index candidates are only bbox-approximate; keep reports that map to this
+    # tile. Edge tiles also take the points tile_xy() clips into them.
+    query = query.filter(column >= first_column)
+    if x < n - 1:
+        query = query.filter(column < first_column + side)
+    if y > 0:
+        query = query.filter(Report.latitude <= edges[0])
+    if y < n - 1:
+        query = query.filter(Report.latitude > edges[side])
+    if incident_type:
+        query = query.filter(Report.incident_type == incident_type)
+
+    cells: Dict[Tuple[int, int], List] = {}
+    grouped = query.group_by(column, row, Report.incident_type)
+    for cell_column, cell_row, report_type, count, lat_sum, lon_sum in grouped:
+        key = (min(cell_column - first_column, side - 1), cell_row)
+        cell = cells.setdefault(key, [0, 0.0, 0.0, {}])
+        cell[0] += count
+        cell[1] += lat_sum
+        cell[2] += lon_sum
+        report_type = IncidentType(report_type)
+        cell[3][report_type] = cell[3].get(report_type, 0) + count
+
+    clusters = [
+        ClusterCell(
+            quadkey=quadkey(cell_zoom, first_column + i, first_row + j),
+            latitude=lat_sum / count,
+            longitude=lon_sum / count,
+            count=count,
+            type_counts={t.value: type_counts[t] for t in _TYPE_ORDER if t in type_counts},
+        )
+        for (i, j), (count, lat_sum, lon_sum, type_counts) in sorted(cells.items())
+    ]
+    clusters.sort(key=lambda cluster: cluster.count, reverse=True)
+
+    return TileClusters(
+        zoom=zoom,
+        x=x,
+        y=y,
+        quadkey=quadkey(zoom, x, y),
+        total_count=sum(cluster.count for cluster in clusters),
+        clusters=clusters,
+    )
+
+
+def get_tile_clusters(
+    db: Session,
+    zoom: int,
+    x: int,
+    y: int,
+    incident_type: Optional[IncidentType] = None
+) -> Tuple[TileClusters, str]:
+    """Cached aggregate for one tile plus an ETag of its content"""
+    key = (zoom, x, y, incident_type.value if incident_type else None)
+    cached = tile_cache.get(key)
+    if cached is not None:
+        return cached
+
+    tile = _aggregate(db, zoom, x, y, incident_type)
+    etag = '"' + hashlib.sha1(tile.model_dump_json().encode()).hexdigest()[:20] + '"'
+    tile_cache.set(key, (tile, etag))
+    return tile, etag
+
+
+def invalidate_point(latitude: float, longitude: float):
+    """Drop the cached tiles, at every zoom, that contain a written report"""
+    type_keys = [None] + [t.value for t in _TYPE_ORDER]
+    for zoom in range(MAX_ZOOM + 1):
+        xs, ys = tile_xy([latitude], [longitude], zoom)
+        for type_key in type_keys:
+            tile_cache.pop((zoom, int(xs[0]), int(ys[0]), type_key))
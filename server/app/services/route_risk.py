@@ -0,0 +1,209 @@
+"""
+Server-side flood-risk scoring of travel routes.
+
+A polyline is densified to samples every sample_interval_meters, all samples
+are scored in one vectorized batch, and the results are rolled up per input
+segment and for the whole route (mirroring lib/models/route_risk_calculator.dart).
+Scored segments are cached by their rounded endpoints, so popular evacuation
+routes are served almost entirely from memory.
+"""
+import math
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.models import Incident
+from app.schemas.schemas import RoutePoint, RouteRiskResponse, RouteSegmentRisk
+from app.services.geo_math import EARTH_RADIUS_METERS, haversine_paired, haversine_pairwise
+
+MIN_SPEED_FACTOR = 0.3  # flooded stretches slow travel to at most 70% below base speed
+
+# Same cut-offs as FloodRiskLevel on the client
+_RISK_LEVELS = [(0.1, "minimal"), (0.3, "low"), (0.6, "moderate"), (0.8, "high")]
+
+
+@dataclass
+class SegmentRisk:
+    distance_meters: float
+    step_risks: np.ndarray  # risk at the end of each densified step
+
+
+# (start lat, start lon, end lat, end lon, interval) -> SegmentRisk
+segment_cache: TTLCache = TTLCache(
+    max_entries=settings.ROUTE_RISK_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ROUTE_RISK_CACHE_TTL_SECONDS,
+)
+
+
+def risk_level(probability: float) -> str:
+    for threshold, level in _RISK_LEVELS:
+        if probability < threshold:
+            return level
+    return "severe"
+
+
+def incident_risk(db: Session, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Risk in [0, 1] from active incidents: severity / 100 at an incident's
+    center, fading to half of that at the edge of its affected area. A
+    missing severity counts as 0; incidents without a positive radius cover
+    no area and are skipped.
+    """
+    risks = np.zeros(len(latitudes))
+    if not len(latitudes):
+        return risks
+
+    max_radius = db.query(Incident.affected_area_radius).filter(
+        Incident.is_active == 1,
+        Incident.affected_area_radius > 0
+    ).order_by(Incident.affected_area_radius.desc()).limit(1).scalar()
+    if max_radius is None:
+        return risks
+
+    margin = math.degrees(max_radius / EARTH_RADIUS_METERS)
+    lon_margin = margin / max(math.cos(math.radians(float(np.abs(latitudes).max()) + margin)), 1e-6)
+    incidents = db.query(
+        Incident.latitude,
+        Incident.longitude,
+        Incident.affected_area_radius,
+        func.coalesce(Incident.severity_score, 0.0)
+    ).filter(
+        Incident.is_active == 1,
+        Incident.affected_area_radius > 0,
+        Incident.latitude.between(float(latitudes.min()) - margin, float(latitudes.max()) + margin),
+        Incident.longitude.between(float(longitudes.min()) - lon_margin, float(longitudes.max()) + lon_margin),
+    ).all()
+    if not incidents:
+        return risks
+
+    centers = np.array(incidents, dtype=np.float64)
+    distances = haversine_pairwise(latitudes, longitudes, centers[:, 0], centers[:, 1])
+    radii = centers[:, 2][None, :]
+    severity = np.clip(centers[:, 3] / 100.0, 0.0, 1.0)[None, :]
+    fraction = np.divide(distances, radii, out=np.full_like(distances, np.inf), where=radii > 0)
+    influence = np.where(fraction <= 1.0, severity * (1.0 - 0.5 * fraction), 0.0)
+    return influence.max(axis=1)
+
+
+def score_points(db: Session, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Flood risk in [0, 1] for each point, scored as one batch"""
+    return np.clip(incident_risk(db, latitudes, longitudes), 0.0, 1.0)
+
+
+def _segment_key(start: RoutePoint, end: RoutePoint, interval: float) -> Tuple:
+    digits = settings.ROUTE_RISK_CACHE_PRECISION
+    return (
+        round(start.latitude, digits),
+        round(start.longitude, digits),
+        round(end.latitude, digits),
+        round(end.longitude, digits),
+        interval,
+    )
+
+
+def _densify(
+    path: Sequence[RoutePoint],
+    segment_indices: List[int],
+    interval: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Samples every `interval` meters along the given segments (excluding each
+    segment's start vertex). Returns sample lats, lons, the owning position in
+    segment_indices for each sample, and each segment's length.
+    """
+    starts = np.array([(path[i].latitude, path[i].longitude) for i in segment_indices])
+    ends = np.array([(path[i + 1].latitude, path[i + 1].longitude) for i in segment_indices])
+    lengths = haversine_paired(starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1])
+
+    steps = np.maximum(np.ceil(lengths / interval), 1).astype(np.int64)
+    owner = np.repeat(np.arange(len(segment_indices)), steps)
+    # 1..n for each segment: global position minus the segment's first position
+    first = np.cumsum(steps) - steps
+    fractions = (np.arange(len(owner)) - first[owner] + 1) / steps[owner]
+
+    latitudes = starts[owner, 0] + (ends[owner, 0] - starts[owner, 0]) * fractions
+    longitudes = starts[owner, 1] + (ends[owner, 1] - starts[owner, 1]) * fractions
+    return latitudes, longitudes, owner, lengths
+
+
+def _travel_seconds(segment: SegmentRisk, speed_kmh: float) -> float:
+    step_meters = segment.distance_meters / len(segment.step_risks)
+    speeds = speed_kmh * np.clip(1.0 - segment.step_risks * 0.7, MIN_SPEED_FACTOR, 1.0)
+    return float((step_meters / 1000.0 / speeds).sum() * 3600)
+
+
+def score_route(
+    db: Session,
+    path: Sequence[RoutePoint],
+    interval: float,
+    speed_kmh: float
+) -> RouteRiskResponse:
+    segment_count = len(path) - 1
+    keys = [_segment_key(path[i], path[i + 1], interval) for i in range(segment_count)]
+    segments: List[SegmentRisk] = [segment_cache.get(key) for key in keys]
+    missing = [i for i, segment in enumerate(segments) if segment is None]
+
+    # Score the route start plus every uncached sample in one batch
+    if missing:
+        latitudes, longitudes, owner, lengths = _densify(path, missing, interval)
+        if latitudes.size > settings.ROUTE_MAX_SAMPLES:
+            raise ValueError(
+                f"Route needs {latitudes.size} samples at {interval:g}m; "
+                f"the limit is {settings.ROUTE_MAX_SAMPLES}. Use a larger sample interval."
+            )
+        risks = score_points(
+            db,
+            np.concatenate([[path[0].latitude], latitudes]),
+            np.concatenate([[path[0].longitude], longitudes]),
+        )
+        start_risk, sample_risks = float(risks[0]), risks[1:]
+
+        boundaries = np.searchsorted(owner, np.arange(len(missing) + 1))
+        for position, segment_index in enumerate(missing):
+            segment = SegmentRisk(
+                distance_meters=float(lengths[position]),
+                step_risks=sample_risks[boundaries[position]:boundaries[position + 1]],
+            )
+            segments[segment_index] = segment
+            segment_cache.set(keys[segment_index], segment)
+    else:
+        start_risk = float(score_points(db, np.array([path[0].latitude]), np.array([path[0].longitude]))[0])
+
+    all_risks = np.concatenate([[start_risk]] + [segment.step_risks for segment in segments])
+    max_risk = float(all_risks.max())
+    average_risk = float(all_risks.mean())
+    overall_risk = max_risk * 0.6 + average_risk * 0.4
+
+    segment_results = []
+    for i, segment in enumerate(segments):
+        segment_max = float(segment.step_risks.max())
+        segment_results.append(RouteSegmentRisk(
+            start_index=i,
+            end_index=i + 1,
+            distance_meters=segment.distance_meters,
+            max_risk=segment_max,
+            average_risk=float(segment.step_risks.mean()),
+            risk_level=risk_level(segment_max),
+            estimated_time_seconds=_travel_seconds(segment, speed_kmh),
+        ))
+
+    severe_segments = sum(1 for s in segment_results if s.risk_level == "severe")
+    warning_segments = sum(1 for s in segment_results if s.risk_level in ("moderate", "high", "severe"))
+
+    return RouteRiskResponse(
+        total_distance_meters=sum(s.distance_meters for s in segment_results),
+        overall_risk=overall_risk,
+        max_risk=max_risk,
+        average_risk=average_risk,
+        risk_level=risk_level(overall_risk),
+        estimated_time_seconds=sum(s.estimated_time_seconds for s in segment_results),
+        is_recommended=(
+            overall_risk <= 0.6 and max_risk <= 0.8
+            and severe_segments == 0 and warning_segments <= 3
+        ),
+        sample_count=int(all_risks.size),
+        segments=segment_results,
+    )
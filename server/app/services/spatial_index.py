@@ -0,0 +1,140 @@
+"""
+SQLite R*Tree index over report coordinates.
+
+The ``reports_rtree`` virtual table mirrors every row of ``reports`` as a
+degenerate box (a point) and is kept in sync by triggers, so every write path
+(ORM, raw SQL, cascades) updates it inside the same transaction. Nearby
+queries use it to pull bounding-box candidates before the exact distance check.
+"""
+import logging
+from typing import TypeVar
+from sqlalchemy import Select, text, table, column, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query
+from app.models.models import Report
+from app.services.geo_math import bounding_box
+
+# Legacy Session.query() or 2.0-style select(); both support .filter()
+ReportQuery = TypeVar("ReportQuery", Query, Select)
+
+logger = logging.getLogger(__name__)
+
+reports_rtree = table(
+    "reports_rtree",
+    column("id"),
+    column("min_lat"),
+    column("max_lat"),
+    column("min_lon"),
+    column("max_lon"),
+)
+
+_RTREE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reports_rtree
+    USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_rtree_insert AFTER INSERT ON reports
+    BEGIN
+        INSERT OR REPLACE INTO reports_rtree
+        VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_rtree_update AFTER UPDATE OF id, latitude, longitude ON reports
+    BEGIN
+        DELETE FROM reports_rtree WHERE id = OLD.id;
+        INSERT OR REPLACE INTO reports_rtree
+        VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_rtree_delete AFTER DELETE ON reports
+    BEGIN
+        DELETE FROM reports_rtree WHERE id = OLD.id;
+    END
+    """,
+]
+
+# Rows written before the index existed (or while it was dropped)
+_RTREE_BACKFILL = [
+    "DELETE FROM reports_rtree WHERE id NOT IN (SELECT id FROM reports)",
+    """
+    INSERT INTO reports_rtree
+    SELECT id, latitude, latitude, longitude, longitude FROM reports
+    WHERE id NOT IN (SELECT id FROM reports_rtree)
+    """,
+]
+
+_rtree_enabled = False
+
+
+def ensure_report_rtree(engine: Engine) -> bool:
+    """
+    Create the R*Tree table and its sync triggers, backfilling existing rows.
+    Returns False (and leaves nearby queries on plain column filters) when the
+    database is not SQLite or SQLite was built without the rtree module.
+    """
+    global _rtree_enabled
+
+    if engine.dialect.name != "sqlite":
+        _rtree_enabled = False
+        return False
+
+    try:
+        with engine.begin() as conn:
+            for statement in _RTREE_DDL + _RTREE_BACKFILL:
+                conn.execute(text(statement))
+    except OperationalError as e:
+        logger.warning("R*Tree index unavailable, falling back to column filters: %s", e)
+        _rtree_enabled = False
+        return False
+
+    _rtree_enabled = True
+    return True
+
+
+def is_rtree_enabled() -> bool:
+    return _rtree_enabled
+
+
+def filter_reports_in_bbox(
+    query: ReportQuery,
+    min_lat: float,
+    max_lat: float,
+    min_lon: float,
+    max_lon: float
+) -> ReportQuery:
+    """
+    Restrict a Report query (or select()) to candidates inside a lat/lon box. Candidates may
+    sit marginally outside the box, so callers needing exact bounds re-check.
+    """
+    if _rtree_enabled:
+        # Overlap test rather than containment: the rtree stores 32-bit floats
+        # rounded outward, so containment could drop points on the box edge.
+        candidate_ids = select(reports_rtree.c.id).where(
+            reports_rtree.c.max_lat >= min_lat,
+            reports_rtree.c.min_lat <= max_lat,
+            reports_rtree.c.max_lon >= min_lon,
+            reports_rtree.c.min_lon <= max_lon,
+        )
+        return query.filter(Report.id.in_(candidate_ids))
+
+    return query.filter(
+        Report.latitude.between(min_lat, max_lat),
+        Report.longitude.between(min_lon, max_lon),
+    )
+
+
+def filter_reports_in_radius_bbox(
+    query: ReportQuery,
+    latitude: float,
+    longitude: float,
+    radius_meters: float
+) -> ReportQuery:
+    """
+    Restrict a Report query to rows inside the bounding box of a circle.
+    Callers still need the exact distance check; this only prunes candidates.
+    """
+    return filter_reports_in_bbox(query, *bounding_box(latitude, longitude, radius_meters))
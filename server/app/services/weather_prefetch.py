@@ -0,0 +1,144 @@
+"""
+Background refresh of current conditions and forecasts for hot weather cells.
+
+Every WEATHER_PREFETCH_INTERVAL_SECONDS (kept below the current-conditions
+TTL) the scheduler refreshes the cells of the Pampanga municipalities plus the
+most requested cells, so user requests are served from a warm cache.
+Forecasts live much longer, so a cell's forecast is only refetched once it
+would expire within the next two cycles. At most WEATHER_PREFETCH_CONCURRENCY
+upstream calls run at once.
+
+A cell whose refresh fails is retried after an exponential per-cell backoff,
+so one flaky cell does not hold back the others. The whole schedule only
+backs off when the Open-Meteo circuit is open or most cells failed. Each
+cycle also persists changed rainfall slots (when RAINFALL_PERSIST is on).
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+import httpx
+from app.api.scenario import PAMPANGA_LOCATIONS
+from app.core.config import settings
+from app.core.http import CircuitBreaker, CircuitOpenError
+from app.services import weather_service
+from app.services.rainfall_store import persist_rainfall
+from app.services.weather_service import Cell
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherPrefetcher:
+    """asyncio task that keeps the weather caches warm for hot cells"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        interval_seconds: float,
+        hot_cells: int,
+        concurrency: int,
+        max_backoff_seconds: float
+    ):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.hot_cells = hot_cells
+        self.max_backoff_seconds = max_backoff_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self.consecutive_failures = 0
+        # Per-cell consecutive failures and the monotonic time of the next attempt
+        self._cell_failures: Dict[Cell, int] = {}
+        self._cell_retry_at: Dict[Cell, float] = {}
+
+    def cells(self) -> List[Cell]:
+        """Municipality cells first, then the hottest requested cells"""
+        cells = [weather_service.weather_cell(loc["lat"], loc["lon"]) for loc in PAMPANGA_LOCATIONS]
+        for cell in weather_service.cell_heat.hottest(self.hot_cells):
+            if cell not in cells:
+                cells.append(cell)
+        return cells
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.interval_seconds * 2 ** failures, self.max_backoff_seconds)
+
+    def _forecast_due(self, cell: Cell) -> bool:
+        """Whether the cached forecast would expire within the next two cycles"""
+        remaining = weather_service.forecast_cache.ttl_remaining(cell)
+        return remaining is None or remaining <= 2 * self.interval_seconds
+
+    async def _refresh(self, cell: Cell) -> bool:
+        async with self._semaphore:
+            try:
+                await weather_service.refresh_current_weather(self.client, cell)
+                if self._forecast_due(cell):
+                    await weather_service.refresh_forecast(self.client, cell)
+            except (httpx.HTTPError, CircuitOpenError, ValueError, KeyError) as e:
+                logger.debug("Weather prefetch for cell %s failed: %s", cell, e)
+                failures = self._cell_failures.get(cell, 0) + 1
+                self._cell_failures[cell] = failures
+                self._cell_retry_at[cell] = time.monotonic() + self._backoff(failures)
+                return False
+        self._cell_failures.pop(cell, None)
+        self._cell_retry_at.pop(cell, None)
+        return True
+
+    async def run_once(self) -> bool:
+        """
+        Refresh every target cell not backing off. False (back off the whole
+        schedule) only when the circuit is open or most refreshed cells failed.
+        """
+        targets = self.cells()
+        # Forget backoff state of cells that dropped out of the target list
+        for cell in set(self._cell_failures) - set(targets):
+            self._cell_failures.pop(cell, None)
+            self._cell_retry_at.pop(cell, None)
+
+        now = time.monotonic()
+        cells = [cell for cell in targets if self._cell_retry_at.get(cell, 0.0) <= now]
+        results = await asyncio.gather(*(self._refresh(cell) for cell in cells))
+        weather_service.cell_heat.decay()
+        await asyncio.to_thread(persist_rainfall)
+
+        failed = results.count(False)
+        if failed:
+            logger.warning("Weather prefetch: %d of %d cells failed", failed, len(cells))
+        circuit_open = weather_service.open_meteo_breaker.state == CircuitBreaker.OPEN
+        return not circuit_open and failed * 2 <= len(cells)
+
+    def next_delay(self) -> float:
+        if not self.consecutive_failures:
+            return self.interval_seconds
+        return self._backoff(self.consecutive_failures)
+
+    async def _run(self):
+        while True:
+            try:
+                ok = await self.run_once()
+            except Exception:
+                logger.exception("Weather prefetch cycle crashed")
+                ok = False
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            await asyncio.sleep(self.next_delay())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="weather-prefetch")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_weather_prefetcher(client: httpx.AsyncClient) -> WeatherPrefetcher:
+    return WeatherPrefetcher(
+        client,
+        interval_seconds=settings.WEATHER_PREFETCH_INTERVAL_SECONDS,
+        hot_cells=settings.WEATHER_PREFETCH_HOT_CELLS,
+        concurrency=settings.WEATHER_PREFETCH_CONCURRENCY,
+        max_backoff_seconds=settings.WEATHER_PREFETCH_MAX_BACKOFF_SECONDS,
+    )
@@ -0,0 +1,414 @@
+"""
+Open-Meteo access for the weather endpoints.
+
+Current conditions and forecasts are cached per grid cell: coordinates are
+quantized to WEATHER_CACHE_GRID_DEGREES and the upstream request is made for
+the cell center, so every phone in the same barangay shares one cached answer.
+Forecasts are always fetched for FORECAST_MAX_DAYS and sliced per request.
+Concurrent misses for a cell are coalesced into a single upstream call (batch
+fetches register each of their cells too), and request counts per cell feed
+the prefetch scheduler's list of hot cells.
+
+Every current-conditions fetch also feeds the rolling rainfall store, whose
+1h/6h/24h totals are attached to current weather responses.
+
+Expired entries are kept for WEATHER_STALE_SECONDS more: they are served
+immediately, marked stale, while one background refresh runs. Upstream calls
+go through a circuit breaker so an Open-Meteo outage fails fast.
+"""
+import asyncio
+import logging
+import math
+import threading
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import httpx
+from app.core.cache import SingleFlight, TTLCache
+from app.core.config import settings
+from app.core.http import CircuitBreaker
+from app.services.rainfall_store import parse_observation, rainfall_store
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+
+CURRENT_FIELDS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "precipitation",
+    "rain",
+    "weather_code",
+    "wind_speed_10m",
+    "wind_direction_10m"
+]
+
+DAILY_FIELDS = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "precipitation_sum",
+    "rain_sum",
+    "weather_code",
+    "wind_speed_10m_max"
+]
+
+FORECAST_MAX_DAYS = 16
+
+WEATHER_CODES = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Foggy",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    56: "Light freezing drizzle",
+    57: "Dense freezing drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    66: "Light freezing rain",
+    67: "Heavy freezing rain",
+    71: "Slight snow",
+    73: "Moderate snow",
+    75: "Heavy snow",
+    77: "Snow grains",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    85: "Slight snow showers",
+    86: "Heavy snow showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail",
+}
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+# Grid cell -> parsed current conditions
+current_weather_cache: TTLCache = TTLCache(
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.WEATHER_CACHE_TTL_SECONDS,
+    stale_seconds=settings.WEATHER_STALE_SECONDS,
+)
+current_weather_flights = SingleFlight()
+
+# Grid cell -> parsed FORECAST_MAX_DAYS forecast
+forecast_cache: TTLCache = TTLCache(
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.WEATHER_FORECAST_CACHE_TTL_SECONDS,
+    stale_seconds=settings.WEATHER_STALE_SECONDS,
+)
+forecast_flights = SingleFlight()
+
+open_meteo_breaker = CircuitBreaker(
+    "open-meteo",
+    failure_threshold=settings.UPSTREAM_BREAKER_FAILURE_THRESHOLD,
+    reset_seconds=settings.UPSTREAM_BREAKER_RESET_SECONDS,
+)
+
+# Strong references to running background refreshes
+_revalidations: Set[asyncio.Task] = set()
+
+
+class CellHeat:
+    """Decaying request counts per grid cell"""
+
+    def __init__(self, max_cells: int = 10000):
+        self.max_cells = max_cells
+        self._scores: Dict[Cell, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, cell: Cell):
+        with self._lock:
+            if cell in self._scores or len(self._scores) < self.max_cells:
+                self._scores[cell] = self._scores.get(cell, 0.0) + 1.0
+
+    def decay(self, factor: float = 0.5, floor: float = 0.1):
+        with self._lock:
+            self._scores = {
+                cell: score * factor for cell, score in self._scores.items()
+                if score * factor >= floor
+            }
+
+    def hottest(self, n: int) -> List[Cell]:
+        with self._lock:
+            return sorted(self._scores, key=self._scores.get, reverse=True)[:n]
+
+
+cell_heat = CellHeat()
+
+
+def get_weather_description(weather_code: int) -> str:
+    """Convert WMO weather code to description"""
+    return WEATHER_CODES.get(weather_code, "Unknown")
+
+
+def weather_cell(latitude: float, longitude: float) -> Cell:
+    size = settings.WEATHER_CACHE_GRID_DEGREES
+    return math.floor(latitude / size), math.floor(longitude / size)
+
+
+def cell_center(cell: Cell) -> Tuple[float, float]:
+    size = settings.WEATHER_CACHE_GRID_DEGREES
+    return round((cell[0] + 0.5) * size, 6), round((cell[1] + 0.5) * size, 6)
+
+
+def parse_current_weather(data: dict) -> dict:
+    """Open-Meteo "current" payload -> WeatherResponse fields"""
+    current = data.get("current", {})
+    weather_code = current.get("weather_code", 0)
+    return {
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "temperature": current.get("temperature_2m", 0.0),
+        "humidity": current.get("relative_humidity_2m"),
+        "precipitation": current.get("precipitation", 0.0),
+        "rain": current.get("rain", 0.0),
+        "weather_code": weather_code,
+        "wind_speed": current.get("wind_speed_10m", 0.0),
+        "wind_direction": current.get("wind_direction_10m"),
+        "timestamp": current.get("time", datetime.utcnow().isoformat()),
+        "description": get_weather_description(weather_code),
+    }
+
+
+async def _get_json(client: httpx.AsyncClient, params: dict):
+    """GET Open-Meteo through the circuit breaker (raises httpx.HTTPError or CircuitOpenError)"""
+    async def request():
+        response = await client.get(OPEN_METEO_URL, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    return await open_meteo_breaker.call(request)
+
+
+def _record_rainfall(latitude: float, longitude: float, data: dict):
+    observation = parse_observation(data)
+    if observation is not None:
+        rainfall_store.record(weather_cell(latitude, longitude), *observation)
+
+
+async def fetch_current_weather(client: httpx.AsyncClient, latitude: float, longitude: float) -> dict:
+    """Current conditions straight from Open-Meteo"""
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "current": CURRENT_FIELDS,
+        "timezone": "auto"
+    }
+    data = await _get_json(client, params)
+    _record_rainfall(latitude, longitude, data)
+    return parse_current_weather(data)
+
+
+async def fetch_current_weather_many(
+    client: httpx.AsyncClient,
+    points: List[Tuple[float, float]]
+) -> List[dict]:
+    """Current conditions for several points in one Open-Meteo call, in order"""
+    params = {
+        "latitude": ",".join(f"{lat:g}" for lat, _ in points),
+        "longitude": ",".join(f"{lon:g}" for _, lon in points),
+        "current": CURRENT_FIELDS,
+        "timezone": "auto"
+    }
+    data = await _get_json(client, params)
+    # A single location comes back as an object, several as a list
+    locations = data if isinstance(data, list) else [data]
+    if len(locations) != len(points):
+        raise ValueError(f"Open-Meteo returned {len(locations)} locations for {len(points)} requested")
+    for (latitude, longitude), location in zip(points, locations):
+        _record_rainfall(latitude, longitude, location)
+    return [parse_current_weather(location) for location in locations]
+
+
+def parse_forecast(data: dict) -> dict:
+    """Open-Meteo "daily" payload -> forecast response"""
+    daily = data.get("daily", {})
+    forecast_days = []
+
+    for i in range(len(daily.get("time", []))):
+        weather_code = daily["weather_code"][i]
+        forecast_days.append({
+            "date": daily["time"][i],
+            "temperature_max": daily["temperature_2m_max"][i],
+            "temperature_min": daily["temperature_2m_min"][i],
+            "precipitation": daily["precipitation_sum"][i],
+            "rain": daily["rain_sum"][i],
+            "weather_code": weather_code,
+            "description": get_weather_description(weather_code),
+            "wind_speed_max": daily["wind_speed_10m_max"][i]
+        })
+
+    return {
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "timezone": data.get("timezone"),
+        "forecast": forecast_days
+    }
+
+
+async def fetch_forecast(client: httpx.AsyncClient, latitude: float, longitude: float) -> dict:
+    """FORECAST_MAX_DAYS daily forecast straight from Open-Meteo"""
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "daily": DAILY_FIELDS,
+        "forecast_days": FORECAST_MAX_DAYS,
+        "timezone": "auto"
+    }
+    return parse_forecast(await _get_json(client, params))
+
+
+async def _load_current_weather(client: httpx.AsyncClient, cell: Cell) -> dict:
+    weather = await fetch_current_weather(client, *cell_center(cell))
+    current_weather_cache.set(cell, weather)
+    return weather
+
+
+async def refresh_current_weather(client: httpx.AsyncClient, cell: Cell) -> dict:
+    """Fetch a cell's current conditions and store them, sharing any in-flight fetch"""
+    return await current_weather_flights.do(cell, lambda: _load_current_weather(client, cell))
+
+
+async def refresh_forecast(client: httpx.AsyncClient, cell: Cell) -> dict:
+    """Fetch a cell's forecast and store it, sharing any in-flight fetch"""
+    async def load() -> dict:
+        forecast = await fetch_forecast(client, *cell_center(cell))
+        forecast_cache.set(cell, forecast)
+        return forecast
+
+    return await forecast_flights.do(cell, load)
+
+
+def _revalidate(refresh: Callable[[], Awaitable]):
+    """Run a refresh in the background; failures leave the stale value in place"""
+    async def run():
+        try:
+            await refresh()
+        except Exception as e:
+            logger.debug("Background weather refresh failed: %s", e)
+
+    task = asyncio.ensure_future(run())
+    _revalidations.add(task)
+    task.add_done_callback(_revalidations.discard)
+
+
+def _with_freshness(value: dict, age_seconds: Optional[float], fresh: bool) -> dict:
+    return {**value, "stale": not fresh, "age_seconds": age_seconds}
+
+
+def _with_rainfall(cell: Cell, weather: dict) -> dict:
+    return {**weather, **rainfall_store.totals(cell)}
+
+
+async def get_current_weather(client: httpx.AsyncClient, latitude: float, longitude: float) -> dict:
+    """Current conditions for the grid cell containing the point, cached"""
+    cell = weather_cell(latitude, longitude)
+    cell_heat.record(cell)
+    cached = current_weather_cache.get_stale(cell)
+    if cached is not None:
+        weather, age, fresh = cached
+        if not fresh:
+            _revalidate(lambda: refresh_current_weather(client, cell))
+        return _with_rainfall(cell, _with_freshness(weather, age, fresh))
+    return _with_rainfall(cell, _with_freshness(await refresh_current_weather(client, cell), 0.0, True))
+
+
+async def get_current_weather_many(
+    client: httpx.AsyncClient,
+    points: List[Tuple[float, float]]
+) -> List[dict]:
+    """
+    Current conditions for many points. Cached cells (fresh or stale) are
+    served from memory; the remaining distinct cells are fetched with
+    multi-location calls of at most WEATHER_BATCH_CHUNK_SIZE cells each, and
+    stale cells are refreshed the same way in the background. A cell whose
+    fetch failed falls back to whatever the cache holds for it by then; the
+    error is raised only if some cell has nothing to serve.
+    """
+    cells = [weather_cell(lat, lon) for lat, lon in points]
+    found: Dict[Cell, dict] = {}
+    missing: Dict[Cell, None] = {}
+    stale: List[Cell] = []
+    for cell in cells:
+        cell_heat.record(cell)
+        if cell in found or cell in missing:
+            continue
+        cached = current_weather_cache.get_stale(cell)
+        if cached is None:
+            missing[cell] = None
+            continue
+        weather, age, fresh = cached
+        found[cell] = _with_freshness(weather, age, fresh)
+        if not fresh:
+            stale.append(cell)
+
+    if stale:
+        _revalidate(lambda: _fetch_cells(client, stale))
+
+    error: Optional[BaseException] = None
+    for cell, result in (await _fetch_cells(client, list(missing))).items():
+        if not isinstance(result, BaseException):
+            found[cell] = _with_freshness(result, 0.0, True)
+            continue
+        cached = current_weather_cache.get_stale(cell)
+        if cached is None:
+            error = error or result
+            continue
+        weather, age, fresh = cached
+        found[cell] = _with_freshness(weather, age, fresh)
+    if error is not None:
+        raise error
+
+    return [_with_rainfall(cell, found[cell]) for cell in cells]
+
+
+async def _fetch_chunk(client: httpx.AsyncClient, cells: List[Cell]) -> Dict[Cell, dict]:
+    weathers = await fetch_current_weather_many(client, [cell_center(cell) for cell in cells])
+    for cell, weather in zip(cells, weathers):
+        current_weather_cache.set(cell, weather)
+    return dict(zip(cells, weathers))
+
+
+async def _chunk_cell(request: Awaitable[Dict[Cell, dict]], cell: Cell) -> dict:
+    return (await request)[cell]
+
+
+async def _fetch_cells(client: httpx.AsyncClient, cells: List[Cell]) -> Dict[Cell, object]:
+    """
+    Fetch and cache current conditions for cells using chunked multi-location
+    calls, returning each cell's weather or the exception its fetch raised.
+    Every cell goes through current_weather_flights: cells already in flight
+    are joined instead of fetched again, and the rest are registered as
+    in-flight until their chunk's call returns.
+    """
+    pending = [cell for cell in cells if cell not in current_weather_flights]
+    chunk = settings.WEATHER_BATCH_CHUNK_SIZE
+    for i in range(0, len(pending), chunk):
+        request = asyncio.ensure_future(_fetch_chunk(client, pending[i:i + chunk]))
+        for cell in pending[i:i + chunk]:
+            current_weather_flights.start(cell, lambda request=request, cell=cell: _chunk_cell(request, cell))
+
+    tasks = [
+        current_weather_flights.start(cell, lambda cell=cell: _load_current_weather(client, cell))
+        for cell in cells
+    ]
+    results = await asyncio.gather(*(asyncio.shield(task) for task in tasks), return_exceptions=True)
+    return dict(zip(cells, results))
+
+
+async def get_forecast(client: httpx.AsyncClient, latitude: float, longitude: float, days: int) -> dict:
+    """Daily forecast for the grid cell containing the point, cached and cut to `days`"""
+    cell = weather_cell(latitude, longitude)
+    cell_heat.record(cell)
+    cached = forecast_cache.get_stale(cell)
+    if cached is not None:
+        forecast, age, fresh = cached
+        if not fresh:
+            _revalidate(lambda: refresh_forecast(client, cell))
+    else:
+        forecast, age, fresh = await refresh_forecast(client, cell), 0.0, True
+    return _with_freshness({**forecast, "forecast": forecast["forecast"][:days]}, age, fresh)
@@ -0,0 +1,174 @@
+"""
+Benchmark: report listing through the async session vs the old blocking pattern.
+
+Seeds a throwaway SQLite database, then starts the real app under uvicorn in
+a separate process with one extra route, /bench/blocking/reports, which runs
+the same query the way the routers used to (sync Session inside an async def).
+Each variant is loaded with concurrent listing requests while a probe polls
+/health, showing how long unrelated requests wait behind database work.
+
+Usage (from the server directory):
+    python scripts/bench_async_db.py --reports 200000 --concurrency 16 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+SERVER_DIR = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, SERVER_DIR)
+
+
+def serve(port: int):
+    """Run the app plus the blocking baseline route (child process)"""
+    import uvicorn
+    from fastapi import Depends
+    from sqlalchemy.orm import Session
+    from app.core.database import get_db
+    from app.main import app
+    from app.models.models import Report
+
+    @app.get("/bench/blocking/reports")
+    async def blocking_reports(
+        skip: int = 0,
+        limit: int = 100,
+        incident_type: str = None,
+        db: Session = Depends(get_db)
+    ):
+        # The pre-async router body: the query runs on the event loop thread
+        query = db.query(Report)
+        if incident_type:
+            query = query.filter(Report.incident_type == incident_type)
+        reports = query.order_by(Report.created_at.desc()).offset(skip).limit(limit).all()
+        return [{"id": report.id} for report in reports]
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def seed(count: int):
+    from app.core.database import Base, engine
+    from app.models.models import Report
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    start = datetime(2025, 1, 1)
+    rows = [
+        {
+            "user_id": 1,
+            "incident_type": rng.choice(["INFO", "CRITICAL", "WARNING"]),
+            "latitude": 14.8 + rng.random() * 0.5,
+            "longitude": 120.4 + rng.random() * 0.5,
+            "description": "benchmark report",
+            "created_at": start + timedelta(seconds=rng.randrange(90 * 86400)),
+            "updated_at": start,
+            "is_verified": 0,
+            "upvote_count": 0,
+        }
+        for _ in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), rows)
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)] * 1000
+
+
+async def load(base_url: str, path: str, concurrency: int, seconds: float):
+    """Concurrent listing requests plus a /health probe every 10 ms"""
+    latencies, probes = [], []
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(path, params={"incident_type": "CRITICAL", "limit": 50})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                (await client.get("/health")).raise_for_status()
+                probes.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(probe(), *(worker() for _ in range(concurrency)))
+    return latencies, probes
+
+
+async def wait_ready(base_url: str, process: subprocess.Popen):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError("Benchmark server exited during startup")
+            try:
+                (await client.get("/health")).raise_for_status()
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Benchmark server did not start")
+
+
+async def benchmark(args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}",
+            "WEATHER_PREFETCH_ENABLED": "false",
+        }
+        os.environ.update(env)
+        print(f"Seeding {args.reports} reports...")
+        seed(args.reports)
+
+        process = subprocess.Popen(
+            [sys.executable, __file__, "--serve", "--port", str(args.port)],
+            cwd=SERVER_DIR,
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            await wait_ready(base_url, process)
+            print(f"{args.concurrency} concurrent clients, {args.seconds:g}s per variant")
+            print(f"{'variant':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'health p50':>12}{'health p95':>12}")
+            for label, path in (
+                ("blocking", "/bench/blocking/reports"),
+                ("async", "/api/reports/"),
+            ):
+                latencies, probes = await load(base_url, path, args.concurrency, args.seconds)
+                print(
+                    f"{label:<10}{len(latencies) / args.seconds:>10.0f}"
+                    f"{statistics.median(latencies) * 1000:>10.1f}{percentile(latencies, 0.95):>10.1f}"
+                    f"{statistics.median(probes) * 1000:>12.1f}{percentile(probes, 0.95):>12.1f}"
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=200000, help="Rows to seed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per variant")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+    else:
+        asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark: per-request httpx.AsyncClient vs the shared pooled client.
+
+Starts a local stub upstream in a separate process (optionally over TLS with
+a throwaway self-signed certificate) that counts accepted connections, then
+fires the same number of concurrent requests through both client strategies.
+
+Usage (from the server directory):
+    python scripts/bench_http_client.py --requests 2000 --concurrency 50 --tls --handshake-ms 150
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from app.core.config import settings  # noqa: E402
+
+BODY = json.dumps({"latitude": 15.0, "longitude": 120.5, "current": {"temperature_2m": 29.0}}).encode()
+
+
+class StubUpstream:
+    """
+    Minimal keep-alive HTTP/1.1 server answering every request with BODY.
+    GET /connections returns (and resets) the number of accepted connections.
+    """
+
+    def __init__(self, latency: float, handshake: float):
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+
+    @staticmethod
+    def respond(writer: asyncio.StreamWriter, body: bytes):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+        )
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        if self.handshake:
+            # Round trips a new TCP(+TLS) connection costs over a real WAN link
+            await asyncio.sleep(self.handshake)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                if head.startswith(b"GET /connections "):
+                    # The stats connection itself is not counted
+                    count, self.connections = self.connections - 1, 0
+                    self.respond(writer, str(count).encode())
+                else:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.respond(writer, BODY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def self_signed_context(directory: str) -> ssl.SSLContext:
+    from datetime import datetime, timedelta, timezone
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=1))
+        .not_valid_after(now + timedelta(hours=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def serve(port_queue, latency: float, handshake: float, tls: bool, directory: str):
+    async def main():
+        stub = StubUpstream(latency, handshake)
+        context = self_signed_context(directory) if tls else None
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0, ssl=context)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+async def run(url: str, requests: int, concurrency: int, make_client, shared: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    client = make_client() if shared else None
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if shared:
+                response = await client.get(url)
+            else:
+                async with make_client() as own:
+                    response = await own.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    if client is not None:
+        await client.aclose()
+    return elapsed, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated upstream processing time")
+    parser.add_argument(
+        "--handshake-ms", type=float, default=0.0,
+        help="Extra delay per new connection, modelling WAN handshake round trips (e.g. 150 for 3 x 50 ms RTT)"
+    )
+    parser.add_argument("--tls", action="store_true", help="Serve the stub over TLS (needs cryptography)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        port_queue = multiprocessing.Queue()
+        upstream = multiprocessing.Process(
+            target=serve,
+            args=(port_queue, args.latency_ms / 1000.0, args.handshake_ms / 1000.0, args.tls, directory),
+            daemon=True,
+        )
+        upstream.start()
+        port = port_queue.get(timeout=30)
+        base_url = f"{'https' if args.tls else 'http'}://127.0.0.1:{port}"
+
+        def per_request_client():
+            # What the weather router used to do on every call
+            return httpx.AsyncClient(timeout=10.0, verify=False)
+
+        def pooled_client():
+            # Same configuration as app.core.http.create_http_client
+            return httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.UPSTREAM_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                verify=False,
+            )
+
+        async def connections() -> int:
+            async with httpx.AsyncClient(verify=False) as client:
+                return int((await client.get(f"{base_url}/connections")).text)
+
+        print(f"{args.requests} requests, concurrency {args.concurrency}, "
+              f"{'TLS' if args.tls else 'plain HTTP'}, upstream latency {args.latency_ms:g} ms, "
+              f"handshake delay {args.handshake_ms:g} ms")
+        print(f"{'client':<14}{'total s':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'conns':>8}")
+        for label, factory, shared in (
+            ("per-request", per_request_client, False),
+            ("pooled", pooled_client, True),
+        ):
+            await connections()
+            elapsed, latencies = await run(
+                f"{base_url}/v1/forecast", args.requests, args.concurrency, factory, shared
+            )
+            latencies.sort()
+            print(
+                f"{label:<14}{elapsed:>10.2f}{args.requests / elapsed:>10.0f}"
+                f"{statistics.median(latencies) * 1000:>10.1f}"
+                f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>10.1f}"
+                f"{await connections():>8}"
+            )
+
+        upstream.terminate()
+        upstream.join()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Benchmark: mixed read/write load on SQLite with the default and production profiles.
+
+For each DATABASE_PROFILE a fresh database is seeded, then reader threads list
+the newest reports while writer threads insert reports (one commit each), all
+through the same engine factory the app uses. With the default rollback
+journal every commit locks readers out and pays a full fsync; in WAL mode
+readers proceed during writes and commits are much cheaper.
+
+Usage (from the server directory):
+    python scripts/bench_sqlite_profile.py --readers 8 --writers 2 --seconds 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app.core.database import Base, create_sync_engine  # noqa: E402
+from app.models.models import Report  # noqa: E402
+
+
+def report_row(rng: random.Random) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": 1,
+        "incident_type": rng.choice(["INFO", "CRITICAL", "WARNING"]),
+        "latitude": 14.8 + rng.random() * 0.5,
+        "longitude": 120.4 + rng.random() * 0.5,
+        "description": "benchmark report",
+        "created_at": now,
+        "updated_at": now,
+        "is_verified": 0,
+        "upvote_count": 0,
+    }
+
+
+def run_profile(directory: str, profile: str, args) -> dict:
+    url = f"sqlite:///{os.path.join(directory, profile + '.db')}"
+    engine = create_sync_engine(url, profile)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), [report_row(rng) for _ in range(args.reports)])
+
+    stats = {"read": [], "write": [], "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+    newest = select(Report.id, Report.latitude, Report.longitude).order_by(Report.id.desc()).limit(50)
+
+    def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(newest).all()
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+                continue
+            with lock:
+                stats["read"].append(time.perf_counter() - start)
+
+    def writer(seed: int):
+        writer_rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(Report.__table__.insert(), report_row(writer_rng))
+            except OperationalError:
+                with lock:
+                    stats["errors"] += 1
+                continue
+            with lock:
+                stats["write"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return stats
+
+
+def p95(values) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[max(int(len(values) * 0.95) - 1, 0)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=50000, help="Rows to seed")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per profile")
+    parser.add_argument("--dir", default=None, help="Where to create the databases (default: a temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile, {args.reports} seeded rows")
+        print(f"{'profile':<12}{'reads/s':>10}{'read p50':>10}{'read p95':>10}{'writes/s':>10}{'write p95':>11}{'errors':>8}")
+        for profile in ("default", "production"):
+            stats = run_profile(directory, profile, args)
+            reads, writes = stats["read"], stats["write"]
+            print(
+                f"{profile:<12}{len(reads) / args.seconds:>10.0f}"
+                f"{(statistics.median(reads) * 1000 if reads else float('nan')):>10.2f}{p95(reads):>10.2f}"
+                f"{len(writes) / args.seconds:>10.0f}{p95(writes):>11.2f}{stats['errors']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
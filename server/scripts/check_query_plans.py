@@ -0,0 +1,166 @@
+"""
+Check that the hot API queries are served by indexes.
+
+Runs EXPLAIN QUERY PLAN for the query shapes used by the reports, incidents
+and auth routers and exits non-zero if any of them falls back to a full table
+scan or sorts rows in a temporary B-tree instead of reading them in index
+order. By default it checks a fresh, seeded temporary database built from
+the models; pass --database-url to check an existing (migrated) database.
+
+Usage (from the server directory):
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --database-url sqlite:///./bantaybayan.db
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from sqlalchemy import event, func, select, tuple_  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from app.core.database import Base, create_sync_engine  # noqa: E402
+from app.core.migrations import upgrade_schema  # noqa: E402
+from app.core.pagination import keyset_page  # noqa: E402
+from app.models.models import Incident, IncidentType, Report, ReportUpvote, User  # noqa: E402
+
+NOW = datetime(2025, 6, 1)
+
+# (name, statement) for every query shape a hot endpoint issues
+HOT_QUERIES = [
+    ("reports by type, newest first", select(Report).where(
+        Report.incident_type == IncidentType.CRITICAL
+    ).order_by(Report.created_at.desc()).limit(100)),
+    ("reports newest first", select(Report).order_by(Report.created_at.desc()).limit(100)),
+    ("report counts by type", select(Report.incident_type, func.count()).group_by(Report.incident_type)),
+    ("reports in clustering window", select(Report).where(
+        Report.created_at >= NOW - timedelta(hours=6)
+    ).order_by(Report.created_at)),
+    ("upvote lookup", select(ReportUpvote).where(
+        ReportUpvote.report_id == 1, ReportUpvote.user_id == 1
+    )),
+    ("active incidents by severity", keyset_page(
+        select(Incident).where(Incident.is_active == 1), Incident.severity_score, Incident.id, None, None, null_key=0.0
+    )),
+    ("incidents by status, newest first", select(Incident).where(
+        Incident.is_active == 1
+    ).order_by(Incident.created_at.desc()).limit(100)),
+    ("incidents by type, newest first", select(Incident).where(
+        Incident.incident_type == IncidentType.INFO
+    ).order_by(Incident.created_at.desc()).limit(100)),
+    ("incidents newest first", select(Incident).order_by(Incident.created_at.desc()).limit(100)),
+    ("reports keyset page", select(Report).where(
+        tuple_(Report.created_at, Report.id) < tuple_(NOW - timedelta(days=20), 5000)
+    ).order_by(Report.created_at.desc(), Report.id.desc()).limit(101)),
+    ("reports by type keyset page", select(Report).where(
+        Report.incident_type == IncidentType.CRITICAL,
+        tuple_(Report.created_at, Report.id) < tuple_(NOW - timedelta(days=20), 5000)
+    ).order_by(Report.created_at.desc(), Report.id.desc()).limit(101)),
+    ("incidents keyset page", select(Incident).where(
+        tuple_(Incident.created_at, Incident.id) < tuple_(NOW - timedelta(days=20), 500)
+    ).order_by(Incident.created_at.desc(), Incident.id.desc()).limit(101)),
+    ("active incidents keyset page", keyset_page(
+        select(Incident).where(Incident.is_active == 1), Incident.severity_score, Incident.id, (5.0, 500), 100, null_key=0.0
+    )),
+    ("user by username", select(User).where(User.username == "someone")),
+    ("user by email", select(User).where(User.email == "someone@example.com")),
+]
+
+
+def seed(engine: Engine, reports: int):
+    rng = random.Random(3)
+    types = ["INFO", "CRITICAL", "WARNING"]
+    with engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), [
+            {
+                "user_id": rng.randint(1, 50),
+                "incident_type": rng.choice(types),
+                "latitude": 14.8 + rng.random() * 0.5,
+                "longitude": 120.4 + rng.random() * 0.5,
+                "created_at": NOW - timedelta(minutes=rng.randrange(60 * 24 * 30)),
+                "updated_at": NOW,
+                "is_verified": 0,
+                "upvote_count": 0,
+            }
+            for _ in range(reports)
+        ])
+        conn.execute(Incident.__table__.insert(), [
+            {
+                "title": "Incident",
+                "incident_type": rng.choice(types),
+                "latitude": 14.8 + rng.random() * 0.5,
+                "longitude": 120.4 + rng.random() * 0.5,
+                "severity_score": rng.random() * 10,
+                "created_at": NOW - timedelta(minutes=rng.randrange(60 * 24 * 30)),
+                "updated_at": NOW,
+                "is_active": rng.random() < 0.2,
+                "report_count": 3,
+            }
+            for _ in range(reports // 20)
+        ])
+
+
+def explain_plans(engine: Engine):
+    """Let statements run with execution_options(explain_plan=True) return their query plan"""
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if context.execution_options.get("explain_plan"):
+            statement = "EXPLAIN QUERY PLAN " + statement
+        return statement, parameters
+
+
+def query_plan(conn, statement) -> list:
+    """The detail column of each EXPLAIN QUERY PLAN row; needs explain_plans() on the engine"""
+    result = conn.execute(statement.execution_options(explain_plan=True))
+    return [row[3] for row in result.cursor.fetchall()]
+
+
+def plan_problems(details) -> list:
+    problems = []
+    for detail in details:
+        words = detail.split()
+        if words[:1] == ["SCAN"] and "USING" not in words:
+            problems.append(f"full table scan: {detail}")
+        if "TEMP B-TREE" in detail:
+            problems.append(f"sort without index: {detail}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Check this SQLite database instead of a seeded temporary one")
+    parser.add_argument("--reports", type=int, default=20000, help="Rows to seed into the temporary database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.database_url:
+            engine = create_sync_engine(args.database_url, "default")
+            upgrade_schema(engine)
+        else:
+            engine = create_sync_engine(f"sqlite:///{os.path.join(directory, 'plans.db')}", "default")
+            Base.metadata.create_all(bind=engine)
+            seed(engine, args.reports)
+
+        explain_plans(engine)
+
+        failures = 0
+        with engine.connect() as conn:
+            for name, statement in HOT_QUERIES:
+                details = query_plan(conn, statement)
+                problems = plan_problems(details)
+                print(f"{'FAIL' if problems else 'ok':<5} {name}: {' | '.join(details)}")
+                for problem in problems:
+                    print(f"      {problem}")
+                failures += bool(problems)
+        engine.dispose()
+
+    if failures:
+        print(f"{failures} of {len(HOT_QUERIES)} hot queries are not index-backed")
+        sys.exit(1)
+    print(f"All {len(HOT_QUERIES)} hot queries are index-backed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Shared test setup: the app runs against a throwaway SQLite database with
+its background tasks (weather prefetch, handbook prewarm) switched off.
+Settings are read at import time, so the environment is prepared before any
+app module is imported.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+_database_dir = tempfile.mkdtemp(prefix="bantaybayan-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ["DATABASE_PROFILE"] = "default"
+os.environ["WEATHER_PREFETCH_ENABLED"] = "false"
+os.environ["HANDBOOK_PREWARM_ENABLED"] = "false"
+os.environ["RAINFALL_PERSIST"] = "false"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def empty_tables(client):
+    """Start a test with no reports or incidents in the app database"""
+    from app.core.database import engine
+    from app.models.models import Incident, Report, ReportUpvote
+
+    with engine.begin() as conn:
+        for table in (ReportUpvote.__table__, Report.__table__, Incident.__table__):
+            conn.execute(table.delete())
+    yield engine
@@ -0,0 +1,154 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.http import CircuitBreaker, CircuitOpenError, is_upstream_failure
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://api.open-meteo.com/v1/forecast")
+    response = httpx.Response(code, request=request)
+    return httpx.HTTPStatusError(f"HTTP {code}", request=request, response=response)
+
+
+def succeed():
+    async def fn():
+        return "ok"
+    return fn
+
+
+def fail(error: BaseException):
+    async def fn():
+        raise error
+    return fn
+
+
+def call(breaker: CircuitBreaker, fn):
+    return asyncio.run(breaker.call(fn))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, reset_seconds=30, clock=clock)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(httpx.ConnectError):
+            call(breaker, fail(httpx.ConnectError("down")))
+
+
+def test_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            call(breaker, fail(httpx.ConnectTimeout("slow")))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(httpx.HTTPStatusError):
+        call(breaker, fail(status_error(503)))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()["retry_in_seconds"] == 30
+
+
+def test_success_resets_the_failure_count(breaker):
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            call(breaker, fail(httpx.ConnectError("down")))
+    assert call(breaker, succeed()) == "ok"
+    with pytest.raises(httpx.ConnectError):
+        call(breaker, fail(httpx.ConnectError("down")))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_fails_fast(breaker):
+    trip(breaker)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpenError):
+        call(breaker, upstream)
+    assert calls == []
+
+
+def test_half_open_trial_success_closes(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    assert call(breaker, succeed()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["consecutive_failures"] == 0
+
+
+def test_half_open_trial_failure_reopens(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    with pytest.raises(httpx.ReadTimeout):
+        call(breaker, fail(httpx.ReadTimeout("slow")))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        call(breaker, succeed())
+
+
+def test_half_open_allows_a_single_trial(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_cancelled_trial_releases_the_slot(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    with pytest.raises(asyncio.CancelledError):
+        call(breaker, fail(asyncio.CancelledError()))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert call(breaker, succeed()) == "ok"
+
+
+@pytest.mark.parametrize("code", [400, 404, 422])
+def test_client_errors_never_open_the_circuit(breaker, code):
+    for _ in range(breaker.failure_threshold * 2):
+        with pytest.raises(httpx.HTTPStatusError):
+            call(breaker, fail(status_error(code)))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_error_closes_a_half_open_circuit(breaker, clock):
+    trip(breaker)
+    clock.now += 30
+    with pytest.raises(httpx.HTTPStatusError):
+        call(breaker, fail(status_error(400)))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_upstream_failure_classification():
+    assert is_upstream_failure(httpx.ConnectError("down"))
+    assert is_upstream_failure(httpx.ReadTimeout("slow"))
+    assert is_upstream_failure(status_error(500))
+    assert is_upstream_failure(status_error(503))
+    assert not is_upstream_failure(status_error(400))
+    assert not is_upstream_failure(status_error(429))
+
+
+def test_out_of_range_coordinates_are_rejected(client):
+    assert client.get("/api/weather/current", params={"latitude": 91, "longitude": 120}).status_code == 422
+    assert client.get("/api/weather/forecast", params={"latitude": 15, "longitude": -181}).status_code == 422
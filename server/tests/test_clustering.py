@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.models import Incident, IncidentType, Report
+from app.services import clustering
+from app.services.clustering import IncidentClusterer, ingest_report
+from app.services.incident_index import IncidentDiscIndex
+
+NOW = datetime(2026, 7, 1, 12, 0)
+# About 100 m apart along a meridian
+STEP = 0.0009
+
+
+def make_clusterer():
+    return IncidentClusterer(
+        radius_meters=300.0,
+        min_reports=3,
+        window=timedelta(hours=6),
+        index=IncidentDiscIndex(cell_meters=500.0),
+    )
+
+
+def pending_ids(clusterer):
+    return sorted(p.report_id for bucket in clusterer._pending.values() for p in bucket)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Keep the scratch incidents out of the app's k-NN index
+    monkeypatch.setattr(clustering, "sync_incident", lambda incident: None)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def add_report(db, latitude, longitude=120.5, incident_type=IncidentType.CRITICAL):
+    report = Report(
+        user_id=1, incident_type=incident_type, latitude=latitude, longitude=longitude, created_at=NOW
+    )
+    db.add(report)
+    db.commit()
+    return report
+
+
+def failing_commit():
+    raise RuntimeError("disk full")
+
+
+def test_neighbors_are_promoted_once_enough_fall_together():
+    clusterer = make_clusterer()
+    assert clusterer.observe(1, 14.9, 120.5, IncidentType.CRITICAL, NOW) is None
+    assert clusterer.observe(2, 14.9 + STEP, 120.5, IncidentType.WARNING, NOW) is None
+    # Far from the other two, so it waits on its own
+    assert clusterer.observe(3, 14.95, 120.5, IncidentType.CRITICAL, NOW) is None
+
+    cluster = clusterer.observe(4, 14.9 + 2 * STEP, 120.5, IncidentType.CRITICAL, NOW)
+
+    assert cluster.incident_id is None
+    assert cluster.report_count == 3
+    assert cluster.latitude == pytest.approx(14.9 + STEP)
+    assert cluster.incident_type == IncidentType.CRITICAL
+    assert sorted(cluster.members) == [1, 2, 4]
+    assert pending_ids(clusterer) == [3]
+
+
+def test_followers_join_the_covering_incident():
+    clusterer = make_clusterer()
+    for report_id in range(3):
+        cluster = clusterer.observe(report_id, 14.9 + report_id * STEP, 120.5, IncidentType.CRITICAL, NOW)
+    clusterer.bind(cluster, 10)
+
+    joined = clusterer.observe(3, 14.9 + 3 * STEP, 120.5, IncidentType.CRITICAL, NOW)
+
+    assert joined is cluster
+    assert cluster.report_count == 4
+    assert cluster.latitude == pytest.approx(14.9 + 1.5 * STEP)
+    assert pending_ids(clusterer) == []
+
+
+def test_pending_reports_outside_the_window_do_not_count():
+    clusterer = make_clusterer()
+    clusterer.observe(1, 14.9, 120.5, IncidentType.CRITICAL, NOW - timedelta(hours=7))
+    clusterer.observe(2, 14.9 + STEP, 120.5, IncidentType.CRITICAL, NOW)
+    assert clusterer.observe(3, 14.9 + 2 * STEP, 120.5, IncidentType.CRITICAL, NOW) is None
+    assert pending_ids(clusterer) == [2, 3]
+
+
+def test_forgetting_reports():
+    clusterer = make_clusterer()
+    for report_id in range(3):
+        cluster = clusterer.observe(report_id, 14.9 + report_id * STEP, 120.5, IncidentType.CRITICAL, NOW)
+    clusterer.bind(cluster, 10)
+    clusterer.observe(3, 14.9 + 3 * STEP, 120.5, IncidentType.WARNING, NOW)
+    clusterer.observe(4, 14.95, 120.5, IncidentType.CRITICAL, NOW)
+
+    # A pending report just leaves the pending set
+    assert clusterer.forget_report(4, 14.95, 120.5) is None
+    assert pending_ids(clusterer) == []
+
+    # A member is taken back out of the centroid and counts
+    assert clusterer.forget_report(3, 14.9 + 3 * STEP, 120.5) is cluster
+    assert cluster.report_count == 3
+    assert cluster.latitude == pytest.approx(14.9 + STEP)
+    assert cluster.type_counts == {IncidentType.CRITICAL: 3}
+    assert clusterer.forget_report(3) is None
+
+
+def test_failed_promotion_returns_reports_to_pending(db, monkeypatch):
+    clusterer = make_clusterer()
+    reports = [add_report(db, 14.9 + i * STEP) for i in range(3)]
+    ingest_report(db, reports[0], clusterer)
+    ingest_report(db, reports[1], clusterer)
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        ingest_report(db, reports[2], clusterer)
+    monkeypatch.undo()
+
+    assert db.query(Incident).count() == 0
+    assert pending_ids(clusterer) == sorted(report.id for report in reports)
+    assert clusterer._incidents == {}
+
+    # The next report promotes the same neighborhood
+    incident = ingest_report(db, add_report(db, 14.9 + 1.5 * STEP), clusterer)
+    assert incident.report_count == 4
+
+
+def test_failed_join_is_not_counted(db, monkeypatch):
+    clusterer = make_clusterer()
+    for i in range(3):
+        incident = ingest_report(db, add_report(db, 14.9 + i * STEP), clusterer)
+    cluster = clusterer._incidents[incident.id]
+    latitude = cluster.latitude
+
+    report = add_report(db, 14.9 + 3 * STEP, incident_type=IncidentType.WARNING)
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        ingest_report(db, report, clusterer)
+    monkeypatch.undo()
+
+    assert cluster.report_count == 3
+    assert cluster.latitude == pytest.approx(latitude)
+    assert cluster.type_counts == {IncidentType.CRITICAL: 3}
+    assert db.get(Incident, incident.id).report_count == 3
+
+
+def test_deleting_a_clustered_report_updates_its_incident(client, empty_tables):
+    # Well away from the reports other tests create through the API
+    ids = []
+    for i in range(4):
+        response = client.post("/api/reports/", json={
+            "incident_type": "critical", "latitude": 15.3 + i * STEP, "longitude": 120.9
+        })
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+
+    [incident] = client.get("/api/incidents/covering", params={"latitude": 15.3, "longitude": 120.9}).json()
+    assert incident["report_count"] == 4
+
+    assert client.delete(f"/api/reports/{ids[-1]}").status_code == 204
+    incident = client.get(f"/api/incidents/{incident['id']}").json()
+    assert incident["report_count"] == 3
+    assert incident["latitude"] == pytest.approx(15.3 + STEP)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor  # noqa: E402
+
+from app.services.flood_model import FEATURE_COLUMNS, FlattenedForest, FloodModel  # noqa: E402
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+
+def raw_features(rng, rows, integer=False):
+    features = rng.normal(size=(rows, N_FEATURES)) * [50, 10, 1000, 200, 300, 500] + [30, 5, 0, 100, 200, 800]
+    return np.round(features / 10) if integer else features
+
+
+def fit(rng, mean, scale, integer=False):
+    """(FloodModel, classifier, regressor) trained on scaled synthetic data"""
+    features = raw_features(rng, 400, integer)
+    flooded = (features[:, 0] < 20) ^ (features[:, 2] > 500) ^ (rng.random(len(features)) < 0.1)
+    depth = np.where(flooded, np.abs(features[:, 2]) / 1000, 0.0)
+
+    scaled = (features - mean) / scale
+    classifier = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(scaled, flooded)
+    regressor = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(scaled, depth)
+    model = FloodModel(mean, scale, FlattenedForest.from_sklearn(classifier), FlattenedForest.from_sklearn(regressor))
+    return model, classifier, regressor
+
+
+def assert_matches_sklearn(model, classifier, regressor, inputs):
+    probability, depth = model.predict_batch(inputs)
+    scaled = (inputs - model.scaler_mean) / model.scaler_scale
+    np.testing.assert_allclose(probability, classifier.predict_proba(scaled)[:, 1], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(depth, regressor.predict(scaled), rtol=0, atol=1e-12)
+
+
+def test_matches_sklearn_on_random_inputs():
+    rng = np.random.default_rng(0)
+    mean = np.array([30, 5, 0, 100, 200, 800], dtype=np.float64)
+    scale = np.array([50, 10, 1000, 200, 300, 500], dtype=np.float64)
+    model, classifier, regressor = fit(rng, mean, scale)
+
+    assert_matches_sklearn(model, classifier, regressor, raw_features(rng, 2000))
+
+
+def test_matches_sklearn_on_split_thresholds():
+    # Integer features with an identity scaler put every split at k + 0.5, which
+    # float32 represents exactly, so inputs can sit exactly on a threshold
+    rng = np.random.default_rng(1)
+    model, classifier, regressor = fit(rng, np.zeros(N_FEATURES), np.ones(N_FEATURES), integer=True)
+
+    inputs = raw_features(rng, 600, integer=True)
+    trees = [estimator.tree_ for estimator in classifier.estimators_ + regressor.estimators_]
+    for column in range(N_FEATURES):
+        splits = np.unique(np.concatenate([tree.threshold[tree.feature == column] for tree in trees]))
+        assert np.all(splits == splits.astype(np.float32))
+        if len(splits):
+            inputs[:, column] = splits[np.arange(len(inputs)) % len(splits)]
+
+    assert_matches_sklearn(model, classifier, regressor, inputs)
+
+
+def test_flattened_arrays_round_trip(tmp_path):
+    rng = np.random.default_rng(2)
+    model = fit(rng, np.zeros(N_FEATURES), np.ones(N_FEATURES))[0]
+
+    model.save(str(tmp_path / "model.npz"))
+    loaded = FloodModel.load(str(tmp_path / "model.npz"))
+
+    inputs = raw_features(rng, 100)
+    for expected, actual in zip(model.predict_batch(inputs), loaded.predict_batch(inputs)):
+        np.testing.assert_array_equal(expected, actual)
+
+
+def test_rejects_wrong_feature_count():
+    model = fit(np.random.default_rng(3), np.zeros(N_FEATURES), np.ones(N_FEATURES))[0]
+    with pytest.raises(ValueError):
+        model.predict_batch(np.zeros((3, N_FEATURES - 1)))
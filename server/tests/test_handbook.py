@@ -0,0 +1,302 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.api import scenario
+from app.schemas.schemas import HandbookRequest
+from app.services import handbook_service
+from app.services.handbook_service import HandbookStreamParser, generate_handbook, handbook_cache, stream_handbook
+
+HANDBOOK = {
+    "weather_summary": "Heavy rain over Pampanga.",
+    "flood_risk_level": "high",
+    "safety_tips": [
+        {"title": "Move to higher ground", "description": "Leave low-lying {areas} now.", "priority": "high"},
+        {"title": "Charge your phone", "description": "Keep a \"power bank\" ready.", "priority": "medium"},
+        {"title": "Boil water", "description": "Tap water may be unsafe.", "priority": "low"},
+    ],
+}
+
+
+class FakeGemini:
+    """GenerativeModel stand-in: answers once `gate` opens, tracking concurrent calls"""
+
+    def __init__(self):
+        self.prompts = []
+        self.answer = json.dumps(HANDBOOK)
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.active = 0
+        self.peak = 0
+        # Streamed answers arrive in chunks of this many characters
+        self.chunk_size = 16
+        self.delivered = 0
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await self.gate.wait()
+        finally:
+            self.active -= 1
+        return self._chunks() if stream else SimpleNamespace(text=self.answer)
+
+    async def _chunks(self):
+        for start in range(0, len(self.answer), self.chunk_size):
+            self.delivered = min(start + self.chunk_size, len(self.answer))
+            yield SimpleNamespace(text=self.answer[start:self.delivered])
+            await asyncio.sleep(0)
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini()
+    monkeypatch.setattr(handbook_service.genai, "GenerativeModel", lambda name: fake)
+    # A fresh semaphore for each test's event loop
+    monkeypatch.setattr(handbook_service, "_generation_slots", asyncio.Semaphore(2))
+    monkeypatch.setattr(handbook_service.settings, "HANDBOOK_MAX_CONCURRENT_GENERATIONS", 2)
+    monkeypatch.setattr(scenario, "_scenario_active", True)
+    handbook_cache.clear()
+    yield fake
+    handbook_cache.clear()
+
+
+def make_request(latitude=15.03, longitude=120.69, **overrides) -> HandbookRequest:
+    fields = dict(
+        weather_description="Heavy rain", temperature=27.0, precipitation=12.0, rain=12.0,
+        latitude=latitude, longitude=longitude,
+    )
+    fields.update(overrides)
+    return HandbookRequest(**fields)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_similar_requests_share_one_generation(gemini):
+    async def run():
+        gemini.gate.clear()
+        # Same cell, bands and rounded temperature; description differs only in case and spacing
+        requests = [
+            make_request(),
+            make_request(latitude=15.04, temperature=26.8),
+            make_request(weather_description="heavy  RAIN", rain=13.5),
+        ]
+        pending = asyncio.gather(*(generate_handbook(request) for request in requests))
+        await settle()
+        gemini.gate.set()
+        handbooks = await pending
+
+        assert len(gemini.prompts) == 1
+        assert handbooks[0].model_dump() == handbooks[1].model_dump() == handbooks[2].model_dump()
+        assert [tip.title for tip in handbooks[0].safety_tips] == [tip["title"] for tip in HANDBOOK["safety_tips"]]
+
+        # Cached from then on; another location cell or rain band is a new generation
+        await generate_handbook(make_request())
+        assert len(gemini.prompts) == 1
+        await generate_handbook(make_request(latitude=15.2))
+        await generate_handbook(make_request(rain=40.0))
+        assert len(gemini.prompts) == 3
+
+    asyncio.run(run())
+
+
+def test_unparseable_answers_are_not_cached(gemini):
+    async def run():
+        gemini.answer = "Sorry, I cannot help with that."
+        handbook = await generate_handbook(make_request())
+        assert handbook.model_dump() == handbook_service.fallback_handbook(make_request()).model_dump()
+
+        gemini.answer = json.dumps(HANDBOOK)
+        handbook = await generate_handbook(make_request())
+        assert handbook.weather_summary == HANDBOOK["weather_summary"]
+        assert len(gemini.prompts) == 2
+
+    asyncio.run(run())
+
+
+def test_missed_deadline_serves_static_tips_and_still_fills_the_cache(gemini, monkeypatch):
+    monkeypatch.setattr(handbook_service.settings, "HANDBOOK_DEADLINE_SECONDS", 0.05)
+
+    async def run():
+        gemini.gate.clear()
+        handbook = await generate_handbook(make_request())
+        assert handbook.safety_tips == handbook_service.STATIC_TIPS
+
+        # The shared generation outlives the caller that gave up on it
+        gemini.gate.set()
+        await settle()
+        handbook = await generate_handbook(make_request())
+        assert handbook.weather_summary == HANDBOOK["weather_summary"]
+        assert len(gemini.prompts) == 1
+
+    asyncio.run(run())
+
+
+def test_generations_are_bounded_by_the_semaphore(gemini):
+    async def run():
+        gemini.gate.clear()
+        pending = asyncio.gather(*(
+            generate_handbook(make_request(latitude=14.5 + 0.1 * i)) for i in range(5)
+        ))
+        await settle()
+        assert gemini.active == 2
+
+        gemini.gate.set()
+        await pending
+        assert len(gemini.prompts) == 5
+        assert gemini.peak == 2
+
+    asyncio.run(run())
+
+
+def test_hung_gemini_call_is_abandoned(gemini, monkeypatch):
+    monkeypatch.setattr(handbook_service.settings, "HANDBOOK_GENERATION_TIMEOUT_SECONDS", 0.05)
+
+    async def run():
+        gemini.gate.clear()
+        handbook = await generate_handbook(make_request())
+        assert handbook.safety_tips == handbook_service.STATIC_TIPS
+        # Its generation slot is free again
+        assert gemini.active == 0
+        assert not handbook_service._generation_slots.locked()
+        assert handbook_service._generation_slots._value == 2
+
+    asyncio.run(run())
+
+
+def parse_events(events):
+    """[(event, data)] from server-sent event strings"""
+    parsed = []
+    for event in events:
+        name, data = event.strip().split("\n")
+        parsed.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return parsed
+
+
+def test_parser_emits_each_part_once_it_is_complete():
+    text = "Here is your handbook:\n```json\n" + json.dumps(HANDBOOK, indent=2) + "\n```"
+    parser = HandbookStreamParser()
+    events = []
+    for position, char in enumerate(text):
+        events.extend((position, event, data) for event, data in parser.feed(char))
+
+    assert [event for _, event, _ in events] == ["summary", "risk", "tip", "tip", "tip"]
+    assert events[0][2] == {"weather_summary": HANDBOOK["weather_summary"]}
+    assert events[1][2] == {"flood_risk_level": HANDBOOK["flood_risk_level"]}
+    # Braces and escaped quotes inside strings do not end a tip early
+    assert [data for _, event, data in events if event == "tip"] == HANDBOOK["safety_tips"]
+    # Each tip is emitted on the character that closes it
+    assert all(text[position] == "}" for position, _, _ in events[2:])
+
+
+def test_stream_sends_tips_before_the_answer_is_complete(gemini):
+    async def run():
+        seen = []
+        async for event in stream_handbook(make_request()):
+            seen.append((event, gemini.delivered))
+        events = parse_events(event for event, _ in seen)
+
+        assert [name for name, _ in events] == ["summary", "risk", "tip", "tip", "tip", "done"]
+        first_tip = next(delivered for (event, delivered), (name, _) in zip(seen, events) if name == "tip")
+        assert first_tip < len(gemini.answer)
+        assert events[-1][1] == HANDBOOK
+
+        # Replayed from the cache, with the same events
+        replay = [event async for event in stream_handbook(make_request())]
+        assert parse_events(replay) == events
+        assert len(gemini.prompts) == 1
+
+    asyncio.run(run())
+
+
+def test_streams_and_plain_requests_share_one_generation(gemini):
+    async def run():
+        gemini.gate.clear()
+
+        async def collect():
+            return [event async for event in stream_handbook(make_request())]
+
+        streams = [asyncio.create_task(collect()) for _ in range(2)]
+        await settle()
+        plain = asyncio.create_task(generate_handbook(make_request()))
+        await settle()
+        gemini.gate.set()
+        first, second = await asyncio.gather(*streams)
+        handbook = await plain
+
+        assert len(gemini.prompts) == 1
+        assert first == second
+        assert parse_events(first)[-1][1] == handbook.model_dump()
+
+    asyncio.run(run())
+
+
+def cell_of(request):
+    """The location cell of a request's handbook key"""
+    return handbook_service.handbook_key(request, "emergency")[4:6]
+
+
+def client_request(latitude, longitude):
+    """What the app sends for a location while the storm scenario is active"""
+    weather = scenario.get_scenario_weather_data(latitude, longitude)
+    return make_request(
+        latitude=latitude, longitude=longitude, weather_description=weather["description"],
+        temperature=weather["temperature"], precipitation=weather["precipitation"], rain=weather["rain"],
+    )
+
+
+def test_prewarm_covers_the_cells_around_each_municipality(gemini):
+    requests = handbook_service.prewarm_requests()
+    cells = {cell_of(request) for request in requests}
+
+    for location in scenario.PAMPANGA_LOCATIONS:
+        row, col = cell_of(make_request(latitude=location["lat"], longitude=location["lon"]))
+        assert {(row + i, col + j) for i in (-1, 0, 1) for j in (-1, 0, 1)} <= cells
+
+    # One request per cell and risk tier, municipalities first
+    keys = [handbook_service.handbook_key(request, "emergency") for request in requests]
+    assert len(keys) == len(set(keys)) == len(cells) * len(handbook_service.PREWARM_RAIN_MM)
+    first = requests[:len(scenario.PAMPANGA_LOCATIONS) * len(handbook_service.PREWARM_RAIN_MM)]
+    assert {(r.latitude, r.longitude) for r in first} == {
+        (location["lat"], location["lon"]) for location in scenario.PAMPANGA_LOCATIONS
+    }
+
+
+def test_prewarm_serves_the_first_wave_from_the_cache(gemini, monkeypatch):
+    monkeypatch.setattr(handbook_service.settings, "HANDBOOK_PREWARM_CELL_RADIUS", 1)
+    size = handbook_service.settings.HANDBOOK_CACHE_GRID_DEGREES
+
+    async def run():
+        await handbook_service.prewarm_handbooks(scenario_active=True)
+        warmed = len(gemini.prompts)
+        assert warmed == len(handbook_service.prewarm_requests())
+        # Prewarm leaves the other generation slot to users
+        assert gemini.peak == 1
+
+        for location in scenario.PAMPANGA_LOCATIONS:
+            await generate_handbook(client_request(location["lat"], location["lon"]))
+            # The middle of the cell north of the municipality's
+            row, col = cell_of(make_request(latitude=location["lat"], longitude=location["lon"]))
+            await generate_handbook(client_request((row + 1.5) * size, (col + 0.5) * size))
+        assert len(gemini.prompts) == warmed
+
+    asyncio.run(run())
+
+
+def test_prewarm_stops_when_the_scenario_is_toggled(gemini):
+    async def run():
+        gemini.gate.clear()
+        prewarm = asyncio.create_task(handbook_service.prewarm_handbooks(scenario_active=True))
+        await settle()
+        scenario._scenario_active = False
+        gemini.gate.set()
+        await prewarm
+        assert len(gemini.prompts) == 1
+
+    asyncio.run(run())
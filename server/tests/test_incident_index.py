@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from app.services.geo_math import haversine_distance
+from app.services.incident_index import IncidentDiscIndex
+
+
+def brute_force(discs, latitude, longitude):
+    hits = [
+        (incident_id, haversine_distance(latitude, longitude, lat, lon))
+        for incident_id, (lat, lon, radius) in discs.items()
+        if haversine_distance(latitude, longitude, lat, lon) <= radius
+    ]
+    return sorted(hits, key=lambda hit: hit[1])
+
+
+@pytest.mark.parametrize("cell_meters", [100.0, 500.0, 2000.0])
+def test_covering_matches_a_scan_of_every_disc(cell_meters):
+    rng = random.Random(0)
+    index = IncidentDiscIndex(cell_meters)
+    discs = {}
+    for incident_id in range(200):
+        discs[incident_id] = (rng.uniform(14.8, 15.1), rng.uniform(120.4, 120.7), rng.uniform(0.0, 3000.0))
+        index.upsert(incident_id, *discs[incident_id])
+
+    for _ in range(500):
+        latitude, longitude = rng.uniform(14.8, 15.1), rng.uniform(120.4, 120.7)
+        assert index.covering(latitude, longitude) == brute_force(discs, latitude, longitude)
+
+
+def test_moving_and_removing_discs():
+    index = IncidentDiscIndex(cell_meters=500.0)
+    index.upsert(1, 14.90, 120.50, 1000.0)
+    index.upsert(2, 14.90, 120.51, 200.0)
+    assert [incident_id for incident_id, _ in index.covering(14.90, 120.5085)] == [2, 1]
+
+    # Moved a few kilometres away: no longer found at its old place
+    index.upsert(1, 14.95, 120.50, 1000.0)
+    assert [incident_id for incident_id, _ in index.covering(14.90, 120.5085)] == [2]
+    assert [incident_id for incident_id, _ in index.covering(14.95, 120.50)] == [1]
+
+    # A disc is found right up to its edge
+    edge = 14.90 + 199.0 / 111_195.0
+    assert index.covering(edge, 120.51)[0][0] == 2
+
+    index.remove(2)
+    index.remove(2)
+    assert index.covering(14.90, 120.51) == []
+    assert len(index) == 1 and 1 in index and 2 not in index
+    assert index._cells.keys() == set(index._discs[1][3])
@@ -0,0 +1,88 @@
+import random
+import time
+
+import pytest
+
+from app.models.models import IncidentType
+from app.services.geo_math import haversine_distance
+from app.services.knn_index import SpatialKNNIndex
+
+TYPES = list(IncidentType)
+
+
+def random_points(rng, count, first_id=0):
+    return {
+        point_id: (rng.uniform(14.8, 15.1), rng.uniform(120.4, 120.7), rng.choice(TYPES))
+        for point_id in range(first_id, first_id + count)
+    }
+
+
+def brute_force(points, latitude, longitude, k, incident_type=None, max_distance=None):
+    hits = sorted(
+        (haversine_distance(latitude, longitude, lat, lon), point_id)
+        for point_id, (lat, lon, point_type) in points.items()
+        if incident_type is None or point_type == incident_type
+    )
+    if max_distance is not None:
+        hits = [hit for hit in hits if hit[0] <= max_distance]
+    return [(point_id, distance) for distance, point_id in hits[:k]]
+
+
+def assert_matches(index, points, rng, queries=100):
+    for _ in range(queries):
+        latitude, longitude = rng.uniform(14.8, 15.1), rng.uniform(120.4, 120.7)
+        k = rng.choice([1, 5, 40])
+        incident_type = rng.choice([None] + TYPES)
+        max_distance = rng.choice([None, 2000.0])
+        expected = brute_force(points, latitude, longitude, k, incident_type, max_distance)
+        actual = index.nearest(latitude, longitude, k, incident_type, max_distance)
+        assert [point_id for point_id, _ in actual] == [point_id for point_id, _ in expected]
+        assert [d for _, d in actual] == pytest.approx([d for _, d in expected], abs=1e-3)
+
+
+def test_buffered_and_stale_writes_are_seen_before_a_rebuild():
+    rng = random.Random(0)
+    # Never rebuilds on its own, so every write below stays buffered or stale
+    index = SpatialKNNIndex(rebuild_seconds=3600, rebuild_buffer=10_000)
+    points = random_points(rng, 2000)
+    index.load((point_id, lat, lon, t) for point_id, (lat, lon, t) in points.items())
+    assert_matches(index, points, rng)
+
+    # Move, retype and delete tree entries, and add new points
+    for point_id in rng.sample(sorted(points), 300):
+        points[point_id] = random_points(rng, 1, point_id)[point_id]
+        index.upsert(point_id, *points[point_id])
+    for point_id in rng.sample(sorted(points), 300):
+        del points[point_id]
+        index.remove(point_id)
+    for point_id, point in random_points(rng, 100, first_id=5000).items():
+        points[point_id] = point
+        index.upsert(point_id, *point)
+
+    # Over-fetch covers exactly the tree entries that are outdated
+    assert index._stale_in_trees == len(set(index._stale) & set(range(2000)))
+    assert len(index) == len(points)
+    assert_matches(index, points, rng)
+
+    index._rebuild()
+    assert index._buffer == {} and index._stale == {}
+    assert_matches(index, points, rng)
+
+
+def test_full_buffer_rebuilds_in_the_background():
+    rng = random.Random(1)
+    index = SpatialKNNIndex(rebuild_seconds=3600, rebuild_buffer=50)
+    points = random_points(rng, 200)
+    index.load((point_id, lat, lon, t) for point_id, (lat, lon, t) in points.items())
+
+    for point_id, point in random_points(rng, 50, first_id=1000).items():
+        points[point_id] = point
+        index.upsert(point_id, *point)
+
+    # A new id is both buffered and stale, so the limit is reached halfway through
+    deadline = time.monotonic() + 5
+    while (index._rebuilding or not index._built_at) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sum(len(ids) for _, ids in index._trees.values()) >= 225
+    assert len(index._buffer) + len(index._stale) <= index.rebuild_buffer
+    assert_matches(index, points, rng)
@@ -0,0 +1,170 @@
+import base64
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.models.models import Incident, Report
+
+NOW = datetime(2025, 6, 1)
+
+
+def seed(engine, reports=120, incidents=60):
+    rng = random.Random(5)
+    # Few distinct timestamps and scores, so many rows tie on the sort key
+    with engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), [
+            {
+                "user_id": 1,
+                "incident_type": rng.choice(["INFO", "CRITICAL", "WARNING"]),
+                "latitude": 14.9,
+                "longitude": 120.5,
+                "created_at": NOW - timedelta(minutes=rng.randrange(10)),
+                "updated_at": NOW,
+                "is_verified": 0,
+                "upvote_count": 0,
+            }
+            for _ in range(reports)
+        ])
+        conn.execute(Incident.__table__.insert(), [
+            {
+                "title": "Incident",
+                "incident_type": "INFO",
+                "latitude": 14.9,
+                "longitude": 120.5,
+                "severity_score": float(rng.randrange(4)),
+                "created_at": NOW - timedelta(minutes=rng.randrange(10)),
+                "updated_at": NOW,
+                "is_active": i % 2,
+                "report_count": 1,
+            }
+            for i in range(incidents)
+        ])
+
+
+def walk(client, path, **params):
+    """Follow X-Next-Cursor until the last page; returns ids and page count"""
+    ids, pages, cursor = [], 0, None
+    while True:
+        response = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids.extend(row["id"] for row in response.json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("reports:created_at", NOW, 42)
+    assert decode_cursor(token, "reports:created_at", Report.created_at) == (NOW, 42)
+
+    token = encode_cursor("incidents:severity_score", 7.5, 3)
+    assert decode_cursor(token, "incidents:severity_score", Incident.severity_score) == (7.5, 3)
+
+
+@pytest.mark.parametrize("token", [
+    "garbage!",
+    "",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(json.dumps(["reports:created_at", "2025-06-01"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["reports:created_at", "yesterday", 1]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["reports:created_at", "2025-06-01T00:00:00", "1"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(["reports:created_at", None, 1]).encode()).decode(),
+])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token, "reports:created_at", Report.created_at)
+
+
+def test_cursor_from_another_ordering_is_rejected():
+    token = encode_cursor("incidents:severity_score", 1.0, 1)
+    with pytest.raises(ValueError):
+        decode_cursor(token, "incidents:created_at", Incident.created_at)
+
+
+def test_report_pages_cover_every_row_once(client, empty_tables):
+    seed(empty_tables)
+    everything = [row["id"] for row in client.get("/api/reports/", params={"limit": 1000}).json()]
+
+    ids, pages = walk(client, "/api/reports/", limit=7)
+
+    assert ids == everything
+    assert len(set(ids)) == 120
+    assert pages == 18
+
+
+def test_report_pages_with_type_filter(client, empty_tables):
+    seed(empty_tables)
+    expected = [
+        row["id"] for row in client.get("/api/reports/", params={"limit": 1000, "incident_type": "CRITICAL"}).json()
+    ]
+
+    ids, _ = walk(client, "/api/reports/", limit=5, incident_type="CRITICAL")
+
+    assert ids == expected
+
+
+def test_pages_do_not_shift_when_rows_are_inserted(client, empty_tables):
+    seed(empty_tables)
+    first = client.get("/api/reports/", params={"limit": 10})
+    later = client.get("/api/reports/", params={"limit": 10, "cursor": first.headers[NEXT_CURSOR_HEADER]}).json()
+
+    client.post("/api/reports/", json={"incident_type": "info", "latitude": 14.9, "longitude": 120.5})
+    again = client.get("/api/reports/", params={"limit": 10, "cursor": first.headers[NEXT_CURSOR_HEADER]}).json()
+
+    assert [row["id"] for row in again] == [row["id"] for row in later]
+
+
+def test_incident_pages_by_newest_and_by_severity(client, empty_tables):
+    seed(empty_tables)
+    newest = [row["id"] for row in client.get("/api/incidents/", params={"limit": 1000}).json()]
+    active = [row["id"] for row in client.get("/api/incidents/active").json()]
+
+    assert walk(client, "/api/incidents/", limit=9)[0] == newest
+    assert walk(client, "/api/incidents/active", limit=4)[0] == active
+    assert len(active) == 30
+
+    scores = [row["severity_score"] for row in client.get("/api/incidents/active").json()]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_incidents_without_severity_are_paged(client, empty_tables):
+    ids = []
+    for severity in (2.0, 5.0, 1.0):
+        created = client.post("/api/incidents/", json={
+            "title": "Flooding", "incident_type": "info", "latitude": 14.9, "longitude": 120.5, "severity_score": severity
+        })
+        ids.append(created.json()["id"])
+    assert client.put(f"/api/incidents/{ids[0]}", json={"severity_score": None}).status_code == 200
+
+    everything = [row["id"] for row in client.get("/api/incidents/active").json()]
+    ids_paged, pages = walk(client, "/api/incidents/active", limit=1)
+
+    # The NULL severity ranks as 0, below the others
+    assert everything == [ids[1], ids[2], ids[0]]
+    assert ids_paged == everything
+    assert pages == 3
+
+
+def test_null_key_cursor():
+    token = encode_cursor("incidents:severity_score", 0.0, 9)
+    assert decode_cursor(token, "incidents:severity_score", Incident.severity_score) == (0.0, 9)
+
+
+def test_last_page_has_no_cursor(client, empty_tables):
+    seed(empty_tables, reports=5)
+    response = client.get("/api/reports/", params={"limit": 5})
+    assert len(response.json()) == 5
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_bad_cursors_are_a_client_error(client, empty_tables):
+    seed(empty_tables)
+    severity_cursor = client.get("/api/incidents/active", params={"limit": 2}).headers[NEXT_CURSOR_HEADER]
+
+    assert client.get("/api/reports/", params={"cursor": "garbage!"}).status_code == 400
+    assert client.get("/api/incidents/", params={"cursor": severity_cursor}).status_code == 400
+    assert client.get("/api/incidents/active", params={"cursor": "e30"}).status_code == 400
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.api import predictions
+from app.services import flood_prediction
+from app.services.flood_model import FEATURE_COLUMNS, FlattenedForest, FloodModel
+from app.services.raster_service import RasterStore, write_layer
+
+# Elevation is 0 m west of 120.5 E and 10 m east of it
+TRANSFORM = (120.4, 0.001, 0.0, 15.0, 0.0, -0.001)
+
+
+def one_split(low, high):
+    """A single tree: `low` where elevation <= 5, `high` above"""
+    return FlattenedForest(
+        feature=np.array([0, 0, 0], dtype=np.int32),
+        threshold=np.array([5.0, np.inf, np.inf]),
+        children=np.array([1, 1, 2], dtype=np.int32),
+        value=np.array([0.5, low, high]),
+        roots=np.array([0], dtype=np.int32),
+        max_depth=1,
+    )
+
+
+@pytest.fixture
+def model(monkeypatch, tmp_path):
+    elevation = np.zeros((200, 200), dtype=np.float32)
+    elevation[:, 100:] = 10.0
+    write_layer(str(tmp_path), "elevation", 200, 200, TRANSFORM, lambda start, stop: elevation[start:stop])
+    monkeypatch.setattr(flood_prediction, "raster_store", RasterStore(str(tmp_path)))
+
+    columns = len(FEATURE_COLUMNS)
+    flood_model = FloodModel(np.zeros(columns), np.ones(columns), one_split(0.9, 0.1), one_split(1.5, 0.0))
+    monkeypatch.setattr(predictions, "get_flood_model", lambda: flood_model)
+    # Several chunks per request
+    monkeypatch.setattr(flood_prediction.settings, "PREDICTION_CHUNK_SIZE", 3)
+    return flood_model
+
+
+def predict(client, body):
+    response = client.post("/api/predictions/batch", json=body)
+    lines = [json.loads(line) for line in response.text.splitlines()] if response.status_code == 200 else []
+    return response, lines
+
+
+def test_points_are_scored_in_order(client, model):
+    points = [{"latitude": 14.9, "longitude": 120.455 + 0.01 * i} for i in range(8)]
+    # Off the raster, where the elevation default of 0 m applies
+    points.append({"latitude": 10.0, "longitude": 125.0})
+
+    response, lines = predict(client, {"points": points})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["x-prediction-count"] == "9"
+    assert [(line["latitude"], line["longitude"]) for line in lines] == [
+        (p["latitude"], p["longitude"]) for p in points
+    ]
+    west = [p["longitude"] < 120.5 for p in points[:8]] + [True]
+    assert [line["flood_probability"] for line in lines] == [0.9 if w else 0.1 for w in west]
+    assert [line["flood_depth"] for line in lines] == [1.5 if w else 0.0 for w in west]
+    assert lines[0]["risk_level"] != lines[-2]["risk_level"]
+
+
+def test_bbox_is_covered_by_a_grid(client, model):
+    bbox = {"min_lat": 14.9, "min_lon": 120.45, "max_lat": 14.91, "max_lon": 120.55}
+    response, lines = predict(client, {"bbox": bbox, "resolution_meters": 250})
+
+    assert response.status_code == 200
+    assert len(lines) == int(response.headers["x-prediction-count"]) == 5 * 43
+    for line in lines:
+        assert bbox["min_lat"] <= line["latitude"] <= bbox["max_lat"]
+        assert bbox["min_lon"] <= line["longitude"] <= bbox["max_lon"]
+        # Bilinear sampling blends the two halves within a pixel of the edge
+        if abs(line["longitude"] - 120.5) > 0.001:
+            assert line["flood_probability"] == (0.9 if line["longitude"] < 120.5 else 0.1)
+
+
+def test_oversized_requests_are_rejected(client, model, monkeypatch):
+    monkeypatch.setattr(flood_prediction.settings, "PREDICTION_MAX_POINTS", 10)
+    response, _ = predict(client, {"points": [{"latitude": 14.9, "longitude": 120.5}] * 11})
+    assert response.status_code == 400
+
+    bbox = {"min_lat": 14.0, "min_lon": 120.0, "max_lat": 15.0, "max_lon": 121.0}
+    response, _ = predict(client, {"bbox": bbox})
+    assert response.status_code == 400
+    assert "coarser resolution" in response.json()["detail"]
+
+    assert predict(client, {})[0].status_code == 422
+
+
+def test_missing_model(client, monkeypatch):
+    def missing():
+        raise FileNotFoundError("model.npz")
+
+    monkeypatch.setattr(predictions, "get_flood_model", missing)
+    response, _ = predict(client, {"points": [{"latitude": 14.9, "longitude": 120.5}]})
+    assert response.status_code == 503
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app.core.database import Base, create_sync_engine
+from app.core.migrations import upgrade_schema
+from scripts.check_query_plans import HOT_QUERIES, explain_plans, plan_problems, query_plan, seed
+
+
+def plans_engine(path):
+    engine = create_sync_engine(f"sqlite:///{path}", "default")
+    explain_plans(engine)
+    return engine
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(tmp_path_factory):
+    engine = plans_engine(tmp_path_factory.mktemp("plans") / "plans.db")
+    Base.metadata.create_all(bind=engine)
+    seed(engine, 5000)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("statement", [statement for _, statement in HOT_QUERIES], ids=[name for name, _ in HOT_QUERIES])
+def test_hot_query_is_index_backed(seeded_engine, statement):
+    with seeded_engine.connect() as conn:
+        details = query_plan(conn, statement)
+    assert plan_problems(details) == [], " | ".join(details)
+
+
+def test_upgraded_database_gets_the_indexes(tmp_path):
+    engine = plans_engine(os.path.join(tmp_path, "legacy.db"))
+    Base.metadata.create_all(bind=engine)
+    # A database created before the indexes existed
+    with engine.begin() as conn:
+        # Reflection skips expression indexes, so list them from sqlite_master
+        names = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+            " AND tbl_name IN ('reports', 'incidents', 'report_upvotes')"
+        )).scalars().all()
+        for name in names:
+            conn.execute(text(f"DROP INDEX {name}"))
+        # The severity index as it was before it ranked NULL as 0
+        conn.execute(text("CREATE INDEX ix_incidents_is_active_severity_score ON incidents (is_active, severity_score)"))
+    seed(engine, 500)
+
+    upgrade_schema(engine)
+    assert "ix_incidents_is_active_severity_score" not in {index["name"] for index in inspect(engine).get_indexes("incidents")}
+
+    with engine.connect() as conn:
+        problems = [problem for _, statement in HOT_QUERIES for problem in plan_problems(query_plan(conn, statement))]
+    engine.dispose()
+    assert problems == []
+
+
+def test_plan_problems_flags_scans_and_temp_sorts():
+    assert plan_problems(["SEARCH reports USING INDEX ix_reports_created_at (created_at>?)"]) == []
+    assert plan_problems(["SCAN reports USING INDEX ix_reports_created_at"]) == []
+    assert plan_problems(["SCAN reports"]) == ["full table scan: SCAN reports"]
+    assert plan_problems(["USE TEMP B-TREE FOR ORDER BY"]) == ["sort without index: USE TEMP B-TREE FOR ORDER BY"]
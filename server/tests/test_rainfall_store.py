@@ -0,0 +1,88 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.models import RainfallSlot
+from app.services.rainfall_store import RainfallStore
+
+SLOT = 900
+HOUR = 3600
+START = 1_750_000_000 // HOUR * HOUR
+CELL = (1490, 12050)
+
+
+def observe(store, cell, hours, amount=0.5, start=START):
+    """One 15-minute observation per slot for `hours` hours from start"""
+    for i in range(hours * HOUR // SLOT):
+        store.record(cell, start + (i + 1) * SLOT, SLOT, amount)
+
+
+def test_windows_sum_observed_slots():
+    store = RainfallStore(SLOT)
+    observe(store, CELL, 24)
+    # Just before the next slot starts, so the last observed slot is current
+    totals = store.totals(CELL, now=START + 24 * HOUR - 1)
+    assert totals["rainfall_1h"] == 2.0
+    assert totals["rainfall_6h"] == 12.0
+    assert totals["rainfall_24h"] == 48.0
+    assert totals["rainfall_24h_coverage"] == 1.0
+
+
+def test_repolling_an_observation_does_not_double_count():
+    store = RainfallStore(SLOT)
+    for _ in range(3):
+        store.record(CELL, START + SLOT, SLOT, 1.5)
+    assert store.totals(CELL, now=START + SLOT)["rainfall_1h"] == 1.5
+
+
+def test_sparse_windows_report_no_total():
+    store = RainfallStore(SLOT, min_coverage=0.75)
+    observe(store, CELL, 1)
+    totals = store.totals(CELL, now=START + 6 * HOUR - 1)
+    assert totals["rainfall_1h"] is None
+    assert totals["rainfall_1h_coverage"] == 0.0
+    assert totals["rainfall_6h"] is None
+    # The unobserved slot in progress is not expected yet
+    assert totals["rainfall_6h_coverage"] == round(4 / 23, 2)
+
+
+def test_nothing_is_queued_for_writing_without_persistence():
+    store = RainfallStore(SLOT)
+    observe(store, CELL, 24)
+    assert store._dirty == {}
+
+
+def test_persisted_slots_reload():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    store = RainfallStore(SLOT, persist=True)
+    # flush() and load() keep the last 24 hours by wall clock
+    now = int(time.time()) // SLOT * SLOT
+    observe(store, CELL, 2, start=now - 2 * HOUR)
+
+    with Session(engine) as db:
+        store.flush(db)
+        assert db.query(RainfallSlot).count() == 8
+        assert store._dirty == {}
+
+        reloaded = RainfallStore(SLOT)
+        reloaded.load(db)
+    assert reloaded.totals(CELL, now=now)["rainfall_6h"] == store.totals(CELL, now=now)["rainfall_6h"]
+    engine.dispose()
+
+
+def test_cells_unobserved_for_a_day_are_evicted():
+    store = RainfallStore(SLOT)
+    observe(store, CELL, 1)
+    observe(store, (1491, 12050), 1)
+    assert len(store) == 2
+
+    # Only one cell keeps being observed; the other's ring ages out
+    observe(store, CELL, 23, start=START + HOUR)
+    assert len(store) == 2
+    observe(store, CELL, 1, start=START + 24 * HOUR)
+    assert len(store) == 1
+    assert store.totals((1491, 12050), now=START + 25 * HOUR - 1)["rainfall_24h"] is None
+    assert store.totals(CELL, now=START + 25 * HOUR - 1)["rainfall_1h"] == 2.0
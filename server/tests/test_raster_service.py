@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.services.raster_service import RasterStore, write_layer
+
+HEIGHT, WIDTH, TILE = 150, 230, 64
+# Top-left corner at (15.0 N, 120.0 E), 0.001 degree pixels
+TRANSFORM = (120.0, 0.001, 0.0, 15.0, 0.0, -0.001)
+NODATA = -9999.0
+
+
+def source():
+    rows, cols = np.mgrid[0:HEIGHT, 0:WIDTH]
+    values = (rows * 1000 + cols).astype(np.float32)
+    values[10:13, 20:23] = NODATA
+    return values
+
+
+def pixel_center(row, col):
+    """(latitude, longitude) of a pixel's center"""
+    return 15.0 - (np.asarray(row) + 0.5) * 0.001, 120.0 + (np.asarray(col) + 0.5) * 0.001
+
+
+@pytest.fixture
+def store(tmp_path):
+    values = source()
+    # Ragged tiles on both axes, streamed in bands like a real conversion
+    write_layer(str(tmp_path), "elevation", HEIGHT, WIDTH, TRANSFORM, lambda start, stop: values[start:stop], NODATA, TILE)
+    return RasterStore(str(tmp_path))
+
+
+def test_layout_and_discovery(store):
+    layer = store.layer("elevation")
+    assert layer.tiles.shape == (3, 4, TILE, TILE)
+    assert isinstance(layer.tiles, np.memmap)
+    assert store.available_layers() == ["elevation"]
+    assert store.has_layer("elevation") and not store.has_layer("slope")
+    with pytest.raises(FileNotFoundError):
+        store.layer("slope")
+
+
+def test_nearest_returns_each_pixel(store):
+    rng = np.random.default_rng(0)
+    rows, cols = rng.integers(HEIGHT, size=2000), rng.integers(WIDTH, size=2000)
+    # Anywhere inside the pixel, not just its center
+    latitudes, longitudes = pixel_center(rows, cols)
+    latitudes = latitudes + rng.uniform(-0.0004, 0.0004, size=2000)
+    longitudes = longitudes + rng.uniform(-0.0004, 0.0004, size=2000)
+
+    expected = source()[rows, cols].astype(np.float64)
+    expected[expected == NODATA] = np.nan
+    np.testing.assert_array_equal(store.sample("elevation", latitudes, longitudes, "nearest"), expected)
+
+
+def test_bilinear_interpolates_between_pixel_centers(store):
+    # The source is linear in row and column, so interpolation is exact
+    rows = np.array([40.0, 40.5, 100.25, 0.0, 149.0])
+    cols = np.array([50.0, 50.5, 200.75, 0.0, 229.0])
+    latitudes, longitudes = pixel_center(rows, cols)
+    sampled = store.sample("elevation", latitudes, longitudes)
+    np.testing.assert_allclose(sampled, rows * 1000 + cols, atol=1e-3)
+
+
+def test_outside_and_nodata(store):
+    latitudes, longitudes = pixel_center(np.array([-1, HEIGHT, 5, 11, 13]), np.array([5, 5, WIDTH, 21, 21]))
+    nearest = store.sample("elevation", latitudes, longitudes, "nearest")
+    assert np.isnan(nearest[:4]).all()
+    assert nearest[4] == 13 * 1000 + 21
+
+    # Between a nodata pixel and a valid one, bilinear falls back to the nearest pixel
+    latitude, longitude = pixel_center(12.8, 21)
+    assert store.sample("elevation", [latitude], [longitude])[0] == 13 * 1000 + 21
+
+    with pytest.raises(ValueError):
+        store.sample("elevation", latitudes, longitudes, "cubic")
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from app.core.database import Base, SessionLocal
+from app.models.models import IncidentType, Report
+from app.services import report_stats
+from app.services.report_stats import ALL_TIME, compute_report_stats, ensure_report_counters, report_counters
+
+
+def counters(engine) -> dict:
+    """Non-zero counter rows as {(period, type name): count}"""
+    with engine.connect() as conn:
+        rows = conn.execute(select(report_counters.c.period, report_counters.c.incident_type, report_counters.c.count))
+        return {(period, incident_type): count for period, incident_type, count in rows if count}
+
+
+def recount(engine) -> dict:
+    """What the counters should hold, counted straight from reports"""
+    expected = {}
+    with engine.connect() as conn:
+        day = func.date(Report.created_at)
+        for period, incident_type, count in conn.execute(
+            select(day, Report.incident_type, func.count()).group_by(day, Report.incident_type)
+        ):
+            expected[(period, incident_type.name)] = count
+            expected[(ALL_TIME, incident_type.name)] = expected.get((ALL_TIME, incident_type.name), 0) + count
+    return expected
+
+
+def add_reports(*specs):
+    with SessionLocal() as db:
+        reports = [
+            Report(user_id=1, incident_type=incident_type, latitude=14.9, longitude=120.5, created_at=created_at)
+            for incident_type, created_at in specs
+        ]
+        db.add_all(reports)
+        db.commit()
+        return [report.id for report in reports]
+
+
+def test_counters_follow_insert_update_and_delete(empty_tables):
+    engine = empty_tables
+    assert report_stats.is_counters_enabled()
+    assert counters(engine) == {}
+
+    today = datetime.utcnow()
+    yesterday = today - timedelta(days=1)
+    ids = add_reports(
+        (IncidentType.INFO, today),
+        (IncidentType.CRITICAL, today),
+        (IncidentType.CRITICAL, yesterday),
+        (IncidentType.WARNING, yesterday),
+    )
+    assert counters(engine) == recount(engine)
+    assert counters(engine)[(ALL_TIME, "CRITICAL")] == 2
+
+    with SessionLocal() as db:
+        db.get(Report, ids[0]).incident_type = IncidentType.WARNING  # type change
+        db.get(Report, ids[1]).created_at = yesterday  # moves to another day
+        db.get(Report, ids[3]).description = "unrelated edit"
+        db.commit()
+    assert counters(engine) == recount(engine)
+    assert (ALL_TIME, "INFO") not in counters(engine)
+
+    with SessionLocal() as db:
+        db.delete(db.get(Report, ids[2]))
+        db.commit()
+    assert counters(engine) == recount(engine)
+    assert counters(engine)[(ALL_TIME, "CRITICAL")] == 1
+
+
+def test_stats_from_counters_match_group_by(empty_tables, monkeypatch):
+    today = datetime.utcnow()
+    add_reports(*[(incident_type, today - timedelta(days=i % 3)) for i, incident_type in enumerate(
+        [IncidentType.INFO, IncidentType.CRITICAL, IncidentType.WARNING, IncidentType.CRITICAL, IncidentType.INFO]
+    )])
+
+    with SessionLocal() as db:
+        from_counters = compute_report_stats(db, days=4)
+        monkeypatch.setattr(report_stats, "_counters_enabled", False)
+        from_group_by = compute_report_stats(db, days=4)
+
+    assert from_counters == from_group_by
+    assert from_counters.total_count == 5
+    assert [day.total_count for day in from_counters.daily] == [0, 1, 2, 2]
+    assert from_counters.daily[-1].date == today.date().isoformat()
+    assert from_counters.date == today.strftime("%b %d, %Y")
+
+
+@pytest.fixture
+def scratch_engine(monkeypatch):
+    """In-memory database; restores the app's counters flag afterwards"""
+    monkeypatch.setattr(report_stats, "_counters_enabled", report_stats.is_counters_enabled())
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_counters_are_recounted_only_when_missing(scratch_engine):
+    with scratch_engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), [
+            {"incident_type": "INFO", "latitude": 0.0, "longitude": 0.0, "created_at": datetime(2025, 6, 1)}
+        ] * 3)
+
+    # Created now: rows written before the triggers existed are counted
+    ensure_report_counters(scratch_engine, True)
+    assert counters(scratch_engine)[(ALL_TIME, "INFO")] == 3
+
+    # Already in place: a restart leaves the table alone
+    with scratch_engine.begin() as conn:
+        conn.execute(text("UPDATE report_counters SET count = 99 WHERE period = 'all'"))
+    ensure_report_counters(scratch_engine, True)
+    assert counters(scratch_engine)[(ALL_TIME, "INFO")] == 99
+
+    # A missing trigger means writes may have been missed: recount
+    with scratch_engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER report_counters_delete"))
+    ensure_report_counters(scratch_engine, True)
+    assert counters(scratch_engine)[(ALL_TIME, "INFO")] == 3
+
+
+def test_disabling_counters_drops_them(scratch_engine):
+    ensure_report_counters(scratch_engine, True)
+    assert not ensure_report_counters(scratch_engine, False)
+    assert not report_stats.is_counters_enabled()
+    with scratch_engine.connect() as conn:
+        names = conn.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'report_counters%'")).all()
+    assert names == []
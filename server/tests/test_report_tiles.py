@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import IncidentType, Report
+from app.services.report_tiles import _aggregate, quadkey, tile_xy
+
+TYPES = list(IncidentType)
+
+
+@pytest.fixture
+def reports(empty_tables):
+    rng = np.random.default_rng(0)
+    latitudes = 14.95 + rng.normal(scale=0.05, size=3000)
+    longitudes = 120.55 + rng.normal(scale=0.05, size=3000)
+    types = rng.integers(len(TYPES), size=3000)
+    with empty_tables.begin() as conn:
+        conn.execute(Report.__table__.insert(), [
+            {"user_id": 1, "latitude": float(lat), "longitude": float(lon), "incident_type": TYPES[t].value}
+            for lat, lon, t in zip(latitudes, longitudes, types)
+        ])
+    return latitudes, longitudes, types
+
+
+def brute_force(reports, zoom, x, y, incident_type=None):
+    """Sub-cells of a tile by quadkey, built by mapping every report with tile_xy()"""
+    latitudes, longitudes, types = reports
+    keep = np.ones(len(latitudes), dtype=bool) if incident_type is None else types == TYPES.index(incident_type)
+    tx, ty = tile_xy(latitudes, longitudes, zoom)
+    keep &= (tx == x) & (ty == y)
+    cell_zoom = zoom + settings.TILE_DETAIL_LEVELS
+    cx, cy = tile_xy(latitudes[keep], longitudes[keep], cell_zoom)
+
+    cells = {}
+    for column, row, lat, lon, t in zip(cx, cy, latitudes[keep], longitudes[keep], types[keep]):
+        cell = cells.setdefault(quadkey(cell_zoom, int(column), int(row)), {"lat": [], "lon": [], "types": {}})
+        cell["lat"].append(lat)
+        cell["lon"].append(lon)
+        cell["types"][TYPES[t].value] = cell["types"].get(TYPES[t].value, 0) + 1
+    return cells
+
+
+@pytest.mark.parametrize("zoom", [0, 4, 9, 12, 14])
+@pytest.mark.parametrize("incident_type", [None, IncidentType.CRITICAL])
+def test_tile_matches_mapping_every_report(reports, zoom, incident_type):
+    xs, ys = tile_xy([14.95], [120.55], zoom)
+    x, y = int(xs[0]), int(ys[0])
+    expected = brute_force(reports, zoom, x, y, incident_type)
+
+    with SessionLocal() as db:
+        tile = _aggregate(db, zoom, x, y, incident_type)
+
+    assert tile.total_count == sum(len(cell["lat"]) for cell in expected.values())
+    assert sorted(cluster.quadkey for cluster in tile.clusters) == sorted(expected)
+    for cluster in tile.clusters:
+        cell = expected[cluster.quadkey]
+        assert cluster.count == len(cell["lat"])
+        assert cluster.type_counts == cell["types"]
+        assert cluster.latitude == pytest.approx(np.mean(cell["lat"]), abs=1e-9)
+        assert cluster.longitude == pytest.approx(np.mean(cell["lon"]), abs=1e-9)
+    assert [c.count for c in tile.clusters] == sorted((c.count for c in tile.clusters), reverse=True)
+
+
+def test_empty_tile(reports):
+    with SessionLocal() as db:
+        tile = _aggregate(db, 10, 0, 0, None)
+    assert tile.total_count == 0
+    assert tile.clusters == []
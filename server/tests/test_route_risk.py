@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.core.database import SessionLocal
+from app.models.models import Incident, IncidentType
+from app.services.route_risk import incident_risk, segment_cache
+
+# A roughly 1.1 km route heading north
+ROUTE = [{"latitude": 14.90, "longitude": 120.50}, {"latitude": 14.91, "longitude": 120.50}]
+
+
+@pytest.fixture
+def no_cached_segments():
+    segment_cache.clear()
+    yield
+    segment_cache.clear()
+
+
+def add_incident(client, latitude, longitude, severity, radius):
+    response = client.post("/api/incidents/", json={
+        "title": "Flooding",
+        "incident_type": "critical",
+        "latitude": latitude,
+        "longitude": longitude,
+        "severity_score": severity,
+        "affected_area_radius": radius,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def score(client):
+    response = client.post("/api/routes/risk", json={"path": ROUTE, "sample_interval_meters": 50})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_risk_fades_to_half_at_the_edge(empty_tables):
+    with SessionLocal() as db:
+        db.add(Incident(
+            title="Flooding", incident_type=IncidentType.CRITICAL, latitude=14.90, longitude=120.50,
+            severity_score=80.0, affected_area_radius=500.0
+        ))
+        db.commit()
+
+        # Center, halfway, just inside and just outside the 500 m radius (due north)
+        offsets = np.array([0.0, 250.0, 499.0, 501.0])
+        latitudes = 14.90 + np.degrees(offsets / 6371000.0)
+        risks = incident_risk(db, latitudes, np.full(4, 120.50))
+
+    assert risks[0] == pytest.approx(0.8)
+    assert risks[1] == pytest.approx(0.6, abs=1e-3)
+    assert risks[2] == pytest.approx(0.4, abs=1e-3)
+    assert risks[3] == 0.0
+
+
+def test_route_through_an_incident(client, empty_tables, no_cached_segments):
+    add_incident(client, 14.90, 120.50, 90.0, 300.0)
+    result = score(client)
+
+    assert result["max_risk"] == pytest.approx(0.9)
+    assert result["segments"][0]["risk_level"] == "severe"
+    assert not result["is_recommended"]
+
+
+def test_incidents_without_severity_or_area_add_no_risk(client, empty_tables, no_cached_segments):
+    nulled = add_incident(client, 14.905, 120.50, 70.0, 400.0)
+    assert client.put(f"/api/incidents/{nulled}", json={"severity_score": None}).status_code == 200
+    add_incident(client, 14.902, 120.50, 90.0, 0.0)
+
+    result = score(client)
+
+    for field in ("overall_risk", "max_risk", "average_risk", "estimated_time_seconds"):
+        assert result[field] is not None and math.isfinite(result[field]), field
+    assert result["max_risk"] == 0.0
+    assert result["risk_level"] == "minimal"
+    assert result["is_recommended"]
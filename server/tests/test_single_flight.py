@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import SingleFlight
+
+
+class Upstream:
+    """Counts calls; each call blocks until release() so callers overlap"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+        self.gate = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        try:
+            await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self.calls
+
+    def release(self):
+        self.gate.set()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flights.do("k", upstream.fetch)) for _ in range(5)]
+        await settle()
+        upstream.release()
+        assert await asyncio.gather(*callers) == [1] * 5
+        assert upstream.calls == 1
+        assert "k" not in flights
+
+    asyncio.run(scenario())
+
+
+def test_exceptions_reach_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def broken():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(
+            flights.do("k", broken), flights.do("k", broken), return_exceptions=True
+        )
+        assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        leaving = asyncio.create_task(flights.do("k", upstream.fetch))
+        staying = asyncio.create_task(flights.do("k", upstream.fetch))
+        await settle()
+
+        leaving.cancel()
+        await settle()
+        upstream.release()
+
+        assert await staying == 1
+        assert leaving.cancelled()
+        assert upstream.cancelled == 0
+
+    asyncio.run(scenario())
+
+
+def test_default_work_outlives_its_last_waiter():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        caller = asyncio.create_task(flights.do("k", upstream.fetch))
+        await settle()
+
+        caller.cancel()
+        await settle()
+        assert "k" in flights
+
+        # A later caller gets the result of the work already under way
+        upstream.release()
+        assert await flights.do("k", upstream.fetch) == 1
+        assert upstream.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_work_is_cancelled_when_the_last_waiter_leaves():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        first = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        second = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        await settle()
+
+        first.cancel()
+        await settle()
+        assert upstream.cancelled == 0
+
+        second.cancel()
+        await settle()
+        assert upstream.cancelled == 1
+        assert "k" not in flights
+
+    asyncio.run(scenario())
+
+
+def test_caller_after_abandonment_starts_fresh_work():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        abandoned = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        await settle()
+        abandoned.cancel()
+
+        # Joins straight after the cancel, before the old task has unwound
+        fresh = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        await settle()
+        upstream.release()
+
+        assert await fresh == 2
+        assert upstream.calls == 2
+        assert upstream.cancelled == 1
+
+    asyncio.run(scenario())
+
+
+def test_caller_that_needs_the_result_pins_the_work():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        background = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        user = asyncio.create_task(flights.do("k", upstream.fetch))
+        await settle()
+
+        # Both gone: the user's request still wants the result cached
+        background.cancel()
+        user.cancel()
+        await settle()
+        assert upstream.cancelled == 0
+        assert "k" in flights
+
+        upstream.release()
+        assert await flights.do("k", upstream.fetch) == 1
+
+    asyncio.run(scenario())
+
+
+def test_started_task_is_shared_and_never_cancelled_by_waiters():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        task = flights.start("k", upstream.fetch)
+        assert flights.start("k", upstream.fetch) is task
+
+        waiter = asyncio.create_task(flights.do("k", upstream.fetch, cancel_when_abandoned=True))
+        await settle()
+        waiter.cancel()
+        await settle()
+        assert not task.done()
+
+        upstream.release()
+        assert await task == 1
+        assert upstream.calls == 1
+        assert "k" not in flights
+
+    asyncio.run(scenario())
+
+
+def test_keys_do_not_coalesce_with_each_other():
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        callers = [asyncio.create_task(flights.do(key, upstream.fetch)) for key in ("a", "b")]
+        await settle()
+        assert len(flights) == 2
+        upstream.release()
+        await asyncio.gather(*callers)
+        assert upstream.calls == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cancel_when_abandoned", [False, True])
+def test_completed_work_is_not_reused(cancel_when_abandoned):
+    async def scenario():
+        flights, upstream = SingleFlight(), Upstream()
+        upstream.release()
+        assert await flights.do("k", upstream.fetch, cancel_when_abandoned) == 1
+        assert await flights.do("k", upstream.fetch, cancel_when_abandoned) == 2
+
+    asyncio.run(scenario())
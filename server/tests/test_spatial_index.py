@@ -0,0 +1,102 @@
+import math
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models.models import Report
+from app.services.spatial_index import is_rtree_enabled, reports_rtree
+
+CENTER = (14.95, 120.55)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Plain-Python great-circle distance in meters, independent of geo_math"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * 6371000.0 * math.asin(math.sqrt(a))
+
+
+def seed(engine, count=400):
+    rng = random.Random(11)
+    # Spread over roughly 4 km around CENTER, with a few points on top of it
+    rows = [
+        {
+            "user_id": 1,
+            "incident_type": rng.choice(["INFO", "CRITICAL", "WARNING"]),
+            "latitude": CENTER[0] + (rng.random() - 0.5) * 0.04 * (i % 10 != 0),
+            "longitude": CENTER[1] + (rng.random() - 0.5) * 0.04 * (i % 10 != 0),
+            "created_at": datetime(2025, 6, 1),
+            "is_verified": 0,
+            "upvote_count": 0,
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Report.__table__.insert(), rows)
+
+
+def assert_rtree_mirrors_reports(engine):
+    with engine.connect() as conn:
+        reports = {row.id: (row.latitude, row.longitude) for row in conn.execute(select(Report.id, Report.latitude, Report.longitude))}
+        boxes = conn.execute(select(reports_rtree)).all()
+    assert len(boxes) == len(reports)
+    for box in boxes:
+        latitude, longitude = reports[box.id]
+        # The rtree stores 32-bit floats rounded outward
+        assert box.min_lat <= latitude <= box.max_lat
+        assert box.min_lon <= longitude <= box.max_lon
+        assert box.max_lat - box.min_lat < 1e-4 and box.max_lon - box.min_lon < 1e-4
+
+
+def test_rtree_follows_insert_update_and_delete(empty_tables):
+    engine = empty_tables
+    assert is_rtree_enabled()
+    seed(engine, 50)
+    assert_rtree_mirrors_reports(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE reports SET latitude = latitude + 0.5 WHERE id % 3 = 0"))
+        conn.execute(text("UPDATE reports SET longitude = 121.0, description = 'moved' WHERE id % 5 = 0"))
+        conn.execute(text("UPDATE reports SET description = 'unrelated edit' WHERE id % 7 = 0"))
+    assert_rtree_mirrors_reports(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM reports WHERE id % 2 = 0"))
+    assert_rtree_mirrors_reports(engine)
+
+
+def test_rtree_follows_api_writes(client, empty_tables):
+    ids = []
+    for latitude, longitude in [(14.9, 120.5), (14.9003, 120.5), (15.2, 120.8)]:
+        created = client.post("/api/reports/", json={"incident_type": "info", "latitude": latitude, "longitude": longitude})
+        assert created.status_code == 201, created.text
+        ids.append(created.json()["id"])
+    assert_rtree_mirrors_reports(empty_tables)
+    assert [row["id"] for row in client.get("/api/reports/nearby/14.9/120.5").json()] == ids[:2]
+
+    client.delete(f"/api/reports/{ids[0]}")
+    assert_rtree_mirrors_reports(empty_tables)
+    assert [row["id"] for row in client.get("/api/reports/nearby/14.9/120.5").json()] == ids[1:2]
+
+
+@pytest.mark.parametrize("radius", [0.0, 50.0, 250.0, 1000.0, 3000.0])
+def test_nearby_matches_brute_force_haversine(client, empty_tables, radius):
+    seed(empty_tables)
+    with empty_tables.connect() as conn:
+        rows = conn.execute(select(Report.id, Report.latitude, Report.longitude)).all()
+
+    expected = sorted(
+        (haversine(CENTER[0], CENTER[1], latitude, longitude), report_id)
+        for report_id, latitude, longitude in rows
+        if haversine(CENTER[0], CENTER[1], latitude, longitude) <= radius
+    )
+    response = client.get(f"/api/reports/nearby/{CENTER[0]}/{CENTER[1]}", params={"radius": radius})
+    assert response.status_code == 200
+    found = [row["id"] for row in response.json()]
+
+    assert sorted(found) == sorted(report_id for _, report_id in expected)
+    distances = [haversine(CENTER[0], CENTER[1], row["latitude"], row["longitude"]) for row in response.json()]
+    assert distances == sorted(distances)
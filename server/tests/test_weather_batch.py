@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import weather_service
+from app.services.weather_service import (
+    cell_center,
+    current_weather_cache,
+    current_weather_flights,
+    get_current_weather,
+    get_current_weather_many,
+    open_meteo_breaker,
+    weather_cell,
+)
+
+POINTS = [(14.905, 120.505), (14.915, 120.505), (14.925, 120.505)]
+
+
+class FakeOpenMeteo:
+    """Multi-location Open-Meteo stand-in; calls wait for `gate` and fail for latitudes in `failing`"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+        self.gate = asyncio.Event()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        latitudes = request.url.params["latitude"].split(",")
+        self.calls.append(latitudes)
+        await self.gate.wait()
+        if self.failing & set(latitudes):
+            return httpx.Response(503, request=request)
+        locations = [
+            {"latitude": float(lat), "longitude": 120.5, "current": {"temperature_2m": 27.0 + i}}
+            for i, lat in enumerate(latitudes)
+        ]
+        return httpx.Response(200, json=locations if len(locations) > 1 else locations[0], request=request)
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+@pytest.fixture(autouse=True)
+def clean_weather_state():
+    current_weather_cache.clear()
+    open_meteo_breaker.record_success()
+    yield
+    current_weather_cache.clear()
+    open_meteo_breaker.record_success()
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_batch_and_single_requests_share_one_upstream_call():
+    async def scenario():
+        upstream = FakeOpenMeteo()
+        async with upstream.client() as client:
+            batch = asyncio.create_task(get_current_weather_many(client, POINTS))
+            await settle()
+            single = asyncio.create_task(get_current_weather(client, *POINTS[1]))
+            await settle()
+            assert len(current_weather_flights) == 3
+
+            upstream.gate.set()
+            batch_results, single_result = await asyncio.gather(batch, single)
+
+        assert len(upstream.calls) == 1
+        assert single_result["temperature"] == batch_results[1]["temperature"]
+        assert len(current_weather_flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_batch_joins_a_single_cell_fetch_in_flight():
+    async def scenario():
+        upstream = FakeOpenMeteo()
+        async with upstream.client() as client:
+            single = asyncio.create_task(get_current_weather(client, *POINTS[0]))
+            await settle()
+            batch = asyncio.create_task(get_current_weather_many(client, POINTS))
+            await settle()
+            upstream.gate.set()
+            await asyncio.gather(single, batch)
+
+        # The batch only asked for the two cells nobody was fetching
+        assert sorted(len(call) for call in upstream.calls) == [1, 2]
+        assert str(cell_center(weather_cell(*POINTS[0]))[0]) not in upstream.calls[1]
+
+    asyncio.run(scenario())
+
+
+def test_failed_chunk_keeps_the_cells_it_can_serve(monkeypatch):
+    monkeypatch.setattr(weather_service.settings, "WEATHER_BATCH_CHUNK_SIZE", 1)
+
+    async def scenario():
+        upstream = FakeOpenMeteo()
+        upstream.gate.set()
+        stale_cell, failing_cell = weather_cell(*POINTS[0]), weather_cell(*POINTS[2])
+        current_weather_cache.set(stale_cell, {"temperature": 20.0, "latitude": 14.905}, ttl_seconds=-1)
+        upstream.failing = {f"{cell_center(stale_cell)[0]:g}", f"{cell_center(failing_cell)[0]:g}"}
+
+        async with upstream.client() as client:
+            # The stale cell is served as-is and its background refresh fails quietly
+            results = await get_current_weather_many(client, POINTS[:2])
+            await settle()
+            assert [result["stale"] for result in results] == [True, False]
+            assert results[0]["temperature"] == 20.0
+
+            # A missing cell that fails with nothing cached fails the request
+            with pytest.raises(httpx.HTTPStatusError):
+                await get_current_weather_many(client, POINTS)
+
+    asyncio.run(scenario())
+
+
+def test_failed_cell_falls_back_to_an_entry_cached_meanwhile():
+    async def scenario():
+        upstream = FakeOpenMeteo()
+        failing_cell = weather_cell(*POINTS[2])
+        upstream.failing = {f"{cell_center(failing_cell)[0]:g}"}
+
+        async with upstream.client() as client:
+            batch = asyncio.create_task(get_current_weather_many(client, [POINTS[2]]))
+            await settle()
+            # Stored by another path while the batch call is out
+            current_weather_cache.set(failing_cell, {"temperature": 21.0, "latitude": 14.925}, ttl_seconds=-1)
+            upstream.gate.set()
+            [result] = await batch
+
+        assert result["temperature"] == 21.0
+        assert result["stale"]
+
+    asyncio.run(scenario())